@@ -1,21 +1,44 @@
 import os
 import json
-from datetime import datetime, timedelta
-from flask import Flask, request, jsonify, render_template, redirect, url_for, flash
+import time
+import click
+from datetime import datetime
+from flask import Flask, request, jsonify, render_template, redirect, url_for, flash, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from dotenv import load_dotenv
-from models.models import db, Animal, FeedingLog, HealthRecord, Alert
+from models.models import db, Animal, FeedingLog, HealthRecord, Alert, AIJob
+from models.database import configure_database
+from models.migrations import upgrade_database
+from services.anomaly_sweep import sweep_herd, DEFAULT_CONCURRENCY
 from services.gemini_service import gemini_service
+from services.gemini_guard import gemini_guard
+from services.history_events import register_history_events
+from services.animal_context import get_animal_context
+from services.feed_catalog import get_feed_types
+from services.jobs import job_runner
+from services.result_cache import result_cache
+from services.dashboard import get_dashboard_data, alert_to_dict, DEFAULT_ALERT_LIMIT
+from services.export import EXPORT_KINDS, EXPORT_FORMATS, build_export_query, stream_export
+from services.ingest import detect_format, ingest_feeding_logs, ingest_health_records, parse_timestamp
+from services.http_cache import AnimalValidators
+from services.pagination import PageArgs, paginate
+from services.search import SearchArgs, search_available, search_history
+from services.retention import ARCHIVE_KINDS, RETENTION_DAYS, apply_retention, archived_export_rows, paginate_history
+from services import metrics
+from services.sql_profiler import sql_profiler
 
 # Load environment variables from .env file
 load_dotenv()
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///farm_assistant.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.secret_key = os.urandom(24)
 
-db.init_app(app)
+# Database URL, pool and SQLite tuning come from the environment
+configure_database(app)
+register_history_events()
+job_runner.init_app(app)
+metrics.init_app(app)
+sql_profiler.init_app(app)
 
 # Helper function to parse date strings
 def parse_date(date_str):
@@ -27,8 +50,8 @@ def parse_date(date_str):
 # Routes for web interface
 @app.route('/')
 def dashboard():
-    active_alerts = Alert.query.filter_by(acknowledged=False).order_by(Alert.timestamp.desc()).all()
-    return render_template('dashboard.html', alerts=active_alerts, Animal=Animal)
+    data = get_dashboard_data()
+    return render_template('dashboard.html', alerts=data['alerts'], total_active=data['total_active'])
 
 @app.route('/animals')
 def animals_list():
@@ -122,45 +145,10 @@ def acknowledge_alert(alert_id):
 def generate_feeding_plan(animal_tag_id):
     animal = Animal.query.filter_by(animal_tag_id=animal_tag_id).first_or_404()
     
-    # Get recent feeding history (last 7 days)
-    seven_days_ago = datetime.utcnow() - timedelta(days=7)
-    feeding_logs = FeedingLog.query.filter(
-        FeedingLog.animal_id == animal.id,
-        FeedingLog.timestamp >= seven_days_ago
-    ).order_by(FeedingLog.timestamp).all()
-    
-    # Prepare data for AI prompt
-    feeding_history = []
-    for log in feeding_logs:
-        feeding_history.append(f"- {log.timestamp.strftime('%Y-%m-%d')}: {log.feed_type}, {log.quantity_kg} kg")
-    
-    # Get most recent health record for weight
-    latest_health = HealthRecord.query.filter_by(animal_id=animal.id).order_by(HealthRecord.timestamp.desc()).first()
-    weight_kg = latest_health.weight_kg if latest_health and latest_health.weight_kg else "Unknown"
-    
-    # Calculate age
-    if animal.birth_date:
-        today = datetime.utcnow().date()
-        age_days = (today - animal.birth_date).days
-        age_years = age_days / 365
-        age = f"{age_years:.1f} years ({age_days} days)"
-    else:
-        age = "Unknown"
-    
-    # Available feed types (from all recorded feedings for simplicity)
-    available_feeds = db.session.query(FeedingLog.feed_type).distinct().all()
-    available_feed_types = [feed[0] for feed in available_feeds]
+    if request.args.get('stream') != '0':
+        return render_template('feeding_plan.html', animal=animal, stream_url=ai_stream_url(animal, 'feeding_plan'))
     
-    # Use the Gemini service to generate the feeding plan
-    result = gemini_service.generate_feeding_plan(
-        animal_tag_id=animal.animal_tag_id,
-        species=animal.species,
-        breed=animal.breed,
-        age=age,
-        weight_kg=weight_kg,
-        feeding_history=feeding_history,
-        available_feed_types=available_feed_types
-    )
+    result = run_feeding_plan(animal)
     
     # Check if we got a valid response or error
     if "error" in result:
@@ -172,62 +160,16 @@ def generate_feeding_plan(animal_tag_id):
 def detect_anomalies(animal_tag_id):
     animal = Animal.query.filter_by(animal_tag_id=animal_tag_id).first_or_404()
     
-    # Get recent data (last 14 days)
-    fourteen_days_ago = datetime.utcnow() - timedelta(days=14)
-    
-    feeding_logs = FeedingLog.query.filter(
-        FeedingLog.animal_id == animal.id,
-        FeedingLog.timestamp >= fourteen_days_ago
-    ).order_by(FeedingLog.timestamp).all()
-    
-    health_records = HealthRecord.query.filter(
-        HealthRecord.animal_id == animal.id,
-        HealthRecord.timestamp >= fourteen_days_ago
-    ).order_by(HealthRecord.timestamp).all()
-    
-    # Prepare data for AI prompt
-    feeding_history = []
-    for log in feeding_logs:
-        feeding_history.append(f"- {log.timestamp.strftime('%Y-%m-%d')}: {log.feed_type}, {log.quantity_kg} kg, Notes: {log.notes or 'None'}")
-    
-    health_history = []
-    for record in health_records:
-        health_history.append(f"- {record.timestamp.strftime('%Y-%m-%d')}: Weight {record.weight_kg or 'N/A'} kg, Temp {record.temperature_celsius or 'N/A'} C, Behavior: {record.behavior_observation}, Notes: {record.notes or 'None'}")
-    
-    # Calculate age
-    if animal.birth_date:
-        today = datetime.utcnow().date()
-        age_days = (today - animal.birth_date).days
-        age_years = age_days / 365
-        age = f"{age_years:.1f} years ({age_days} days)"
-    else:
-        age = "Unknown"
+    if request.args.get('stream') != '0':
+        return render_template('anomalies.html', animal=animal, stream_url=ai_stream_url(animal, 'detect_anomalies'))
     
-    # Use the Gemini service to detect anomalies
-    result = gemini_service.detect_anomalies(
-        animal_tag_id=animal.animal_tag_id,
-        species=animal.species,
-        breed=animal.breed,
-        age=age,
-        feeding_history=feeding_history,
-        health_history=health_history
-    )
+    result = run_anomaly_detection(animal)
     
     # Check if we got a valid response or error
     if "error" in result:
         return render_template('anomalies.html', animal=animal, raw_response=result.get("raw_response", str(result)))
     else:
-        # If anomalies detected, create alerts
-        if result.get('anomalies_detected') and len(result['anomalies_detected']) > 0:
-            for anomaly in result['anomalies_detected']:
-                alert = Alert(
-                    animal_id=animal.id,
-                    message=f"{anomaly['description']} Potential cause: {anomaly['potential_cause']}",
-                    severity=anomaly['severity'],
-                    source="AI Anomaly Detection"
-                )
-                db.session.add(alert)
-            db.session.commit()
+        if result.get('anomalies_detected'):
             flash('Anomalies detected! Alerts have been created.', 'warning')
             
         return render_template('anomalies.html', animal=animal, anomalies=result)
@@ -236,53 +178,10 @@ def detect_anomalies(animal_tag_id):
 def health_summary(animal_tag_id):
     animal = Animal.query.filter_by(animal_tag_id=animal_tag_id).first_or_404()
     
-    # Get all feeding logs and health records
-    feeding_logs = FeedingLog.query.filter_by(animal_id=animal.id).order_by(FeedingLog.timestamp).all()
-    health_records = HealthRecord.query.filter_by(animal_id=animal.id).order_by(HealthRecord.timestamp).all()
-    
-    # Prepare data for AI prompt
-    feeding_history = []
-    for log in feeding_logs:
-        feeding_history.append(f"- {log.timestamp.strftime('%Y-%m-%d')}: {log.feed_type}, {log.quantity_kg} kg, Notes: {log.notes or 'None'}")
-    
-    health_history = []
-    for record in health_records:
-        health_history.append(f"- {record.timestamp.strftime('%Y-%m-%d')}: Weight {record.weight_kg or 'N/A'} kg, Temp {record.temperature_celsius or 'N/A'} C, Behavior: {record.behavior_observation}, Notes: {record.notes or 'None'}")
-    
-    # Calculate age
-    if animal.birth_date:
-        today = datetime.utcnow().date()
-        age_days = (today - animal.birth_date).days
-        age_years = age_days / 365
-        age = f"{age_years:.1f} years ({age_days} days)"
-    else:
-        age = "Unknown"
-    
-    # Find earliest and latest dates for summary period
-    earliest_date = None
-    latest_date = datetime.utcnow().date()
-    
-    if feeding_logs or health_records:
-        dates = []
-        if feeding_logs:
-            dates.extend([log.timestamp.date() for log in feeding_logs])
-        if health_records:
-            dates.extend([record.timestamp.date() for record in health_records])
-        
-        if dates:
-            earliest_date = min(dates)
+    if request.args.get('stream') != '0':
+        return render_template('health_summary.html', animal=animal, stream_url=ai_stream_url(animal, 'health_summary'))
     
-    # Use the Gemini service to generate health summary
-    result = gemini_service.generate_health_summary(
-        animal_tag_id=animal.animal_tag_id,
-        species=animal.species,
-        breed=animal.breed,
-        age=age,
-        feeding_history=feeding_history,
-        health_history=health_history,
-        summary_period_start=earliest_date.isoformat() if earliest_date else 'N/A',
-        summary_period_end=latest_date.isoformat()
-    )
+    result = run_health_summary(animal)
     
     # Check if we got a valid response or error
     if "error" in result:
@@ -293,8 +192,13 @@ def health_summary(animal_tag_id):
 # API Endpoints
 @app.route('/api/animals', methods=['GET'])
 def api_get_animals():
-    animals = Animal.query.all()
-    return jsonify([animal.to_dict() for animal in animals])
+    try:
+        page = PageArgs(request.args)
+        animals, next_cursor = paginate(Animal.query, Animal, page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'items': [animal.to_dict() for animal in animals], 'next_cursor': next_cursor})
 
 @app.route('/api/animals', methods=['POST'])
 def api_add_animal():
@@ -321,7 +225,12 @@ def api_get_animal(animal_tag_id):
     animal = Animal.query.filter_by(animal_tag_id=animal_tag_id).first()
     if not animal:
         return jsonify({'error': 'Animal not found'}), 404
-    return jsonify(animal.to_dict())
+    
+    validators = AnimalValidators(animal, 'animal')
+    not_modified = validators.not_modified()
+    if not_modified:
+        return not_modified
+    return validators.apply(jsonify(animal.to_dict()))
 
 @app.route('/api/animals/<animal_tag_id>', methods=['PUT'])
 def api_update_animal(animal_tag_id):
@@ -361,8 +270,19 @@ def api_get_feeding_logs(animal_tag_id):
     if not animal:
         return jsonify({'error': 'Animal not found'}), 404
     
-    logs = FeedingLog.query.filter_by(animal_id=animal.id).all()
-    return jsonify([log.to_dict() for log in logs])
+    # Answered from the animal row alone when the client's page is current
+    validators = AnimalValidators(animal, 'feeding_logs')
+    not_modified = validators.not_modified()
+    if not_modified:
+        return not_modified
+    
+    try:
+        page = PageArgs(request.args)
+        logs, next_cursor = paginate_history('feeding_logs', animal, page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return validators.apply(jsonify({'items': logs, 'next_cursor': next_cursor}))
 
 @app.route('/api/animals/<animal_tag_id>/feeding_logs', methods=['POST'])
 def api_add_feeding_log(animal_tag_id):
@@ -393,8 +313,19 @@ def api_get_health_records(animal_tag_id):
     if not animal:
         return jsonify({'error': 'Animal not found'}), 404
     
-    records = HealthRecord.query.filter_by(animal_id=animal.id).all()
-    return jsonify([record.to_dict() for record in records])
+    # Answered from the animal row alone when the client's page is current
+    validators = AnimalValidators(animal, 'health_records')
+    not_modified = validators.not_modified()
+    if not_modified:
+        return not_modified
+    
+    try:
+        page = PageArgs(request.args)
+        records, next_cursor = paginate_history('health_records', animal, page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return validators.apply(jsonify({'items': records, 'next_cursor': next_cursor}))
 
 @app.route('/api/animals/<animal_tag_id>/health_records', methods=['POST'])
 def api_add_health_record(animal_tag_id):
@@ -420,16 +351,47 @@ def api_add_health_record(animal_tag_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/feeding_logs/bulk', methods=['POST'])
+def api_bulk_add_feeding_logs():
+    fmt = detect_format(request.content_type, request.args.get('format'))
+    if not fmt:
+        return jsonify({'error': 'Unsupported format, send NDJSON or CSV'}), 415
+    
+    report = ingest_feeding_logs(request.stream, fmt)
+    return jsonify(report), 400 if 'error' in report else 200
+
+@app.route('/api/health_records/bulk', methods=['POST'])
+def api_bulk_add_health_records():
+    fmt = detect_format(request.content_type, request.args.get('format'))
+    if not fmt:
+        return jsonify({'error': 'Unsupported format, send NDJSON or CSV'}), 415
+    
+    report = ingest_health_records(request.stream, fmt)
+    return jsonify(report), 400 if 'error' in report else 200
+
+@app.route('/api/dashboard', methods=['GET'])
+def api_dashboard():
+    limit = request.args.get('limit', DEFAULT_ALERT_LIMIT, type=int)
+    data = get_dashboard_data(limit)
+    
+    return jsonify({
+        'alerts': [alert_to_dict(alert, animal_tag_id) for alert, animal_tag_id in data['alerts']],
+        'total_active': data['total_active']
+    })
+
 @app.route('/api/alerts', methods=['GET'])
 def api_get_alerts():
     active_only = request.args.get('active_only', 'true').lower() == 'true'
     
-    if active_only:
-        alerts = Alert.query.filter_by(acknowledged=False).all()
-    else:
-        alerts = Alert.query.all()
+    query = Alert.query.filter_by(acknowledged=False) if active_only else Alert.query
     
-    return jsonify([alert.to_dict() for alert in alerts])
+    try:
+        page = PageArgs(request.args)
+        alerts, next_cursor = paginate(query, Alert, page, time_column=Alert.timestamp)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'items': [alert.to_dict() for alert in alerts], 'next_cursor': next_cursor})
 
 @app.route('/api/alerts/<int:alert_id>/acknowledge', methods=['POST'])
 def api_acknowledge_alert(alert_id):
@@ -441,48 +403,120 @@ def api_acknowledge_alert(alert_id):
     db.session.commit()
     return jsonify({'message': f'Alert {alert_id} acknowledged successfully'})
 
-@app.route('/api/ai/generate_feeding_plan/<animal_tag_id>', methods=['POST'])
-def api_generate_feeding_plan(animal_tag_id):
-    animal = Animal.query.filter_by(animal_tag_id=animal_tag_id).first()
-    if not animal:
-        return jsonify({'error': 'Animal not found'}), 404
+@app.route('/api/export/<kind>', methods=['GET'])
+def api_export(kind):
+    if kind not in EXPORT_KINDS:
+        return jsonify({'error': f'Unknown export: {kind}'}), 404
     
-    # Similar logic as the web route
-    seven_days_ago = datetime.utcnow() - timedelta(days=7)
-    feeding_logs = FeedingLog.query.filter(
-        FeedingLog.animal_id == animal.id,
-        FeedingLog.timestamp >= seven_days_ago
-    ).order_by(FeedingLog.timestamp).all()
-    
-    feeding_history = []
-    for log in feeding_logs:
-        feeding_history.append(f"- {log.timestamp.strftime('%Y-%m-%d')}: {log.feed_type}, {log.quantity_kg} kg")
-    
-    latest_health = HealthRecord.query.filter_by(animal_id=animal.id).order_by(HealthRecord.timestamp.desc()).first()
-    weight_kg = latest_health.weight_kg if latest_health and latest_health.weight_kg else "Unknown"
-    
-    if animal.birth_date:
-        today = datetime.utcnow().date()
-        age_days = (today - animal.birth_date).days
-        age_years = age_days / 365
-        age = f"{age_years:.1f} years ({age_days} days)"
-    else:
-        age = "Unknown"
+    fmt = request.args.get('format', 'ndjson').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
     
-    available_feeds = db.session.query(FeedingLog.feed_type).distinct().all()
-    available_feed_types = [feed[0] for feed in available_feeds]
+    try:
+        since = parse_timestamp(request.args['since']) if request.args.get('since') else None
+        until = parse_timestamp(request.args['until']) if request.args.get('until') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    species = request.args.get('species')
+    fields, stmt = build_export_query(kind, species=species, since=since, until=until)
+    # Rows moved to the history archive are read back from there
+    archived = None
+    if kind in ARCHIVE_KINDS:
+        archived = archived_export_rows(kind, fields, species=species, since=since, until=until)
+    
+    # Stream batches as they are fetched instead of building the whole body in memory
+    return Response(
+        stream_with_context(stream_export(fields, stmt, fmt, archived=archived)),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={kind}.{fmt}'}
+    )
+
+@app.route('/api/search', methods=['GET'])
+def api_search():
+    if not search_available():
+        return jsonify({'error': 'Search requires a SQLite database with FTS5'}), 501
+    
+    try:
+        results, next_cursor = search_history(SearchArgs(request.args))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'items': results, 'next_cursor': next_cursor})
+
+# AI helpers shared by the web and API routes and background jobs
+def run_feeding_plan(animal, stream=False):
+    context = get_animal_context(animal)
     
     # Use the Gemini service to generate the feeding plan
-    result = gemini_service.generate_feeding_plan(
-        animal_tag_id=animal.animal_tag_id,
-        species=animal.species,
-        breed=animal.breed,
-        age=age,
-        weight_kg=weight_kg,
-        feeding_history=feeding_history,
-        available_feed_types=available_feed_types
+    return gemini_service.generate_feeding_plan(
+        animal_tag_id=context.animal_tag_id,
+        species=context.species,
+        breed=context.breed,
+        age=context.age,
+        weight_kg=context.weight_kg,
+        feeding_history=context.feeding_plan_history,
+        available_feed_types=get_feed_types(animal.species),
+        stream=stream
+    )
+
+def run_anomaly_detection(animal, stream=False):
+    context = get_animal_context(animal)
+    
+    # Use the Gemini service to detect anomalies
+    result = gemini_service.detect_anomalies(
+        animal_tag_id=context.animal_tag_id,
+        species=context.species,
+        breed=context.breed,
+        age=context.age,
+        feeding_history=context.feeding_history,
+        health_history=context.health_history,
+        stream=stream
     )
     
+    if stream:
+        return _on_stream_result(result, lambda final: create_anomaly_alerts(context.animal_id, final))
+    create_anomaly_alerts(animal.id, result)
+    return result
+
+def create_anomaly_alerts(animal_id, result):
+    # If anomalies detected, create alerts
+    if "error" not in result and result.get('anomalies_detected'):
+        for anomaly in result['anomalies_detected']:
+            alert = Alert(
+                animal_id=animal_id,
+                message=f"{anomaly['description']} Potential cause: {anomaly['potential_cause']}",
+                severity=anomaly['severity'],
+                source="AI Anomaly Detection"
+            )
+            db.session.add(alert)
+        db.session.commit()
+
+def _on_stream_result(events, callback):
+    for kind, payload in events:
+        if kind == 'result':
+            callback(payload)
+        yield kind, payload
+
+def run_health_summary(animal, stream=False):
+    # Whole-life trends come from the daily rollups, so the prompt grows with days, not rows
+    context = get_animal_context(animal)
+    
+    # Use the Gemini service to generate health summary
+    return gemini_service.generate_health_summary(
+        animal_tag_id=context.animal_tag_id,
+        species=context.species,
+        breed=context.breed,
+        age=context.age,
+        feeding_history=context.daily_feeding_history,
+        health_history=context.daily_health_history,
+        summary_period_start=context.first_day.isoformat() if context.first_day else 'N/A',
+        summary_period_end=context.today.isoformat(),
+        recent_observations=context.recent_observations,
+        stream=stream
+    )
+
+def ai_response(result):
     # Check if we got a valid response or error
     if "error" in result and "raw_response" in result:
         return jsonify({'error': 'Failed to parse AI response', 'raw_response': result["raw_response"]}), 500
@@ -491,70 +525,98 @@ def api_generate_feeding_plan(animal_tag_id):
     else:
         return jsonify(result)
 
+# AI pages: helper, result partial and the partial's variable name
+AI_PAGES = {
+    'feeding_plan': (run_feeding_plan, 'partials/feeding_plan_result.html', 'plan'),
+    'detect_anomalies': (run_anomaly_detection, 'partials/anomalies_result.html', 'anomalies'),
+    'health_summary': (run_health_summary, 'partials/health_summary_result.html', 'summary'),
+}
+
+def ai_stream_url(animal, page):
+    return url_for('stream_ai_page', animal_tag_id=animal.animal_tag_id, page=page)
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/animals/<animal_tag_id>/<page>/stream')
+def stream_ai_page(animal_tag_id, page):
+    if page not in AI_PAGES:
+        return jsonify({'error': f'Unknown AI page: {page}'}), 404
+    animal = Animal.query.filter_by(animal_tag_id=animal_tag_id).first_or_404()
+    run, partial, name = AI_PAGES[page]
+    events = run(animal, stream=True)
+    
+    def generate():
+        # Send something at once so the browser shows progress before the model answers
+        yield ": stream open\n\n"
+        for kind, payload in events:
+            if kind == 'chunk':
+                yield sse_event('chunk', {'text': payload})
+            elif "error" in payload:
+                html = render_template(partial, animal=animal, raw_response=payload.get("raw_response", str(payload)))
+                yield sse_event('result', {'html': html})
+            else:
+                html = render_template(partial, animal=animal, alerts_created=bool(payload.get('anomalies_detected')),
+                                       **{name: payload})
+                yield sse_event('result', {'html': html})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+AI_JOB_KINDS = {
+    'feeding_plan': run_feeding_plan,
+    'detect_anomalies': run_anomaly_detection,
+    'health_summary': run_health_summary,
+}
+
+def _animal_job(run):
+    def handler(job):
+        animal = Animal.query.filter_by(animal_tag_id=job.animal_tag_id).first()
+        if not animal:
+            return {'error': 'Animal not found'}
+        return run(animal)
+    return handler
+
+for kind, run in AI_JOB_KINDS.items():
+    job_runner.register(kind, _animal_job(run))
+
+def _herd_sweep_job(job):
+    params = json.loads(job.params) if job.params else {}
+    last_update = [0.0]
+    
+    def progress(state):
+        # Throttle progress writes to about one per second
+        if time.monotonic() - last_update[0] >= 1 or state['done'] == state['total']:
+            last_update[0] = time.monotonic()
+            job_runner.update_progress(job.id, state)
+    
+    return sweep_herd(
+        concurrency=params.get('concurrency', DEFAULT_CONCURRENCY),
+        species=params.get('species'),
+        prefilter=params.get('prefilter', True),
+        progress=progress
+    )
+
+job_runner.register('herd_anomaly_sweep', _herd_sweep_job)
+
+@app.route('/api/ai/generate_feeding_plan/<animal_tag_id>', methods=['POST'])
+def api_generate_feeding_plan(animal_tag_id):
+    animal = Animal.query.filter_by(animal_tag_id=animal_tag_id).first()
+    if not animal:
+        return jsonify({'error': 'Animal not found'}), 404
+    
+    return ai_response(run_feeding_plan(animal))
+
 @app.route('/api/ai/detect_anomalies/<animal_tag_id>', methods=['POST'])
 def api_detect_anomalies(animal_tag_id):
     animal = Animal.query.filter_by(animal_tag_id=animal_tag_id).first()
     if not animal:
         return jsonify({'error': 'Animal not found'}), 404
     
-    # Similar logic as the web route
-    fourteen_days_ago = datetime.utcnow() - timedelta(days=14)
-    
-    feeding_logs = FeedingLog.query.filter(
-        FeedingLog.animal_id == animal.id,
-        FeedingLog.timestamp >= fourteen_days_ago
-    ).order_by(FeedingLog.timestamp).all()
-    
-    health_records = HealthRecord.query.filter(
-        HealthRecord.animal_id == animal.id,
-        HealthRecord.timestamp >= fourteen_days_ago
-    ).order_by(HealthRecord.timestamp).all()
-    
-    feeding_history = []
-    for log in feeding_logs:
-        feeding_history.append(f"- {log.timestamp.strftime('%Y-%m-%d')}: {log.feed_type}, {log.quantity_kg} kg, Notes: {log.notes or 'None'}")
-    
-    health_history = []
-    for record in health_records:
-        health_history.append(f"- {record.timestamp.strftime('%Y-%m-%d')}: Weight {record.weight_kg or 'N/A'} kg, Temp {record.temperature_celsius or 'N/A'} C, Behavior: {record.behavior_observation}, Notes: {record.notes or 'None'}")
-    
-    if animal.birth_date:
-        today = datetime.utcnow().date()
-        age_days = (today - animal.birth_date).days
-        age_years = age_days / 365
-        age = f"{age_years:.1f} years ({age_days} days)"
-    else:
-        age = "Unknown"
-    
-    # Use the Gemini service to detect anomalies
-    result = gemini_service.detect_anomalies(
-        animal_tag_id=animal.animal_tag_id,
-        species=animal.species,
-        breed=animal.breed,
-        age=age,
-        feeding_history=feeding_history,
-        health_history=health_history
-    )
-    
-    # Check if we got a valid response or error
-    if "error" in result and "raw_response" in result:
-        return jsonify({'error': 'Failed to parse AI response', 'raw_response': result["raw_response"]}), 500
-    elif "error" in result:
-        return jsonify(result), 500
-    else:
-        # If anomalies detected, create alerts
-        if result.get('anomalies_detected') and len(result['anomalies_detected']) > 0:
-            for anomaly in result['anomalies_detected']:
-                alert = Alert(
-                    animal_id=animal.id,
-                    message=f"{anomaly['description']} Potential cause: {anomaly['potential_cause']}",
-                    severity=anomaly['severity'],
-                    source="AI Anomaly Detection"
-                )
-                db.session.add(alert)
-            db.session.commit()
-            
-        return jsonify(result)
+    return ai_response(run_anomaly_detection(animal))
 
 @app.route('/api/ai/health_summary/<animal_tag_id>', methods=['GET'])
 def api_health_summary(animal_tag_id):
@@ -562,64 +624,94 @@ def api_health_summary(animal_tag_id):
     if not animal:
         return jsonify({'error': 'Animal not found'}), 404
     
-    # Similar logic as the web route
-    feeding_logs = FeedingLog.query.filter_by(animal_id=animal.id).order_by(FeedingLog.timestamp).all()
-    health_records = HealthRecord.query.filter_by(animal_id=animal.id).order_by(HealthRecord.timestamp).all()
-    
-    feeding_history = []
-    for log in feeding_logs:
-        feeding_history.append(f"- {log.timestamp.strftime('%Y-%m-%d')}: {log.feed_type}, {log.quantity_kg} kg, Notes: {log.notes or 'None'}")
+    # The summary covers the animal's data up to today, and the model's wording may vary
+    validators = AnimalValidators(animal, 'health_summary', weak=True, day=datetime.utcnow().date())
+    not_modified = validators.not_modified()
+    if not_modified:
+        return not_modified
     
-    health_history = []
-    for record in health_records:
-        health_history.append(f"- {record.timestamp.strftime('%Y-%m-%d')}: Weight {record.weight_kg or 'N/A'} kg, Temp {record.temperature_celsius or 'N/A'} C, Behavior: {record.behavior_observation}, Notes: {record.notes or 'None'}")
-    
-    if animal.birth_date:
-        today = datetime.utcnow().date()
-        age_days = (today - animal.birth_date).days
-        age_years = age_days / 365
-        age = f"{age_years:.1f} years ({age_days} days)"
-    else:
-        age = "Unknown"
-    
-    earliest_date = None
-    latest_date = datetime.utcnow().date()
-    
-    if feeding_logs or health_records:
-        dates = []
-        if feeding_logs:
-            dates.extend([log.timestamp.date() for log in feeding_logs])
-        if health_records:
-            dates.extend([record.timestamp.date() for record in health_records])
-        
-        if dates:
-            earliest_date = min(dates)
+    response = ai_response(run_health_summary(animal))
+    # Errors come back as (response, status) and are not cacheable
+    return validators.apply(response) if isinstance(response, Response) else response
+
+@app.route('/api/ai/sweep_anomalies', methods=['POST'])
+def api_sweep_anomalies():
+    data = request.get_json(silent=True) or {}
     
-    # Use the Gemini service to generate health summary
-    result = gemini_service.generate_health_summary(
-        animal_tag_id=animal.animal_tag_id,
-        species=animal.species,
-        breed=animal.breed,
-        age=age,
-        feeding_history=feeding_history,
-        health_history=health_history,
-        summary_period_start=earliest_date.isoformat() if earliest_date else 'N/A',
-        summary_period_end=latest_date.isoformat()
-    )
+    try:
+        concurrency = int(data.get('concurrency', DEFAULT_CONCURRENCY))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'concurrency must be an integer'}), 400
+    
+    job = job_runner.submit('herd_anomaly_sweep', params={
+        'concurrency': concurrency,
+        'species': data.get('species'),
+        'prefilter': bool(data.get('prefilter', True))
+    })
+    return jsonify(job.to_dict()), 202, {'Location': url_for('api_get_ai_job', job_id=job.id)}
+
+@app.route('/api/ai/jobs', methods=['POST'])
+def api_submit_ai_job():
+    data = request.json or {}
+    
+    kind = data.get('kind')
+    if kind not in AI_JOB_KINDS:
+        return jsonify({'error': f"kind must be one of: {', '.join(AI_JOB_KINDS)}"}), 400
+    if not Animal.query.filter_by(animal_tag_id=data.get('animal_tag_id')).first():
+        return jsonify({'error': 'Animal not found'}), 404
     
-    # Check if we got a valid response or error
-    if "error" in result and "raw_response" in result:
-        return jsonify({'error': 'Failed to parse AI response', 'raw_response': result["raw_response"]}), 500
-    elif "error" in result:
-        return jsonify(result), 500
-    else:
-        return jsonify(result)
+    job = job_runner.submit(kind, animal_tag_id=data['animal_tag_id'])
+    return jsonify(job.to_dict()), 202, {'Location': url_for('api_get_ai_job', job_id=job.id)}
+
+@app.route('/api/ai/jobs/<job_id>', methods=['GET'])
+def api_get_ai_job(job_id):
+    job = db.session.get(AIJob, job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/ai/cache_stats', methods=['GET'])
+def api_ai_cache_stats():
+    return jsonify(result_cache.stats())
+
+@app.route('/api/ai/guard_status', methods=['GET'])
+def api_ai_guard_status():
+    return jsonify(gemini_guard.status())
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
+
+@app.cli.command('sweep-anomalies')
+@click.option('--concurrency', default=DEFAULT_CONCURRENCY, show_default=True, help='Maximum concurrent Gemini calls.')
+@click.option('--species', default=None, help='Only sweep animals of this species.')
+@click.option('--prefilter/--no-prefilter', default=True, show_default=True,
+              help='Only send animals flagged by the statistical screen to Gemini.')
+def sweep_anomalies_command(concurrency, species, prefilter):
+    """Run AI anomaly detection across the whole herd."""
+    def progress(state):
+        last = state['last']
+        outcome = f"{last.get('anomalies', 0)} anomalies" if last['status'] == 'ok' else last['error']
+        click.echo(f"[{state['done']}/{state['total']}] {last['animal_tag_id']}: {outcome} ({last['latency_seconds']}s)")
+    
+    report = sweep_herd(concurrency=concurrency, species=species, prefilter=prefilter, progress=progress)
+    report.pop('results')
+    click.echo(json.dumps(report, indent=2))
+
+@app.cli.command('apply-retention')
+@click.option('--days', default=RETENTION_DAYS, show_default=True, help='Days of history to keep in the database.')
+@click.option('--batch-size', default=None, type=int, help='Rows archived per transaction.')
+def apply_retention_command(days, batch_size):
+    """Move feeding logs and health records older than the retention period into the archive."""
+    report = apply_retention(days=days, batch_size=batch_size)
+    click.echo(json.dumps(report, indent=2))
 
-# Database initialization
+# Database initialization (creates tables and upgrades older schemas in place)
 with app.app_context():
-    db.create_all()
+    upgrade_database()
+    # Pick up AI jobs queued or interrupted before the last restart
+    job_runner.resume_pending()
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
     app.run(debug=False, host='0.0.0.0', port=5006)
\ No newline at end of file
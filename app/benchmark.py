@@ -0,0 +1,306 @@
+import os
+import glob
+import json
+import math
+import time
+import random
+import argparse
+import platform
+import subprocess
+import threading
+import urllib.error
+import urllib.request
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+# Load benchmark for the web pages and API. Each scenario is requested a fixed
+# number of times at a given concurrency against a running server (--url), or
+# against this app served in-process when no URL is given. Results are written
+# as JSON so runs of different versions can be compared with --compare.
+
+# (name, path); {tag} is replaced by a random animal tag for each request
+SCENARIOS = [
+    ('dashboard', '/'),
+    ('animals_page', '/animals'),
+    ('animal_page', '/animals/{tag}'),
+    ('api_animals', '/api/animals'),
+    ('api_animal', '/api/animals/{tag}'),
+    ('api_feeding_logs', '/api/animals/{tag}/feeding_logs'),
+    ('api_health_records', '/api/animals/{tag}/health_records'),
+    ('api_dashboard', '/api/dashboard'),
+    ('api_alerts', '/api/alerts'),
+]
+
+# Gemini-backed endpoints, only run with --include-ai
+AI_SCENARIOS = [
+    ('ai_feeding_plan', '/animals/{tag}/feeding_plan?stream=0'),
+    ('ai_health_summary', '/api/ai/health_summary/{tag}'),
+]
+
+TAG_SAMPLE_SIZE = 1000
+REQUEST_TIMEOUT_SECONDS = 120
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a list of numbers.
+
+    Args:
+        values (list): Samples, in any order
+        fraction (float): Percentile as a fraction, e.g. 0.95
+
+    Returns:
+        float: The percentile, or None for an empty list
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+def run_scenario(base_url, path, tags, requests, concurrency, rng):
+    """
+    Request one path repeatedly and summarize the latencies.
+
+    Args:
+        base_url (str): Server root, e.g. http://127.0.0.1:5000
+        path (str): Path template, possibly containing {tag}
+        tags (list): Animal tags to substitute for {tag}
+        requests (int): Number of requests
+        concurrency (int): Requests in flight at once
+        rng (random.Random): Source of the tags picked for each request
+
+    Returns:
+        dict: Request and error counts, status codes, latency percentiles (ms) and throughput
+    """
+    urls = [base_url + path.format(tag=rng.choice(tags) if tags else '') for _ in range(requests)]
+
+    def fetch(url):
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=REQUEST_TIMEOUT_SECONDS) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except Exception:
+            status = 0
+        return status, (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(fetch, urls))
+    elapsed = time.perf_counter() - started
+
+    latencies = [ms for _, ms in results]
+    statuses = {}
+    for status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        'requests': requests,
+        'errors': sum(count for status, count in statuses.items() if not status.startswith(('2', '3'))),
+        'statuses': statuses,
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'max_ms': round(max(latencies), 2),
+        'throughput_rps': round(requests / elapsed, 2) if elapsed else None
+    }
+
+
+def run_benchmark(base_url, scenarios, tags, requests=200, concurrency=8, seed=42, server_pid=None):
+    """
+    Run every scenario in turn and collect the results with run metadata.
+
+    Args:
+        base_url (str): Server root
+        scenarios (list): (name, path) pairs
+        tags (list): Animal tags to request
+        requests (int, optional): Requests per scenario
+        concurrency (int, optional): Requests in flight at once
+        seed (int, optional): Seed for picking tags, so runs request the same animals
+        server_pid (int, optional): Server process, such as the gunicorn master, whose memory
+            and that of its workers to report; memory is not reported without it
+
+    Returns:
+        dict: 'meta' describing the run and 'scenarios' keyed by name
+    """
+    rng = random.Random(seed)
+    results = {}
+    for name, path in scenarios:
+        results[name] = run_scenario(base_url, path, tags, requests, concurrency, rng)
+        results[name]['server_rss_mb'] = server_memory_mb(server_pid, 'VmRSS')
+        print(f"{name:20} p50 {results[name]['p50_ms']:>9.1f} ms  p95 {results[name]['p95_ms']:>9.1f} ms  "
+              f"p99 {results[name]['p99_ms']:>9.1f} ms  {results[name]['throughput_rps']:>8.1f} req/s  "
+              f"errors {results[name]['errors']}")
+
+    return {
+        'meta': {
+            'started_at': datetime.utcnow().isoformat(),
+            'version': _git_version(),
+            'python': platform.python_version(),
+            'url': base_url,
+            'requests': requests,
+            'concurrency': concurrency,
+            'animals_sampled': len(tags),
+            # Each process's high-water mark since it started, so it includes earlier runs too
+            'peak_rss_mb_cumulative': server_memory_mb(server_pid, 'VmHWM')
+        },
+        'scenarios': results
+    }
+
+
+def server_processes(pid):
+    """
+    A process and all of its descendants, such as a gunicorn master and its workers.
+
+    Args:
+        pid (int): Root process
+
+    Returns:
+        list: Process ids, the root first
+    """
+    children = {}
+    for status_path in glob.glob('/proc/[0-9]*/status'):
+        ppid = _status_field(status_path, 'PPid')
+        if ppid is not None:
+            children.setdefault(ppid, []).append(int(status_path.split('/')[2]))
+
+    pids = [pid]
+    for parent in pids:
+        pids.extend(children.get(parent, []))
+    return pids
+
+
+def server_memory_mb(pid, field):
+    """
+    Sum a memory figure over a server process and its descendants.
+
+    Args:
+        pid (int): Server process, or None if unknown
+        field (str): /proc status field in KiB, 'VmRSS' for current or 'VmHWM' for peak resident memory
+
+    Returns:
+        float: The total in MiB, or None if no server process is known or it cannot be read
+    """
+    if pid is None:
+        return None
+    values = [_status_field(f'/proc/{process}/status', field) for process in server_processes(pid)]
+    values = [value for value in values if value is not None]
+    return round(sum(values) / 1024, 1) if values else None
+
+
+def compare(previous, current):
+    """
+    Print the change in p95 latency and throughput per scenario between two runs.
+
+    Args:
+        previous (dict): Results of the earlier run
+        current (dict): Results of this run
+    """
+    print(f"\nCompared with {previous['meta'].get('version')} ({previous['meta'].get('started_at')}):")
+    for name, result in current['scenarios'].items():
+        before = previous['scenarios'].get(name)
+        if not before:
+            continue
+        p95 = _change(before['p95_ms'], result['p95_ms'])
+        throughput = _change(before['throughput_rps'], result['throughput_rps'])
+        print(f"{name:20} p95 {p95:>8}  throughput {throughput:>8}")
+
+
+def _change(before, after):
+    if not before or after is None:
+        return 'n/a'
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def _status_field(status_path, field):
+    try:
+        with open(status_path) as status:
+            for line in status:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _git_version():
+    try:
+        return subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _fetch_tags(base_url, limit):
+    with urllib.request.urlopen(f"{base_url}/api/animals?limit={limit}", timeout=REQUEST_TIMEOUT_SECONDS) as response:
+        return [animal['animal_tag_id'] for animal in json.load(response)['items']]
+
+
+def _serve_in_process():
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from app import app
+
+    class QuietHandler(WSGIRequestHandler):
+        # Access log lines would dominate the output and slow the server down
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Farm Assistant pages and API.')
+    parser.add_argument('--url', help='Base URL of a running server; by default the app is served in-process')
+    parser.add_argument('--server-pid', type=int,
+                        help='PID of the server (the gunicorn master), to report its and its workers\' memory')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario (default 200)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Requests in flight at once (default 8)')
+    parser.add_argument('--scenario', action='append', help='Only run the named scenario (repeatable)')
+    parser.add_argument('--include-ai', action='store_true', help='Also run the Gemini-backed endpoints')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for picking animals (default 42)')
+    parser.add_argument('--output', help='Where to write the JSON results (default benchmark-<version>-<time>.json)')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    args = parser.parse_args()
+
+    server = None
+    server_pid = args.server_pid
+    base_url = args.url.rstrip('/') if args.url else None
+    if base_url is None:
+        server, base_url = _serve_in_process()
+        # The in-process server shares this process, client threads included
+        server_pid = server_pid or os.getpid()
+
+    scenarios = SCENARIOS + (AI_SCENARIOS if args.include_ai else [])
+    if args.scenario:
+        scenarios = [scenario for scenario in scenarios if scenario[0] in args.scenario]
+
+    try:
+        tags = _fetch_tags(base_url, TAG_SAMPLE_SIZE)
+        results = run_benchmark(base_url, scenarios, tags, args.requests, args.concurrency, args.seed, server_pid)
+    finally:
+        if server:
+            server.shutdown()
+
+    output = args.output or f"benchmark-{results['meta']['version'] or 'unknown'}-{datetime.utcnow():%Y%m%dT%H%M%S}.json"
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    peak = results['meta']['peak_rss_mb_cumulative']
+    if peak is None:
+        print(f"Server memory not measured; pass --server-pid. Results written to {output}")
+    else:
+        print(f"Server peak RSS since start (all processes): {peak} MiB. Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import os
+import tempfile
+
+# Keep test runs away from the data files under instance/
+_test_dir = tempfile.mkdtemp(prefix='farm-assistant-tests-')
+os.environ.setdefault('AI_CACHE_PATH', os.path.join(_test_dir, 'ai_cache.db'))
+os.environ.setdefault('GEMINI_MODEL_CACHE_PATH', os.path.join(_test_dir, 'gemini_model.json'))
+os.environ.setdefault('GEMINI_GUARD_PATH', os.path.join(_test_dir, 'gemini_guard.db'))
+os.environ.setdefault('RETENTION_ARCHIVE_DIR', os.path.join(_test_dir, 'archive'))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_test_dir, 'farm_assistant.db'))
+
+# Imported after the paths above are set, since services read them at import
+from flask import Flask
+from models.models import db
+from models.migrations import upgrade_database
+from services.animal_context import animal_contexts
+from services.history_events import register_history_events
+
+
+def make_app(*animals, database_uri='sqlite://'):
+    """
+    Create a throwaway app bound to its own database, upgraded like a real start.
+
+    Args:
+        *animals (Animal): Animals to add before returning
+        database_uri (str, optional): Database to bind, defaults to a fresh in-memory one
+
+    Returns:
+        Flask: The app, with the history listeners attached
+    """
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    register_history_events()
+    # Contexts are keyed by animal id, which every fresh database reuses
+    animal_contexts.clear()
+    with app.app_context():
+        upgrade_database()
+        db.session.add_all(animals)
+        db.session.commit()
+    return app
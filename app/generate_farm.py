@@ -0,0 +1,173 @@
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select
+from models.models import db, Animal, FeedingLog, HealthRecord
+from models.migrations import upgrade_database
+from services.rollups import backfill_rollups
+from services.feed_catalog import backfill_feed_types, invalidate
+from seed_db import app, species_breeds, feed_types
+
+# Synthetic large-farm dataset for load tests and benchmarks. Unlike seed_db.py,
+# rows are generated in memory and written with one executemany per batch, and
+# the daily rollups and feed catalog are rebuilt once at the end. The same seed
+# always produces the same herd and history, relative to the day it is run.
+
+# Daily intake (kg) and body weight (kg) ranges per species
+INTAKE_KG = {'Cow': (15.0, 25.0), 'Pig': (3.0, 8.0), 'Chicken': (0.1, 0.3), 'Sheep': (2.0, 5.0), 'Goat': (2.0, 4.0)}
+WEIGHT_KG = {'Cow': (450, 750), 'Pig': (90, 250), 'Chicken': (1.5, 3.5), 'Sheep': (45, 100), 'Goat': (40, 90)}
+NORMAL_TEMPERATURE = {'Cow': 38.6, 'Pig': 39.2, 'Chicken': 41.2, 'Sheep': 39.1, 'Goat': 39.3}
+HEALTHY_BEHAVIORS = ['Active', 'Normal', 'Calm']
+
+# Anomalous animals eat less and run a fever over their last days of history
+ANOMALY_DAYS = 7
+ANOMALY_INTAKE_FACTOR = 0.6
+ANOMALY_FEVER = 1.5
+
+TAG_PREFIX = 'SYN'
+
+
+def generate_farm(animals=1000, days=90, feedings_per_day=2, health_interval_days=3, anomaly_rate=0.02,
+                  seed=42, batch_size=5000):
+    """
+    Generate a synthetic herd with feeding and health history.
+
+    Args:
+        animals (int, optional): Number of animals
+        days (int, optional): Days of history per animal, ending today
+        feedings_per_day (int, optional): Feeding logs per animal per day
+        health_interval_days (int, optional): Days between health records of an animal
+        anomaly_rate (float, optional): Fraction of animals given an anomalous last week
+        seed (int, optional): Random seed; the same seed yields the same data
+        batch_size (int, optional): Rows written per executemany
+
+    Returns:
+        dict: Counts of generated rows, the anomalous tags and the time taken
+    """
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    end = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    species_names = sorted(species_breeds)
+
+    herd = []
+    for n in range(animals):
+        species = rng.choice(species_names)
+        herd.append({
+            'animal_tag_id': f"{TAG_PREFIX}-{species.upper()}-{n:06d}",
+            'species': species,
+            'breed': rng.choice(species_breeds[species]),
+            'birth_date': (end - timedelta(days=rng.randint(120, 2500))).date(),
+            'notes': None
+        })
+    _write(insert(Animal), herd, batch_size)
+    ids = dict(db.session.execute(
+        select(Animal.animal_tag_id, Animal.id).where(Animal.animal_tag_id.like(f"{TAG_PREFIX}-%"))
+    ).all())
+
+    anomalous = []
+    feeding_rows = []
+    health_rows = []
+    counts = {'feeding_logs': 0, 'health_records': 0}
+    for animal in herd:
+        animal_id = ids[animal['animal_tag_id']]
+        species = animal['species']
+        is_anomalous = rng.random() < anomaly_rate
+        if is_anomalous:
+            anomalous.append(animal['animal_tag_id'])
+        daily_kg = rng.uniform(*INTAKE_KG[species])
+        weight = rng.uniform(*WEIGHT_KG[species])
+        diet = rng.sample(feed_types[species], 2)
+
+        for day in range(days):
+            day_start = end - timedelta(days=days - day)
+            sick = is_anomalous and day >= days - ANOMALY_DAYS
+            for feeding in range(feedings_per_day):
+                quantity = daily_kg / feedings_per_day * rng.uniform(0.85, 1.15)
+                if sick:
+                    quantity *= ANOMALY_INTAKE_FACTOR
+                feeding_rows.append({
+                    'animal_id': animal_id,
+                    'timestamp': day_start + timedelta(hours=6 + feeding * 12 // feedings_per_day,
+                                                       minutes=rng.randint(0, 59)),
+                    'feed_type': diet[feeding % len(diet)],
+                    'quantity_kg': round(quantity, 2),
+                    'notes': None
+                })
+
+            if day % health_interval_days == 0:
+                weight *= rng.uniform(0.995, 1.008)
+                temperature = NORMAL_TEMPERATURE[species] + rng.gauss(0, 0.3) + (ANOMALY_FEVER if sick else 0)
+                health_rows.append({
+                    'animal_id': animal_id,
+                    'timestamp': day_start + timedelta(hours=9, minutes=rng.randint(0, 59)),
+                    'weight_kg': round(weight, 1),
+                    'temperature_celsius': round(temperature, 1),
+                    'behavior_observation': 'Lethargic' if sick else rng.choice(HEALTHY_BEHAVIORS),
+                    'notes': None
+                })
+
+            if len(feeding_rows) >= batch_size:
+                counts['feeding_logs'] += _write(insert(FeedingLog), feeding_rows, batch_size)
+                feeding_rows = []
+            if len(health_rows) >= batch_size:
+                counts['health_records'] += _write(insert(HealthRecord), health_rows, batch_size)
+                health_rows = []
+
+    counts['feeding_logs'] += _write(insert(FeedingLog), feeding_rows, batch_size)
+    counts['health_records'] += _write(insert(HealthRecord), health_rows, batch_size)
+
+    # Derived tables are rebuilt set-wise rather than maintained row by row
+    with db.engine.begin() as connection:
+        backfill_rollups(connection)
+        backfill_feed_types(connection)
+    invalidate()
+
+    return {
+        'animals': len(herd),
+        'feeding_logs': counts['feeding_logs'],
+        'health_records': counts['health_records'],
+        'anomalous': anomalous,
+        'seconds': round(time.perf_counter() - started, 2)
+    }
+
+
+def _write(stmt, rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(stmt, rows[start:start + batch_size])
+        db.session.commit()
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic large-farm dataset.')
+    parser.add_argument('--animals', type=int, default=1000, help='Number of animals (default 1000)')
+    parser.add_argument('--days', type=int, default=90, help='Days of history per animal (default 90)')
+    parser.add_argument('--feedings-per-day', type=int, default=2, help='Feeding logs per animal per day (default 2)')
+    parser.add_argument('--health-interval', type=int, default=3, help='Days between health records (default 3)')
+    parser.add_argument('--anomaly-rate', type=float, default=0.02, help='Fraction of anomalous animals (default 0.02)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (default 42)')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Rows per insert batch (default 5000)')
+    parser.add_argument('--reset', action='store_true', help='Drop all data before generating')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+        upgrade_database()
+        if Animal.query.filter(Animal.animal_tag_id.like(f"{TAG_PREFIX}-%")).first():
+            print("Synthetic animals already exist; run with --reset to regenerate.")
+            return
+
+        summary = generate_farm(
+            animals=args.animals, days=args.days, feedings_per_day=args.feedings_per_day,
+            health_interval_days=args.health_interval, anomaly_rate=args.anomaly_rate,
+            seed=args.seed, batch_size=args.batch_size
+        )
+        print(f"Generated {summary['animals']} animals, {summary['feeding_logs']} feeding logs and "
+              f"{summary['health_records']} health records ({len(summary['anomalous'])} anomalous) "
+              f"in {summary['seconds']} s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import os
+import shutil
+
+# Gunicorn settings read automatically from the working directory. Each worker
+# keeps its Prometheus samples in PROMETHEUS_MULTIPROC_DIR so /metrics can
+# aggregate them; the directory is emptied when the server starts.
+
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/farm-assistant-metrics')
+
+
+def on_starting(server):
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    # Imported here so prometheus_client reads PROMETHEUS_MULTIPROC_DIR after it is set
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,162 @@
+import os
+from dotenv import load_dotenv
+from sqlalchemy import event, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from models.models import db
+
+# Settings may come from .env, which is otherwise loaded after this module
+load_dotenv()
+
+# Relative SQLite paths are resolved against the Flask instance folder
+DEFAULT_DATABASE_URL = 'sqlite:///farm_assistant.db'
+
+# Pool settings, used for PostgreSQL and file-backed SQLite
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+
+# PostgreSQL timeouts; a statement timeout of 0 means none
+DB_CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', '10'))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '0'))
+
+# SQLite tuning applied to every new connection
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+
+
+def database_url():
+    """
+    Get the database URL from DATABASE_URL, defaulting to the local SQLite file.
+
+    Returns:
+        str: SQLAlchemy database URL
+    """
+    url = os.getenv('DATABASE_URL') or DEFAULT_DATABASE_URL
+    # Hosting providers often hand out the scheme SQLAlchemy no longer accepts
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def engine_options(url):
+    """
+    Build the engine options for a database URL.
+
+    Args:
+        url (str): SQLAlchemy database URL
+
+    Returns:
+        dict: Keyword arguments for create_engine
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+
+    if backend == 'sqlite':
+        if parsed.database in (None, '', ':memory:'):
+            # In-memory databases live in a single connection; keep Flask-SQLAlchemy's defaults
+            return {}
+        return {
+            'pool_size': DB_POOL_SIZE,
+            'max_overflow': DB_MAX_OVERFLOW,
+            'pool_timeout': DB_POOL_TIMEOUT,
+            'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000, 'check_same_thread': False}
+        }
+
+    options = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': True
+    }
+    if backend == 'postgresql':
+        connect_args = {'connect_timeout': DB_CONNECT_TIMEOUT}
+        if DB_STATEMENT_TIMEOUT_MS:
+            connect_args['options'] = f'-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}'
+        options['connect_args'] = connect_args
+    return options
+
+
+def configure_database(app, url=None):
+    """
+    Point the app at its database and bind the shared SQLAlchemy instance to it.
+
+    Args:
+        app: The Flask application
+        url (str, optional): Database URL, defaults to DATABASE_URL
+    """
+    url = url or database_url()
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url)
+    db.init_app(app)
+
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name == 'sqlite' and not event.contains(engine, 'connect', _tune_sqlite):
+            event.listen(engine, 'connect', _tune_sqlite)
+
+
+def _tune_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        # WAL lets readers keep going while a writer commits; it is a no-op for in-memory databases
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+        cursor.execute(f'PRAGMA synchronous={SQLITE_SYNCHRONOUS}')
+        cursor.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+    finally:
+        cursor.close()
+
+
+def dialect_insert(bind, table):
+    """
+    Build an INSERT that supports ON CONFLICT clauses on the bound database.
+
+    Args:
+        bind: Session, Connection or Engine the statement will run on
+        table: Table to insert into
+
+    Returns:
+        Insert: A PostgreSQL or SQLite insert statement
+    """
+    engine = bind.get_bind() if hasattr(bind, 'get_bind') else bind
+    if engine.dialect.name == 'postgresql':
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+def least_greatest(bind):
+    """
+    Get the two-argument minimum and maximum functions of the bound database.
+
+    SQLite's two-argument min()/max() are scalar functions; PostgreSQL spells
+    them least()/greatest().
+
+    Args:
+        bind: Session, Connection or Engine the expressions will run on
+
+    Returns:
+        tuple: (least, greatest) SQL function generators
+    """
+    engine = bind.get_bind() if hasattr(bind, 'get_bind') else bind
+    if engine.dialect.name == 'postgresql':
+        return func.least, func.greatest
+    return func.min, func.max
+
+
+def row_value(row, name):
+    """
+    Read a column from a row written either through the ORM or as a bulk-insert dict.
+
+    Args:
+        row: Model instance or dict of column values
+        name (str): Column name
+
+    Returns:
+        The column's value
+    """
+    return row[name] if isinstance(row, dict) else getattr(row, name)
@@ -0,0 +1,181 @@
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+from models.database import SQLITE_BUSY_TIMEOUT_MS
+from models.models import db, FeedingLog, HealthRecord, Alert, SchemaVersion, SEVERITY_RANKS
+from services.feed_catalog import backfill_feed_types
+from services.rollups import backfill_rollups
+from services.retention import backfill_archive_ranges
+from services.search import create_search_index, rebuild_search_index
+
+# Each migration upgrades a database created by an older release in place.
+# Several gunicorn workers may start at once, so the whole upgrade runs under a
+# database-wide lock and the schema version is read only once it is held;
+# migrations are still idempotent in case a run is interrupted. Brand-new tables
+# need no migration, create_all() adds them to old databases.
+
+# How long a starting worker waits for another one to finish upgrading
+MIGRATION_LOCK_TIMEOUT_SECONDS = int(os.getenv('MIGRATION_LOCK_TIMEOUT_SECONDS', '600'))
+
+# Key of the PostgreSQL advisory lock held while upgrading
+MIGRATION_LOCK_KEY = 0x6661726d
+
+
+def _column_type(connection, column_type):
+    # DDL spelling of a column type on this database, e.g. DATETIME on SQLite, TIMESTAMP on PostgreSQL
+    return column_type.compile(dialect=connection.dialect)
+
+
+def _create_indexes(connection, model, *names):
+    # Indexes are named, so a migration only creates those of its own version
+    for index in model.__table__.indexes:
+        if index.name in names:
+            connection.execute(CreateIndex(index, if_not_exists=True))
+
+
+def _add_time_series_indexes(connection):
+    """Composite (animal_id, timestamp) indexes and the unacknowledged-alert partial index."""
+    _create_indexes(connection, FeedingLog, 'ix_feeding_log_animal_timestamp')
+    _create_indexes(connection, HealthRecord, 'ix_health_record_animal_timestamp')
+    _create_indexes(connection, Alert, 'ix_alert_animal_timestamp', 'ix_alert_unacknowledged_timestamp')
+
+
+def _add_job_progress(connection):
+    """Progress reporting column for long-running AI jobs."""
+    columns = {column['name'] for column in inspect(connection).get_columns('ai_job')}
+    if 'progress' not in columns:
+        connection.execute(text('ALTER TABLE ai_job ADD COLUMN progress TEXT'))
+
+
+def _backfill_daily_rollups(connection):
+    """Daily feeding and health rollups built from the existing history."""
+    backfill_rollups(connection)
+
+
+def _add_animal_data_version(connection):
+    """Per-animal data version used to key derived data."""
+    columns = {column['name'] for column in inspect(connection).get_columns('animal')}
+    if 'data_version' not in columns:
+        connection.execute(text('ALTER TABLE animal ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0'))
+
+
+def _backfill_feed_type_catalog(connection):
+    """Per-species feed-type catalog built from the existing feeding logs."""
+    backfill_feed_types(connection)
+
+
+def _add_animal_version(connection):
+    """Per-animal version and modification time used to validate HTTP responses."""
+    columns = {column['name'] for column in inspect(connection).get_columns('animal')}
+    if 'version' not in columns:
+        connection.execute(text('ALTER TABLE animal ADD COLUMN version INTEGER NOT NULL DEFAULT 0'))
+    if 'modified_at' not in columns:
+        connection.execute(text(f'ALTER TABLE animal ADD COLUMN modified_at {_column_type(connection, db.DateTime())}'))
+    connection.execute(text('UPDATE animal SET modified_at = :now WHERE modified_at IS NULL'), {'now': datetime.utcnow()})
+
+
+def _index_existing_history(connection):
+    """Full-text search index over the existing notes and observations."""
+    rebuild_search_index(connection)
+
+
+def _add_alert_severity_rank(connection):
+    """Stored severity rank and the index the dashboard reads alerts in order from."""
+    columns = {column['name'] for column in inspect(connection).get_columns('alert')}
+    if 'severity_rank' not in columns:
+        connection.execute(text('ALTER TABLE alert ADD COLUMN severity_rank INTEGER NOT NULL DEFAULT 0'))
+    ranks = ' '.join(f"WHEN '{name}' THEN {rank}" for name, rank in SEVERITY_RANKS.items())
+    connection.execute(text(f'UPDATE alert SET severity_rank = CASE lower(severity) {ranks} ELSE 0 END'))
+    _create_indexes(connection, Alert, 'ix_alert_unacknowledged_severity')
+
+
+def _add_archive_animal_ranges(connection):
+    """Animal range of each archive file and each animal's archived horizon."""
+    columns = {column['name'] for column in inspect(connection).get_columns('history_archive')}
+    for name in ('min_animal_id', 'max_animal_id'):
+        if name not in columns:
+            connection.execute(text(f'ALTER TABLE history_archive ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0'))
+    columns = {column['name'] for column in inspect(connection).get_columns('animal')}
+    if 'archived_through' not in columns:
+        connection.execute(text(f'ALTER TABLE animal ADD COLUMN archived_through {_column_type(connection, db.DateTime())}'))
+    backfill_archive_ranges(connection)
+
+
+def _add_job_heartbeat(connection):
+    """Heartbeat renewed while an AI job runs, so live jobs are never requeued."""
+    columns = {column['name'] for column in inspect(connection).get_columns('ai_job')}
+    if 'heartbeat_at' not in columns:
+        connection.execute(text(f'ALTER TABLE ai_job ADD COLUMN heartbeat_at {_column_type(connection, db.DateTime())}'))
+    connection.execute(text("UPDATE ai_job SET heartbeat_at = started_at WHERE heartbeat_at IS NULL AND status = 'running'"))
+
+
+MIGRATIONS = [
+    (1, 'Composite time-series indexes', _add_time_series_indexes),
+    (2, 'AI job progress', _add_job_progress),
+    (3, 'Daily rollups', _backfill_daily_rollups),
+    (4, 'Animal data version', _add_animal_data_version),
+    (5, 'Feed type catalog', _backfill_feed_type_catalog),
+    (6, 'Animal version', _add_animal_version),
+    (7, 'Full-text search index', _index_existing_history),
+    (8, 'Alert severity rank', _add_alert_severity_rank),
+    (9, 'Archive animal ranges', _add_archive_animal_ranges),
+    (10, 'AI job heartbeat', _add_job_heartbeat),
+]
+
+
+def upgrade_database():
+    """
+    Create missing tables and apply pending schema migrations.
+
+    A brand-new database is created from the current models and stamped with the
+    latest version; an existing one gets every migration newer than its version.
+
+    Returns:
+        list: Versions applied by this call
+    """
+    applied = []
+    with db.engine.connect() as connection, _schema_lock(connection):
+        fresh = not inspect(connection).has_table('animal')
+        db.metadata.create_all(connection)
+        # The FTS table and its triggers are not models; creating them is idempotent
+        create_search_index(connection)
+        if fresh:
+            # drop_all() leaves the FTS table behind, with entries for rows that are gone
+            rebuild_search_index(connection)
+
+        done = set(connection.execute(db.select(SchemaVersion.version)).scalars())
+        for version, description, migrate in MIGRATIONS:
+            if version in done:
+                continue
+            if not fresh:
+                migrate(connection)
+            connection.execute(db.insert(SchemaVersion).values(version=version, description=description))
+            applied.append(version)
+
+    if applied:
+        print(f"Database upgraded to schema version {applied[-1]}")
+    return applied
+
+
+@contextmanager
+def _schema_lock(connection):
+    # One transaction holding a lock no other upgrade can take until it commits:
+    # BEGIN EXCLUSIVE on SQLite, which in WAL mode still lets requests read, and
+    # a transaction-scoped advisory lock on PostgreSQL
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        connection.exec_driver_sql(f'PRAGMA busy_timeout = {MIGRATION_LOCK_TIMEOUT_SECONDS * 1000}')
+        connection.commit()
+    try:
+        with connection.begin():
+            if dialect == 'sqlite':
+                connection.exec_driver_sql('BEGIN EXCLUSIVE')
+            elif dialect == 'postgresql':
+                connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': MIGRATION_LOCK_KEY})
+            yield
+    finally:
+        if dialect == 'sqlite':
+            connection.exec_driver_sql(f'PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}')
+            connection.commit()
@@ -1,4 +1,6 @@
+import json
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
 from datetime import datetime
 
 db = SQLAlchemy()
@@ -10,10 +12,19 @@ class Animal(db.Model):
     breed = db.Column(db.String(50))
     birth_date = db.Column(db.Date, nullable=False)
     notes = db.Column(db.Text)
+    # Bumped whenever the animal or its history changes, so derived data can be keyed on it
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Bumped on any write to the animal, its history or its alerts; HTTP responses are validated against it
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    modified_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Latest timestamp among the animal's archived history rows; None if nothing is archived
+    archived_through = db.Column(db.DateTime)
     
     feeding_logs = db.relationship('FeedingLog', backref='animal', lazy=True, cascade="all, delete-orphan")
     health_records = db.relationship('HealthRecord', backref='animal', lazy=True, cascade="all, delete-orphan")
     alerts = db.relationship('Alert', backref='animal', lazy=True, cascade="all, delete-orphan")
+    feeding_rollups = db.relationship('DailyFeedingRollup', lazy=True, cascade="all, delete-orphan")
+    health_rollups = db.relationship('DailyHealthRollup', lazy=True, cascade="all, delete-orphan")
     
     def to_dict(self):
         return {
@@ -27,6 +38,10 @@ class Animal(db.Model):
 
 
 class FeedingLog(db.Model):
+    __table_args__ = (
+        db.Index('ix_feeding_log_animal_timestamp', 'animal_id', 'timestamp'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     animal_id = db.Column(db.Integer, db.ForeignKey('animal.id'), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -46,6 +61,10 @@ class FeedingLog(db.Model):
 
 
 class HealthRecord(db.Model):
+    __table_args__ = (
+        db.Index('ix_health_record_animal_timestamp', 'animal_id', 'timestamp'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     animal_id = db.Column(db.Integer, db.ForeignKey('animal.id'), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -66,12 +85,38 @@ class HealthRecord(db.Model):
         }
 
 
+# Dashboard order of alert severities, most severe highest; anything else ranks 0
+SEVERITY_RANKS = {'high': 3, 'medium': 2, 'low': 1}
+
+
+def severity_rank(severity):
+    """Rank of a severity name, case-insensitively."""
+    return SEVERITY_RANKS.get((severity or '').lower(), 0)
+
+
+def _default_severity_rank(context):
+    return severity_rank(context.get_current_parameters().get('severity'))
+
+
 class Alert(db.Model):
+    __table_args__ = (
+        db.Index('ix_alert_animal_timestamp', 'animal_id', 'timestamp'),
+        # Partial indexes: only unacknowledged alerts are ever listed on the dashboard
+        db.Index('ix_alert_unacknowledged_timestamp', 'timestamp',
+                 sqlite_where=text('acknowledged = 0'),
+                 postgresql_where=text('acknowledged = false')),
+        db.Index('ix_alert_unacknowledged_severity', 'severity_rank', 'timestamp',
+                 sqlite_where=text('acknowledged = 0'),
+                 postgresql_where=text('acknowledged = false')),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     animal_id = db.Column(db.Integer, db.ForeignKey('animal.id'), nullable=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     message = db.Column(db.Text, nullable=False)
     severity = db.Column(db.String(20), nullable=False)
+    # Set from severity on insert, so the dashboard sorts by an indexed column
+    severity_rank = db.Column(db.Integer, nullable=False, default=_default_severity_rank, server_default='0')
     source = db.Column(db.String(50), nullable=False)
     acknowledged = db.Column(db.Boolean, default=False, nullable=False)
     
@@ -84,4 +129,142 @@ class Alert(db.Model):
             'severity': self.severity,
             'source': self.source,
             'acknowledged': self.acknowledged
-        }
\ No newline at end of file
+        }
+
+
+
+
+# Per-animal daily totals per feed type, maintained as feeding logs are inserted
+class DailyFeedingRollup(db.Model):
+    animal_id = db.Column(db.Integer, db.ForeignKey('animal.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    feed_type = db.Column(db.String(50), primary_key=True)
+    total_kg = db.Column(db.Float, default=0, nullable=False)
+    feedings = db.Column(db.Integer, default=0, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'animal_id': self.animal_id,
+            'day': self.day.isoformat(),
+            'feed_type': self.feed_type,
+            'total_kg': self.total_kg,
+            'feedings': self.feedings
+        }
+
+
+# Feed types recorded for each species, maintained as feeding logs are inserted
+class FeedTypeCatalog(db.Model):
+    species = db.Column(db.String(50), primary_key=True)
+    feed_type = db.Column(db.String(50), primary_key=True)
+    first_seen = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+# Per-animal daily health aggregates, maintained as health records are inserted
+class DailyHealthRollup(db.Model):
+    animal_id = db.Column(db.Integer, db.ForeignKey('animal.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    observations = db.Column(db.Integer, default=0, nullable=False)
+    weight_count = db.Column(db.Integer, default=0, nullable=False)
+    weight_sum = db.Column(db.Float, default=0, nullable=False)
+    weight_min = db.Column(db.Float)
+    weight_max = db.Column(db.Float)
+    temperature_count = db.Column(db.Integer, default=0, nullable=False)
+    temperature_sum = db.Column(db.Float, default=0, nullable=False)
+    temperature_min = db.Column(db.Float)
+    temperature_max = db.Column(db.Float)
+    
+    @property
+    def weight_mean(self):
+        return self.weight_sum / self.weight_count if self.weight_count else None
+    
+    @property
+    def temperature_mean(self):
+        return self.temperature_sum / self.temperature_count if self.temperature_count else None
+    
+    def to_dict(self):
+        return {
+            'animal_id': self.animal_id,
+            'day': self.day.isoformat(),
+            'observations': self.observations,
+            'weight_min': self.weight_min,
+            'weight_max': self.weight_max,
+            'weight_mean': self.weight_mean,
+            'temperature_min': self.temperature_min,
+            'temperature_max': self.temperature_max,
+            'temperature_mean': self.temperature_mean
+        }
+
+
+# Compressed files holding feeding logs and health records moved out of the hot tables
+class HistoryArchive(db.Model):
+    __table_args__ = (
+        db.Index('ix_history_archive_kind_time', 'kind', 'min_timestamp', 'max_timestamp'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    month = db.Column(db.String(7), nullable=False)
+    path = db.Column(db.String(255), unique=True, nullable=False)
+    rows = db.Column(db.Integer, nullable=False)
+    min_timestamp = db.Column(db.DateTime, nullable=False)
+    max_timestamp = db.Column(db.DateTime, nullable=False)
+    # Rows are archived in animal order, so a file covers a narrow range of animals
+    min_animal_id = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    max_animal_id = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'month': self.month,
+            'path': self.path,
+            'rows': self.rows,
+            'min_timestamp': self.min_timestamp.isoformat(),
+            'max_timestamp': self.max_timestamp.isoformat(),
+            'min_animal_id': self.min_animal_id,
+            'max_animal_id': self.max_animal_id,
+            'created_at': self.created_at.isoformat()
+        }
+
+class AIJob(db.Model):
+    __table_args__ = (
+        db.Index('ix_ai_job_status_created', 'status', 'created_at'),
+    )
+    
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    animal_tag_id = db.Column(db.String(20))
+    params = db.Column(db.Text)
+    status = db.Column(db.String(20), default='queued', nullable=False)
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    progress = db.Column(db.Text)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime)
+    # Renewed by the executing worker; a stale heartbeat means the worker died
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'animal_tag_id': self.animal_tag_id,
+            'params': json.loads(self.params) if self.params else None,
+            'status': self.status,
+            'result': json.loads(self.result) if self.result else None,
+            'progress': json.loads(self.progress) if self.progress else None,
+            'error': self.error,
+            'attempts': self.attempts,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class SchemaVersion(db.Model):
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -4,12 +4,16 @@ import random
 from datetime import datetime, timedelta
 from flask import Flask
 from models.models import db, Animal, FeedingLog, HealthRecord, Alert
+from models.database import configure_database
+from models.migrations import upgrade_database
+from services.history_events import register_history_events
 
 # Create a Flask app context for database operations
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///farm_assistant.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
+configure_database(app)
+
+# Keep the daily rollups in step with the seeded history
+register_history_events()
 
 # Sample data
 species_breeds = {
@@ -280,8 +284,8 @@ def seed_database():
 
 def main():
     with app.app_context():
-        # Create tables
-        db.create_all()
+        # Create tables and apply pending migrations
+        upgrade_database()
         
         # Check if database is already populated
         animal_count = Animal.query.count()
@@ -291,7 +295,7 @@ def main():
             if choice.lower() == 'y':
                 # Drop all tables and recreate
                 db.drop_all()
-                db.create_all()
+                upgrade_database()
                 seed_database()
             else:
                 print("Seeding canceled.")
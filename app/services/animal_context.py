@@ -0,0 +1,257 @@
+import os
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from itertools import groupby
+from sqlalchemy import or_, select
+from models.models import Animal, FeedingLog, HealthRecord
+from services.history_format import (
+    format_age, format_feeding_log, format_health_record, format_feeding_day, format_health_day
+)
+from services.rollups import get_daily_history
+
+# Prompt inputs for the per-animal AI features, built once per animal and
+# data version. Animal.data_version changes with every write to the animal or
+# its history, so a memoized context is never stale; the date is part of the key
+# because ages and history windows move with it.
+
+FEEDING_PLAN_DAYS = 7
+ANOMALY_WINDOW_DAYS = 14
+
+# Individual health records quoted for behavior in health summaries
+RECENT_OBSERVATIONS = 20
+
+CONTEXT_CACHE_SIZE = int(os.getenv("ANIMAL_CONTEXT_CACHE_SIZE", "256"))
+
+
+class AnimalContext:
+    """
+    Formatted histories and derived fields for one animal.
+
+    Holds only plain values, never ORM objects, so it can be shared between
+    requests and threads. The recent window, the latest observations and the
+    daily rollups are each loaded on first use.
+    """
+
+    def __init__(self, animal, today):
+        self.animal_id = animal.id
+        self.animal_tag_id = animal.animal_tag_id
+        self.species = animal.species
+        self.breed = animal.breed
+        self.age = format_age(animal.birth_date)
+        self.today = today
+        self._lock = threading.Lock()
+        self._recent = None
+        self._observations = None
+        self._daily = None
+
+    @property
+    def weight_kg(self):
+        """Weight from the latest health record, or "Unknown"."""
+        return self._load_recent()['weight_kg']
+
+    @property
+    def feeding_plan_history(self):
+        """Feeding logs of the last FEEDING_PLAN_DAYS days, without notes."""
+        return self._load_recent()['feeding_plan_history']
+
+    @property
+    def feeding_history(self):
+        """Feeding logs of the last ANOMALY_WINDOW_DAYS days."""
+        return self._load_recent()['feeding_history']
+
+    @property
+    def health_history(self):
+        """Health records of the last ANOMALY_WINDOW_DAYS days."""
+        return self._load_recent()['health_history']
+
+    @property
+    def recent_observations(self):
+        """The latest RECENT_OBSERVATIONS health records, however old."""
+        with self._lock:
+            if self._observations is None:
+                self._observations = self._build_observations()
+            return self._observations
+
+    @property
+    def daily_feeding_history(self):
+        """One line per day of the animal's whole feeding history."""
+        return self._load_daily()['feeding_history']
+
+    @property
+    def daily_health_history(self):
+        """One line per day of the animal's whole health history."""
+        return self._load_daily()['health_history']
+
+    @property
+    def first_day(self):
+        """Earliest day with any history, or None."""
+        return self._load_daily()['first_day']
+
+    def _load_recent(self):
+        with self._lock:
+            if self._recent is None:
+                self._recent = self._build_recent()
+            return self._recent
+
+    def _load_daily(self):
+        with self._lock:
+            if self._daily is None:
+                self._daily = self._build_daily()
+            return self._daily
+
+    def _build_recent(self):
+        window_start, _ = _window_starts(self.today)
+
+        # Query 1: the feeding window
+        logs = FeedingLog.query.filter(
+            FeedingLog.animal_id == self.animal_id, FeedingLog.timestamp >= window_start
+        ).order_by(FeedingLog.timestamp).all()
+
+        # Query 2: the health window plus the latest record, which may be older
+        latest_id = select(HealthRecord.id).where(HealthRecord.animal_id == self.animal_id).order_by(
+            HealthRecord.timestamp.desc(), HealthRecord.id.desc()
+        ).limit(1).scalar_subquery()
+        records = HealthRecord.query.filter(
+            HealthRecord.animal_id == self.animal_id,
+            or_(HealthRecord.timestamp >= window_start, HealthRecord.id == latest_id)
+        ).order_by(HealthRecord.timestamp, HealthRecord.id).all()
+
+        return _recent_fields(self.today, logs, records, records[-1] if records else None)
+
+    def _build_observations(self):
+        # One ordered, limited read on the (animal_id, timestamp) index
+        latest = HealthRecord.query.filter(HealthRecord.animal_id == self.animal_id).order_by(
+            HealthRecord.timestamp.desc(), HealthRecord.id.desc()
+        ).limit(RECENT_OBSERVATIONS).all()
+        return [format_health_record(record) for record in reversed(latest)]
+
+    def _build_daily(self):
+        feeding_rollups, health_rollups = get_daily_history(self.animal_id)
+        days = [rollups[0].day for rollups in (feeding_rollups, health_rollups) if rollups]
+        return {
+            'feeding_history': [format_feeding_day(day, list(rollups))
+                                for day, rollups in groupby(feeding_rollups, key=lambda rollup: rollup.day)],
+            'health_history': [format_health_day(rollup) for rollup in health_rollups],
+            'first_day': min(days) if days else None
+        }
+
+
+def _window_starts(today):
+    start = datetime.combine(today, datetime.min.time())
+    return start - timedelta(days=ANOMALY_WINDOW_DAYS), start - timedelta(days=FEEDING_PLAN_DAYS)
+
+
+def _recent_fields(today, logs, records, latest):
+    window_start, plan_start = _window_starts(today)
+    return {
+        'weight_kg': latest.weight_kg if latest and latest.weight_kg else "Unknown",
+        'feeding_plan_history': [format_feeding_log(log, with_notes=False) for log in logs if log.timestamp >= plan_start],
+        'feeding_history': [format_feeding_log(log) for log in logs],
+        'health_history': [format_health_record(record) for record in records if record.timestamp >= window_start]
+    }
+
+
+def load_recent_windows(contexts):
+    """
+    Load the recent window of many contexts at once, for herd-wide work.
+
+    Fills exactly what each context would load on first use, with one query per
+    table for all of them instead of two queries per animal. Contexts that have
+    already loaded their window are left alone.
+
+    Args:
+        contexts (list): AnimalContext objects sharing the same reference day
+    """
+    pending = {context.animal_id: context for context in contexts if context._recent is None}
+    if not pending:
+        return
+    today = next(iter(pending.values())).today
+    window_start, _ = _window_starts(today)
+
+    logs = defaultdict(list)
+    for log in FeedingLog.query.filter(
+        FeedingLog.animal_id.in_(list(pending)), FeedingLog.timestamp >= window_start
+    ).order_by(FeedingLog.animal_id, FeedingLog.timestamp):
+        logs[log.animal_id].append(log)
+
+    records = defaultdict(list)
+    for record in HealthRecord.query.filter(
+        HealthRecord.animal_id.in_(list(pending)), HealthRecord.timestamp >= window_start
+    ).order_by(HealthRecord.animal_id, HealthRecord.timestamp, HealthRecord.id):
+        records[record.animal_id].append(record)
+
+    # The latest record is in the window unless the animal has none there
+    latest = {animal_id: animal_records[-1] for animal_id, animal_records in records.items()}
+    quiet = [animal_id for animal_id in pending if animal_id not in latest]
+    if quiet:
+        latest_id = select(HealthRecord.id).where(HealthRecord.animal_id == Animal.id).order_by(
+            HealthRecord.timestamp.desc(), HealthRecord.id.desc()
+        ).limit(1).correlate(Animal).scalar_subquery()
+        older = HealthRecord.query.filter(HealthRecord.id.in_(select(latest_id).where(Animal.id.in_(quiet))))
+        latest.update((record.animal_id, record) for record in older)
+
+    for animal_id, context in pending.items():
+        fields = _recent_fields(today, logs[animal_id], records[animal_id], latest.get(animal_id))
+        with context._lock:
+            if context._recent is None:
+                context._recent = fields
+
+
+class AnimalContextCache:
+    """
+    Bounded in-process LRU of AnimalContext objects keyed by (animal, data version, date).
+    """
+
+    def __init__(self, max_entries=CONTEXT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, animal, today=None):
+        """
+        Get the context for an animal, building it if its data changed.
+
+        Args:
+            animal (Animal): The animal, with a current data_version
+            today (date, optional): Reference day, defaults to the current UTC date
+
+        Returns:
+            AnimalContext: The shared context
+        """
+        today = today or datetime.utcnow().date()
+        key = (animal.id, animal.data_version, today)
+        with self._lock:
+            context = self._entries.get(key)
+            if context is not None:
+                self._entries.move_to_end(key)
+                return context
+
+            context = AnimalContext(animal, today)
+            self._entries[key] = context
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return context
+
+    def clear(self):
+        """Drop every memoized context."""
+        with self._lock:
+            self._entries.clear()
+
+
+# Create a singleton instance
+animal_contexts = AnimalContextCache()
+
+
+def get_animal_context(animal, today=None):
+    """
+    Get the memoized AI prompt context for an animal.
+
+    Args:
+        animal (Animal): The animal
+        today (date, optional): Reference day, defaults to the current UTC date
+
+    Returns:
+        AnimalContext: Formatted histories and derived fields
+    """
+    return animal_contexts.get(animal, today)
@@ -0,0 +1,230 @@
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import insert, select
+from models.models import db, Alert, DailyFeedingRollup, DailyHealthRollup
+from services.history_events import record_animals_modified
+
+# Deterministic screening of the whole herd, used to decide which animals are
+# worth an AI anomaly check. All statistics are computed on herd-wide arrays
+# (animals x days) rather than animal by animal, from the daily rollups of the
+# screened animals only.
+
+ALERT_SOURCE = "Statistical Pre-filter"
+
+BASELINE_DAYS = 28
+RECENT_DAYS = 3
+
+# Flag when recent daily intake is this many standard deviations from baseline
+INTAKE_Z_THRESHOLD = 2.5
+INTAKE_Z_HIGH = 4.0
+MIN_BASELINE_DAYS = 5
+
+# Flag sustained weight loss faster than this fraction of body weight per day
+WEIGHT_LOSS_RATE = 0.005
+MIN_WEIGHINGS = 3
+
+# Rectal temperature above which an animal is considered feverish
+FEVER_THRESHOLDS = {
+    'Cow': 39.4,
+    'Pig': 39.7,
+    'Chicken': 41.7,
+    'Sheep': 40.0,
+    'Goat': 40.0,
+}
+DEFAULT_FEVER_THRESHOLD = 39.8
+
+# Animal ids per rollup query, keeping the IN list well under SQLite's parameter limit
+SCREEN_BATCH_SIZE = 500
+
+
+def screen_herd(animals, today=None):
+    """
+    Screen animals for intake, weight and temperature anomalies.
+
+    Args:
+        animals (list): Animal objects to screen
+        today (date, optional): Reference day, defaults to the current UTC date
+
+    Returns:
+        dict: animal_id -> list of findings ({"kind", "message", "severity"}),
+            only for animals with at least one finding
+    """
+    if not animals:
+        return {}
+
+    today = today or datetime.utcnow().date()
+    total_days = BASELINE_DAYS + RECENT_DAYS
+    since = today - timedelta(days=total_days - 1)
+
+    ids = np.array([animal.id for animal in animals])
+    order = np.argsort(ids)
+    sorted_ids = ids[order]
+
+    findings = {}
+    _screen_intake(animals, sorted_ids, order, since, today, total_days, findings)
+    _screen_health(animals, sorted_ids, order, since, today, findings)
+    return findings
+
+
+def write_prefilter_alerts(animals, findings):
+    """
+    Raise alerts for prefilter findings, skipping animals flagged in the last day.
+
+    Args:
+        animals (list): The screened Animal objects
+        findings (dict): Result of screen_herd
+
+    Returns:
+        int: Number of alerts created
+    """
+    if not findings:
+        return 0
+
+    recent = datetime.utcnow() - timedelta(days=1)
+    already_flagged = set(db.session.execute(
+        select(Alert.animal_id).where(
+            Alert.source == ALERT_SOURCE,
+            Alert.acknowledged == False,
+            Alert.timestamp >= recent,
+            Alert.animal_id.in_(list(findings))
+        )
+    ).scalars())
+
+    now = datetime.utcnow()
+    rows = [{
+        "animal_id": animal.id,
+        "timestamp": now,
+        "message": finding["message"],
+        "severity": finding["severity"],
+        "source": ALERT_SOURCE,
+        "acknowledged": False
+    } for animal in animals if animal.id in findings and animal.id not in already_flagged
+        for finding in findings[animal.id]]
+
+    if rows:
+        db.session.execute(insert(Alert), rows)
+        record_animals_modified(db.session, {row["animal_id"] for row in rows})
+        db.session.commit()
+    return len(rows)
+
+
+def _rollup_rows(sorted_ids, model, columns, since):
+    # Rollups from since on for the screened animals, read as primary key ranges
+    rows = []
+    for start in range(0, len(sorted_ids), SCREEN_BATCH_SIZE):
+        batch = [int(animal_id) for animal_id in sorted_ids[start:start + SCREEN_BATCH_SIZE]]
+        rows.extend(db.session.execute(
+            select(model.animal_id, model.day, *columns).where(model.animal_id.in_(batch), model.day >= since)
+        ).all())
+    return rows
+
+
+def _row_index(sorted_ids, order, animal_ids):
+    # Map database ids to row positions; -1 for animals outside the selection
+    positions = np.searchsorted(sorted_ids, animal_ids)
+    positions = np.clip(positions, 0, len(sorted_ids) - 1)
+    found = sorted_ids[positions] == animal_ids
+    return np.where(found, order[positions], -1)
+
+
+def _day_index(days, today):
+    # Days relative to today: 0 is today, negative numbers are past days
+    days = np.array(days, dtype='datetime64[D]')
+    return (days - np.datetime64(today, 'D')).astype(int)
+
+
+def _add_finding(findings, animal, kind, message, severity):
+    findings.setdefault(animal.id, []).append({"kind": kind, "message": message, "severity": severity})
+
+
+def _screen_intake(animals, sorted_ids, order, since, today, total_days, findings):
+    rows = _rollup_rows(sorted_ids, DailyFeedingRollup, [DailyFeedingRollup.total_kg], since)
+    if not rows:
+        return
+
+    animal_ids, days, quantities = zip(*rows)
+    row = _row_index(sorted_ids, order, np.array(animal_ids))
+    day = _day_index(days, today) + total_days - 1
+    keep = (row >= 0) & (day >= 0) & (day < total_days)
+
+    # One rollup per feed type, summed into the day's intake
+    intake = np.zeros((len(animals), total_days))
+    observed = np.zeros((len(animals), total_days), dtype=bool)
+    np.add.at(intake, (row[keep], day[keep]), np.array(quantities, dtype=float)[keep])
+    observed[row[keep], day[keep]] = True
+
+    # Days without any log are missing data, not zero intake
+    baseline = np.where(observed[:, :BASELINE_DAYS], intake[:, :BASELINE_DAYS], np.nan)
+    recent = np.where(observed[:, BASELINE_DAYS:], intake[:, BASELINE_DAYS:], np.nan)
+    baseline_days = observed[:, :BASELINE_DAYS].sum(axis=1)
+    recent_days = observed[:, BASELINE_DAYS:].sum(axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        baseline_mean = np.nanmean(baseline, axis=1)
+        baseline_std = np.nanstd(baseline, axis=1)
+        recent_mean = np.nanmean(recent, axis=1)
+        # Floor the spread so perfectly flat histories do not produce huge scores
+        spread = np.maximum(baseline_std, 0.1 * baseline_mean)
+        z_scores = (recent_mean - baseline_mean) / spread
+
+    valid = (baseline_days >= MIN_BASELINE_DAYS) & (recent_days > 0) & (spread > 0)
+    for i in np.flatnonzero(valid & (np.abs(z_scores) >= INTAKE_Z_THRESHOLD)):
+        direction = "dropped" if z_scores[i] < 0 else "rose"
+        _add_finding(
+            findings, animals[i], "intake",
+            f"Daily feed intake {direction} to {recent_mean[i]:.1f} kg over the last {RECENT_DAYS} days "
+            f"(baseline {baseline_mean[i]:.1f} kg, z-score {z_scores[i]:.1f}).",
+            "High" if abs(z_scores[i]) >= INTAKE_Z_HIGH else "Medium"
+        )
+
+
+def _screen_health(animals, sorted_ids, order, since, today, findings):
+    rows = _rollup_rows(sorted_ids, DailyHealthRollup, [
+        DailyHealthRollup.weight_count, DailyHealthRollup.weight_sum, DailyHealthRollup.temperature_max
+    ], since)
+    if not rows:
+        return
+
+    animal_ids, days, weight_counts, weight_sums, temperatures = zip(*rows)
+    row = _row_index(sorted_ids, order, np.array(animal_ids))
+    day = _day_index(days, today).astype(float)
+    weight_counts = np.array(weight_counts, dtype=float)
+    weight_sums = np.array(weight_sums, dtype=float)
+    temperatures = np.array([np.nan if t is None else t for t in temperatures], dtype=float)
+    n = len(animals)
+
+    # Weight trend: least-squares slope per animal from bincount sums; every
+    # weighing of a day shares its x, so a day's count and sum stand in for them
+    has_weight = (row >= 0) & (weight_counts > 0)
+    r, x, k, y = row[has_weight], day[has_weight], weight_counts[has_weight], weight_sums[has_weight]
+    count = np.bincount(r, k, minlength=n).astype(int)
+    sum_x = np.bincount(r, x * k, minlength=n)
+    sum_y = np.bincount(r, y, minlength=n)
+    sum_xy = np.bincount(r, x * y, minlength=n)
+    sum_xx = np.bincount(r, x * x * k, minlength=n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        denominator = count * sum_xx - sum_x ** 2
+        slope = (count * sum_xy - sum_x * sum_y) / denominator
+        relative_rate = slope / (sum_y / count)
+
+    losing = (count >= MIN_WEIGHINGS) & (denominator > 0) & (relative_rate <= -WEIGHT_LOSS_RATE)
+    for i in np.flatnonzero(losing):
+        _add_finding(
+            findings, animals[i], "weight",
+            f"Losing weight at {-slope[i]:.2f} kg/day ({-relative_rate[i] * 100:.1f}% of body weight per day) "
+            f"across {count[i]} weighings.",
+            "Medium"
+        )
+
+    # Fever: highest temperature in the recent window against the species threshold
+    recent = (row >= 0) & ~np.isnan(temperatures) & (day > -RECENT_DAYS)
+    peak = np.full(n, -np.inf)
+    np.maximum.at(peak, row[recent], temperatures[recent])
+    thresholds = np.array([FEVER_THRESHOLDS.get(animal.species, DEFAULT_FEVER_THRESHOLD) for animal in animals])
+    for i in np.flatnonzero(peak > thresholds):
+        _add_finding(
+            findings, animals[i], "temperature",
+            f"Temperature reached {peak[i]:.1f} C in the last {RECENT_DAYS} days "
+            f"(fever threshold for {animals[i].species} is {thresholds[i]:.1f} C).",
+            "High"
+        )
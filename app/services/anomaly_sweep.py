@@ -0,0 +1,167 @@
+import os
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from sqlalchemy import insert
+from models.models import db, Animal, Alert
+from services.animal_context import animal_contexts, load_recent_windows
+from services.anomaly_prefilter import screen_herd, write_prefilter_alerts
+from services.gemini_service import gemini_service
+from services.history_events import record_animals_modified
+
+DEFAULT_CONCURRENCY = int(os.getenv("ANOMALY_SWEEP_CONCURRENCY", "4"))
+MAX_CONCURRENCY = 32
+
+# Alerts are written in transactions of this many rows
+ALERT_BATCH_SIZE = 200
+
+
+def sweep_herd(concurrency=DEFAULT_CONCURRENCY, species=None, animal_ids=None, prefilter=True, progress=None):
+    """
+    Run AI anomaly detection for many animals at once.
+
+    With prefilter on, the herd is first screened statistically and only animals
+    with findings are escalated to Gemini. Histories for the escalated animals are
+    loaded with one query per table, then the Gemini calls fan out over a bounded
+    thread pool. Worker threads never touch the database; alerts are written from
+    the calling thread in batches.
+
+    Args:
+        concurrency (int, optional): Maximum number of Gemini calls in flight
+        species (str, optional): Only sweep animals of this species
+        animal_ids (iterable, optional): Only sweep these animals
+        prefilter (bool, optional): Screen locally and only call Gemini for flagged animals
+        progress (callable, optional): Called with a progress dict after each animal
+
+    Returns:
+        dict: Sweep report with totals, latency percentiles and per-animal results
+    """
+    concurrency = max(1, min(int(concurrency), MAX_CONCURRENCY))
+    started = time.monotonic()
+
+    query = Animal.query
+    if species:
+        query = query.filter(Animal.species == species)
+    if animal_ids is not None:
+        query = query.filter(Animal.id.in_(list(animal_ids)))
+    animals = query.order_by(Animal.id).all()
+    selected = len(animals)
+
+    prefilter_report = None
+    if prefilter:
+        findings = screen_herd(animals)
+        prefilter_report = {
+            "flagged": len(findings),
+            "alerts_created": write_prefilter_alerts(animals, findings)
+        }
+        # Writing the alerts expired the loaded animals; read the escalated ones back in one query
+        animals = Animal.query.filter(Animal.id.in_(list(findings))).order_by(Animal.id).all()
+
+    prompts = _build_prompt_args(animals)
+
+    report = {
+        "animals": selected,
+        "escalated": len(animals),
+        "prefilter": prefilter_report,
+        "completed": 0,
+        "failed": 0,
+        "alerts_created": 0,
+        "concurrency": concurrency,
+        "results": []
+    }
+    pending_alerts = []
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="anomaly-sweep") as pool:
+        futures = {pool.submit(_timed_detect, prompts[animal.id]): animal for animal in animals}
+        for future in as_completed(futures):
+            animal = futures[future]
+            result, latency = future.result()
+            entry = {"animal_tag_id": animal.animal_tag_id, "latency_seconds": round(latency, 3)}
+
+            if "error" in result:
+                report["failed"] += 1
+                entry.update(status="failed", error=result["error"])
+            else:
+                report["completed"] += 1
+                anomalies = result.get("anomalies_detected") or []
+                entry.update(status="ok", anomalies=len(anomalies))
+                pending_alerts.extend(_alert_rows(animal.id, anomalies))
+
+            if len(pending_alerts) >= ALERT_BATCH_SIZE:
+                report["alerts_created"] += _write_alerts(pending_alerts)
+                pending_alerts = []
+
+            report["results"].append(entry)
+            if progress:
+                progress({
+                    "done": len(report["results"]),
+                    "total": len(animals),
+                    "failed": report["failed"],
+                    "last": entry
+                })
+
+    if pending_alerts:
+        report["alerts_created"] += _write_alerts(pending_alerts)
+
+    latencies = sorted(entry["latency_seconds"] for entry in report["results"])
+    report["latency_seconds"] = {
+        "p50": _percentile(latencies, 50),
+        "p95": _percentile(latencies, 95),
+        "max": latencies[-1] if latencies else None
+    }
+    report["elapsed_seconds"] = round(time.monotonic() - started, 3)
+    return report
+
+
+def _build_prompt_args(animals):
+    # The same contexts, and so the same prompts, as the per-animal anomaly check,
+    # which lets the two share cached Gemini results
+    today = datetime.utcnow().date()
+    contexts = [animal_contexts.get(animal, today) for animal in animals]
+    load_recent_windows(contexts)
+    return {
+        context.animal_id: {
+            "animal_tag_id": context.animal_tag_id,
+            "species": context.species,
+            "breed": context.breed,
+            "age": context.age,
+            "feeding_history": context.feeding_history,
+            "health_history": context.health_history
+        }
+        for context in contexts
+    }
+
+
+def _timed_detect(prompt_args):
+    started = time.monotonic()
+    try:
+        result = gemini_service.detect_anomalies(**prompt_args)
+    except Exception as e:
+        result = {"error": str(e)}
+    return result, time.monotonic() - started
+
+
+def _alert_rows(animal_id, anomalies):
+    now = datetime.utcnow()
+    return [{
+        "animal_id": animal_id,
+        "timestamp": now,
+        "message": f"{anomaly.get('description', 'Anomaly detected.')} Potential cause: {anomaly.get('potential_cause', 'Unknown')}",
+        "severity": anomaly.get("severity") or "Medium",
+        "source": "AI Anomaly Detection",
+        "acknowledged": False
+    } for anomaly in anomalies]
+
+
+def _write_alerts(rows):
+    db.session.execute(insert(Alert), rows)
+    record_animals_modified(db.session, {row["animal_id"] for row in rows})
+    db.session.commit()
+    return len(rows)
+
+
+def _percentile(values, percent):
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
@@ -0,0 +1,44 @@
+from models.models import db, Animal, Alert
+
+# Alerts shown on the dashboard, most severe first
+DEFAULT_ALERT_LIMIT = 100
+MAX_ALERT_LIMIT = 500
+
+
+def get_dashboard_data(limit=DEFAULT_ALERT_LIMIT):
+    """
+    Load the dashboard's active alert feed.
+    
+    Alerts are fetched together with their animal's tag in a single joined query,
+    so templates never need to touch the ORM.
+    
+    Args:
+        limit (int, optional): Maximum number of alerts to return
+        
+    Returns:
+        dict: 'alerts' as (Alert, animal_tag_id) pairs and 'total_active' count
+    """
+    limit = max(1, min(limit, MAX_ALERT_LIMIT))
+    
+    alerts = db.session.query(Alert, Animal.animal_tag_id).outerjoin(
+        Animal, Alert.animal_id == Animal.id
+    ).filter(
+        Alert.acknowledged == False
+    ).order_by(
+        # Read backwards along ix_alert_unacknowledged_severity, with no sort
+        Alert.severity_rank.desc(), Alert.timestamp.desc(), Alert.id.desc()
+    ).limit(limit).all()
+    
+    total_active = Alert.query.filter_by(acknowledged=False).count()
+    
+    return {
+        'alerts': [(alert, animal_tag_id) for alert, animal_tag_id in alerts],
+        'total_active': total_active
+    }
+
+
+def alert_to_dict(alert, animal_tag_id):
+    """Serialize an alert together with its animal's tag."""
+    data = alert.to_dict()
+    data['animal_tag_id'] = animal_tag_id
+    return data
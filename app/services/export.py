@@ -0,0 +1,120 @@
+import io
+import csv
+import json
+from datetime import datetime
+from sqlalchemy import select
+from models.models import db, Animal, FeedingLog, HealthRecord, Alert
+
+# Rows fetched from the database cursor, and written to the response, per batch
+BATCH_SIZE = 1000
+
+EXPORT_FIELDS = {
+    FeedingLog: ['id', 'animal_id', 'timestamp', 'feed_type', 'quantity_kg', 'notes'],
+    HealthRecord: ['id', 'animal_id', 'timestamp', 'weight_kg', 'temperature_celsius', 'behavior_observation', 'notes'],
+    Alert: ['id', 'animal_id', 'timestamp', 'message', 'severity', 'source', 'acknowledged'],
+}
+
+EXPORT_KINDS = {
+    'feeding_logs': FeedingLog,
+    'health_records': HealthRecord,
+    'alerts': Alert,
+}
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def build_export_query(kind, species=None, since=None, until=None):
+    """
+    Build the export statement for one kind of history row.
+
+    Rows come out in primary key order so the database can start returning them
+    straight away instead of sorting the whole table first.
+
+    Args:
+        kind (str): 'feeding_logs', 'health_records' or 'alerts'
+        species (str, optional): Only export rows for animals of this species
+        since (datetime, optional): Inclusive lower bound on timestamp
+        until (datetime, optional): Exclusive upper bound on timestamp
+
+    Returns:
+        tuple: (list of field names, select statement)
+    """
+    model = EXPORT_KINDS[kind]
+    fields = EXPORT_FIELDS[model] + ['animal_tag_id', 'species']
+    columns = [getattr(model, name) for name in EXPORT_FIELDS[model]]
+
+    stmt = select(*columns, Animal.animal_tag_id, Animal.species).outerjoin(Animal, model.animal_id == Animal.id)
+    if species:
+        stmt = stmt.where(Animal.species == species)
+    if since:
+        stmt = stmt.where(model.timestamp >= since)
+    if until:
+        stmt = stmt.where(model.timestamp < until)
+
+    return fields, stmt.order_by(model.id)
+
+
+def stream_export(fields, stmt, fmt, archived=None):
+    """
+    Generate the export body batch by batch.
+
+    The statement runs with a server-side cursor (where the driver supports one)
+    and only BATCH_SIZE rows are held in memory at a time. Must be consumed
+    inside the request's app context, e.g. through stream_with_context.
+
+    Args:
+        fields (list): Field names, in column order
+        stmt: Statement from build_export_query
+        fmt (str): 'ndjson' or 'csv'
+        archived (iterable, optional): Rows read back from the history archive,
+            written before the rows still in the database
+
+    Yields:
+        str: Chunks of the encoded export
+    """
+    if fmt == 'csv':
+        yield _csv_lines([fields])
+
+    if archived is not None:
+        for rows in _batches(archived):
+            yield _encode(fields, rows, fmt)
+
+    result = db.session.execute(stmt.execution_options(yield_per=BATCH_SIZE))
+    for rows in result.partitions():
+        yield _encode(fields, rows, fmt)
+
+
+def _encode(fields, rows, fmt):
+    if fmt == 'csv':
+        return _csv_lines([[_csv_value(value) for value in row] for row in rows])
+    return ''.join(json.dumps(dict(zip(fields, map(_json_value, row)))) + '\n' for row in rows)
+
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _csv_lines(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    return _json_value(value)
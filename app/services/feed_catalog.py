@@ -0,0 +1,101 @@
+import threading
+from sqlalchemy import func, select
+from models.database import dialect_insert, row_value
+from models.models import db, Animal, FeedingLog, FeedTypeCatalog
+
+# Feed types offered to the AI per species. The catalog table gains a row the
+# first time a species is fed something new, so reading it never scans the
+# feeding logs. Rows are only ever added, so a species' row count changes
+# exactly when its feed types do: each worker keeps the lists it has read in
+# memory, keyed on that count, and sees other workers' additions at once.
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def record_feed_types(session, logs):
+    """
+    Add the feed types of newly inserted feeding logs to the catalog.
+
+    The species are queued for invalidation when the transaction commits.
+
+    Args:
+        session: Session of the transaction that inserted the logs
+        logs (iterable): FeedingLog objects or dicts with the same fields
+    """
+    pairs = {(row_value(log, 'animal_id'), row_value(log, 'feed_type')) for log in logs}
+    if not pairs:
+        return
+
+    species = dict(session.execute(
+        select(Animal.id, Animal.species).where(Animal.id.in_({animal_id for animal_id, _ in pairs}))
+    ).all())
+    found = {(species[animal_id], feed_type) for animal_id, feed_type in pairs if animal_id in species}
+    rows = [{'species': name, 'feed_type': feed_type} for name, feed_type in found]
+    if not rows:
+        return
+
+    stmt = dialect_insert(session, FeedTypeCatalog.__table__).on_conflict_do_nothing(
+        index_elements=['species', 'feed_type']
+    )
+    session.execute(stmt, rows)
+    session.info.setdefault('feed_catalog_species', set()).update(row['species'] for row in rows)
+
+
+def get_feed_types(species):
+    """
+    Get the feed types recorded for a species, from the in-process cache while its row count is unchanged.
+
+    Args:
+        species (str): The species
+
+    Returns:
+        list: Feed type names, sorted
+    """
+    # Counting on the (species, feed_type) primary key reads the index only
+    count = db.session.execute(
+        select(func.count()).select_from(FeedTypeCatalog).where(FeedTypeCatalog.species == species)
+    ).scalar()
+    with _cache_lock:
+        cached = _cache.get(species)
+        if cached and cached[0] == count:
+            return cached[1]
+
+    feed_types = list(db.session.execute(
+        select(FeedTypeCatalog.feed_type).where(FeedTypeCatalog.species == species).order_by(FeedTypeCatalog.feed_type)
+    ).scalars())
+    with _cache_lock:
+        # Keyed on what was actually read, in case a row was added in between
+        _cache[species] = (len(feed_types), feed_types)
+    return feed_types
+
+
+def invalidate(species=None):
+    """
+    Drop cached lookups so the next read goes to the catalog table.
+
+    Args:
+        species (iterable, optional): Species to drop, defaults to all
+    """
+    with _cache_lock:
+        if species is None:
+            _cache.clear()
+        else:
+            for name in species:
+                _cache.pop(name, None)
+
+
+def backfill_feed_types(connection):
+    """
+    Fill the catalog from the existing feeding logs.
+
+    Args:
+        connection: Connection inside the migration transaction
+    """
+    catalogued = select(FeedTypeCatalog.feed_type).where(
+        FeedTypeCatalog.species == Animal.species, FeedTypeCatalog.feed_type == FeedingLog.feed_type
+    ).exists()
+    pairs = select(Animal.species, FeedingLog.feed_type, func.min(FeedingLog.timestamp)).select_from(FeedingLog).join(
+        Animal, Animal.id == FeedingLog.animal_id
+    ).where(~catalogued).group_by(Animal.species, FeedingLog.feed_type)
+    connection.execute(FeedTypeCatalog.__table__.insert().from_select(['species', 'feed_type', 'first_seen'], pairs))
@@ -0,0 +1,273 @@
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from datetime import date, timedelta
+from services.local_storage import replace_atomically
+
+# Stand-ins for the Gemini model, selected with GEMINI_BACKEND:
+#   live   - the real API (default)
+#   fake   - local fake with configurable latency, error and malformed-output rates
+#   replay - responses recorded earlier, looked up by prompt hash; no network
+#   record - the real API, saving every response for later replay
+# They expose the same generate_content(prompt, generation_config=None, stream=False)
+# call as google.generativeai.GenerativeModel, so GeminiService's retry, guard,
+# caching and parsing paths run unchanged on top of them.
+
+BACKENDS = ('live', 'fake', 'replay', 'record')
+OFFLINE_BACKENDS = ('fake', 'replay')
+
+DEFAULT_RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'gemini_recordings')
+
+# Characters per streamed chunk
+CHUNK_CHARS = 40
+
+
+class FakeGeminiError(Exception):
+    """An injected failure, standing in for an API error."""
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+def prompt_hash(prompt_text):
+    """
+    Key a recorded response by the exact prompt that produced it.
+
+    Args:
+        prompt_text (str): The prompt as sent to the model
+
+    Returns:
+        str: Hex digest of the prompt
+    """
+    return hashlib.sha256(prompt_text.encode("utf-8")).hexdigest()
+
+
+class FakeModel:
+    """
+    Answers prompts locally with plausible JSON for each AI feature.
+
+    Latency follows a log-normal distribution around a median; a share of calls
+    fail, and a share return malformed output: half of it JSON with comments and
+    trailing commas (recoverable by the lenient parser), half truncated JSON.
+    """
+
+    name = 'fake-gemini'
+
+    def __init__(self, latency_ms=None, latency_sigma=None, error_rate=None, malformed_rate=None, seed=None):
+        """
+        Initialize the fake from arguments or GEMINI_FAKE_* environment variables.
+
+        Args:
+            latency_ms (float, optional): Median response time in milliseconds
+            latency_sigma (float, optional): Spread of the log-normal latency distribution
+            error_rate (float, optional): Fraction of calls that raise FakeGeminiError
+            malformed_rate (float, optional): Fraction of responses that are not valid JSON
+            seed (int, optional): Seed for latency and failure draws, for reproducible runs
+        """
+        self.latency_ms = latency_ms if latency_ms is not None else float(os.getenv("GEMINI_FAKE_LATENCY_MS", "300"))
+        self.latency_sigma = latency_sigma if latency_sigma is not None else float(os.getenv("GEMINI_FAKE_LATENCY_SIGMA", "0.5"))
+        self.error_rate = error_rate if error_rate is not None else float(os.getenv("GEMINI_FAKE_ERROR_RATE", "0"))
+        self.malformed_rate = malformed_rate if malformed_rate is not None else float(os.getenv("GEMINI_FAKE_MALFORMED_RATE", "0"))
+        seed = seed if seed is not None else os.getenv("GEMINI_FAKE_SEED")
+        self._rng = random.Random(int(seed) if seed is not None else None)
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        # Draw everything up front under the lock so a seeded run is reproducible per call order
+        with self._lock:
+            latency = self.latency_ms / 1000 * self._rng.lognormvariate(0, self.latency_sigma) if self.latency_ms else 0
+            failed = self._rng.random() < self.error_rate
+            malformed = self._rng.random() < self.malformed_rate
+            truncated = self._rng.random() < 0.5
+
+        if failed:
+            time.sleep(latency / 2)
+            raise FakeGeminiError("503 Service Unavailable (injected by the fake Gemini backend)")
+
+        text = json.dumps(fake_answer(prompt), indent=2)
+        if malformed:
+            text = text[:len(text) * 2 // 3] if truncated else _with_comments(text)
+
+        if not stream:
+            time.sleep(latency)
+            return FakeResponse(text)
+        return self._stream(text, latency)
+
+    def _stream(self, text, latency):
+        pieces = [text[i:i + CHUNK_CHARS] for i in range(0, len(text), CHUNK_CHARS)]
+        # Half the latency before the first chunk, the rest spread over the stream
+        time.sleep(latency / 2)
+        for piece in pieces:
+            yield FakeResponse(piece)
+            time.sleep(latency / 2 / len(pieces))
+
+
+class ReplayModel:
+    """
+    Serves responses recorded by RecordingModel, keyed by prompt hash.
+
+    A prompt without a recording gets an error message as its response, so a
+    replay run never reaches the network.
+    """
+
+    name = 'replay'
+
+    def __init__(self, path=None, replay_latency=None):
+        """
+        Args:
+            path (str, optional): Directory of recordings, defaults to GEMINI_RECORDINGS_DIR
+            replay_latency (bool, optional): Sleep for each response's recorded latency,
+                defaults to GEMINI_REPLAY_LATENCY
+        """
+        self.path = path or os.getenv("GEMINI_RECORDINGS_DIR", DEFAULT_RECORDINGS_DIR)
+        if replay_latency is None:
+            replay_latency = os.getenv("GEMINI_REPLAY_LATENCY", "false").lower() == "true"
+        self.replay_latency = replay_latency
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        key = prompt_hash(prompt)
+        try:
+            with open(os.path.join(self.path, f"{key}.json")) as f:
+                recording = json.load(f)
+        except OSError:
+            print(f"No recorded Gemini response for prompt {key[:12]}")
+            text = f"Error generating AI response: no recorded response for prompt {key[:12]}"
+            return [FakeResponse(text)] if stream else FakeResponse(text)
+
+        if self.replay_latency:
+            time.sleep(recording.get("latency_seconds", 0))
+        if stream:
+            return [FakeResponse(chunk) for chunk in recording.get("chunks") or [recording["text"]]]
+        return FakeResponse(recording["text"])
+
+
+class RecordingModel:
+    """
+    Wraps a live model and saves each successful response for ReplayModel.
+    """
+
+    def __init__(self, model, path=None):
+        """
+        Args:
+            model: The live model to call
+            path (str, optional): Directory of recordings, defaults to GEMINI_RECORDINGS_DIR
+        """
+        self.model = model
+        self.path = path or os.getenv("GEMINI_RECORDINGS_DIR", DEFAULT_RECORDINGS_DIR)
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        started = time.perf_counter()
+        response = self.model.generate_content(prompt, generation_config=generation_config, stream=stream)
+        if not stream:
+            self._save(prompt, response.text, None, time.perf_counter() - started)
+            return response
+        return self._record_stream(prompt, response, started)
+
+    def _record_stream(self, prompt, response, started):
+        chunks = []
+        for chunk in response:
+            chunks.append(chunk.text)
+            yield chunk
+        self._save(prompt, "".join(chunks), chunks, time.perf_counter() - started)
+
+    def _save(self, prompt, text, chunks, latency_seconds):
+        recording = {
+            "prompt_hash": prompt_hash(prompt),
+            "text": text,
+            "chunks": chunks,
+            "latency_seconds": round(latency_seconds, 3)
+        }
+        try:
+            # A concurrent replay never reads half a file
+            with replace_atomically(os.path.join(self.path, f"{recording['prompt_hash']}.json")) as tmp_path:
+                with open(tmp_path, "w") as f:
+                    json.dump(recording, f)
+        except OSError as e:
+            print(f"Could not record Gemini response: {e}")
+
+
+def create_offline_model(backend):
+    """
+    Build the model for an offline backend.
+
+    Args:
+        backend (str): 'fake' or 'replay'
+
+    Returns:
+        FakeModel or ReplayModel
+    """
+    return FakeModel() if backend == 'fake' else ReplayModel()
+
+
+def fake_answer(prompt):
+    """
+    Build a well-formed answer for whichever AI feature the prompt is for.
+
+    Args:
+        prompt (str): The prompt
+
+    Returns:
+        dict: A response in the shape the prompt asks for
+    """
+    tag = _search(r'"animal_tag_id": "([^"]*)"', prompt) or "UNKNOWN"
+    today = date.today()
+
+    if '"daily_schedule"' in prompt:
+        feed_types = (_search(r'Available feed types include: (.*)', prompt) or "Hay").split(', ')[:2]
+        return {
+            "animal_tag_id": tag,
+            "plan_start_date": today.isoformat(),
+            "daily_schedule": [
+                {"day": day, "date": (today + timedelta(days=day - 1)).isoformat(),
+                 "feedings": [{"feed_type": feed_type, "quantity_kg": 5.0} for feed_type in feed_types]}
+                for day in range(1, 8)
+            ],
+            "notes": "Keep fresh water available at all times."
+        }
+
+    if '"anomalies_detected"' in prompt:
+        # Follow the data loosely: lethargy in the history is reported as an anomaly
+        anomalies = [{
+            "description": "Lethargy reported in recent health records.",
+            "potential_cause": "Possible infection or feed change.",
+            "severity": "Medium",
+            "data_points_of_concern": ["Behavior: Lethargic"]
+        }] if 'Lethargic' in prompt else []
+        return {
+            "animal_tag_id": tag,
+            "anomalies_detected": anomalies,
+            "overall_assessment": "Some concerns noted, further observation recommended." if anomalies else "No concerns."
+        }
+
+    if '"overall_status"' in prompt:
+        return {
+            "animal_tag_id": tag,
+            "summary_period_start": _search(r'"summary_period_start": "([^"]*)"', prompt) or "N/A",
+            "summary_period_end": _search(r'"summary_period_end": "([^"]*)"', prompt) or today.isoformat(),
+            "feeding_summary": "Consistent daily intake.",
+            "weight_trend": "Stable.",
+            "temperature_trend": "Within the normal range.",
+            "behavior_summary": "Mostly normal.",
+            "overall_status": "Good",
+            "recommendations": ["Continue the current feeding plan."]
+        }
+
+    return {"response": "This is a response from the fake Gemini backend."}
+
+
+def _search(pattern, text):
+    match = re.search(pattern, text)
+    return match.group(1).strip() if match else None
+
+
+def _with_comments(text):
+    # Valid JSON5 but not JSON: a comment line and a trailing comma
+    lines = text.splitlines()
+    lines.insert(1, '  // generated by the fake backend')
+    return "\n".join(lines[:-1]) + ",\n}"
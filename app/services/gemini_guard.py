@@ -0,0 +1,239 @@
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from services.local_storage import LocalDatabase
+
+# Protects the Gemini API (and the workers calling it) with state shared by every
+# gunicorn worker through one SQLite file: a token bucket for the request rate,
+# a lease table acting as a concurrency semaphore, and a circuit breaker that
+# fails fast while the recent error rate is high.
+
+DEFAULT_GUARD_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'gemini_guard.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_bucket (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS call_slot (
+    id TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS call_outcome (
+    at REAL NOT NULL,
+    ok INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_call_outcome_at ON call_outcome (at);
+CREATE TABLE IF NOT EXISTS breaker (
+    name TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    changed_at REAL NOT NULL
+);
+"""
+
+# How often a waiting caller re-checks for a free slot
+POLL_SECONDS = 0.05
+
+
+class GuardTimeout(Exception):
+    """No token or call slot became available before the caller's deadline."""
+
+
+class GeminiGuard:
+    """
+    Rate limiter, concurrency limit and circuit breaker shared across workers.
+    """
+
+    def __init__(self, path=None, rate_per_minute=None, burst=None, max_concurrency=None,
+                 slot_lease_seconds=None, window_seconds=None, min_calls=None, error_rate=None,
+                 cooldown_seconds=None):
+        """
+        Initialize the guard from arguments or GEMINI_* environment variables.
+
+        Args:
+            path (str, optional): SQLite file holding the shared state
+            rate_per_minute (float, optional): Sustained calls per minute across all workers
+            burst (int, optional): Calls that may be made at once after a quiet period
+            max_concurrency (int, optional): Calls in flight at once across all workers
+            slot_lease_seconds (int, optional): After this long a slot is presumed leaked by a dead worker
+            window_seconds (int, optional): Window over which the error rate is measured
+            min_calls (int, optional): Calls needed in the window before the breaker can open
+            error_rate (float, optional): Failure fraction that opens the breaker
+            cooldown_seconds (int, optional): How long the breaker stays open before a trial call
+        """
+        self.path = path or os.getenv("GEMINI_GUARD_PATH", DEFAULT_GUARD_PATH)
+        self.rate_per_second = (rate_per_minute or float(os.getenv("GEMINI_RATE_PER_MINUTE", "60"))) / 60
+        self.burst = burst or int(os.getenv("GEMINI_BURST", "10"))
+        self.max_concurrency = max_concurrency or int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+        self.slot_lease_seconds = slot_lease_seconds or int(os.getenv("GEMINI_SLOT_LEASE_SECONDS", "120"))
+        self.window_seconds = window_seconds or int(os.getenv("GEMINI_BREAKER_WINDOW_SECONDS", "60"))
+        self.min_calls = min_calls or int(os.getenv("GEMINI_BREAKER_MIN_CALLS", "5"))
+        self.error_rate = error_rate or float(os.getenv("GEMINI_BREAKER_ERROR_RATE", "0.5"))
+        self.cooldown_seconds = cooldown_seconds or int(os.getenv("GEMINI_BREAKER_COOLDOWN_SECONDS", "30"))
+        self._db = LocalDatabase(self.path, SCHEMA, autocommit=True)
+
+    def allow_call(self):
+        """
+        Check the circuit breaker before starting a call.
+
+        While the breaker is open every caller is refused. Once the cooldown has
+        passed, a single trial call is let through (half-open); its outcome
+        closes or re-opens the breaker.
+
+        Returns:
+            bool: True if the call may proceed
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT state, changed_at FROM breaker WHERE name = 'gemini'").fetchone()
+            if not row or row[0] == "closed":
+                return True
+            if now - row[1] < self.cooldown_seconds:
+                return False
+            # Cooldown over: this caller becomes the trial; a stale trial is replaced after another cooldown
+            conn.execute("UPDATE breaker SET state = 'half_open', changed_at = ? WHERE name = 'gemini'", (now,))
+            return True
+
+    def record(self, ok):
+        """
+        Record the outcome of a Gemini call and open or close the breaker.
+
+        Args:
+            ok (bool): Whether the call succeeded
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            state = conn.execute("SELECT state FROM breaker WHERE name = 'gemini'").fetchone()
+            state = state[0] if state else "closed"
+
+            if state == "half_open":
+                self._set_state(conn, "closed" if ok else "open", now)
+                conn.execute("DELETE FROM call_outcome")
+                return
+
+            conn.execute("INSERT INTO call_outcome (at, ok) VALUES (?, ?)", (now, 1 if ok else 0))
+            conn.execute("DELETE FROM call_outcome WHERE at < ?", (now - self.window_seconds,))
+            if ok or state != "closed":
+                return
+
+            calls, failures = conn.execute("SELECT COUNT(*), SUM(1 - ok) FROM call_outcome").fetchone()
+            if calls >= self.min_calls and failures / calls >= self.error_rate:
+                print(f"Gemini circuit breaker opened: {failures} of {calls} calls failed in {self.window_seconds}s")
+                self._set_state(conn, "open", now)
+
+    @contextmanager
+    def call_slot(self, deadline):
+        """
+        Wait for a rate-limit token and a free concurrency slot, holding the slot for the block.
+
+        Args:
+            deadline (float): time.monotonic() value after which to give up
+
+        Raises:
+            GuardTimeout: If the token or slot cannot be had before the deadline
+        """
+        self._take_token(deadline)
+        slot_id = self._acquire_slot(deadline)
+        try:
+            yield
+        finally:
+            with self._transaction() as conn:
+                conn.execute("DELETE FROM call_slot WHERE id = ?", (slot_id,))
+
+    def status(self):
+        """
+        Report the shared limiter and breaker state.
+
+        Returns:
+            dict: breaker state, calls in flight, tokens available and recent error rate
+        """
+        now = time.time()
+        conn = self._db.connection()
+        breaker = conn.execute("SELECT state, changed_at FROM breaker WHERE name = 'gemini'").fetchone()
+        in_flight = conn.execute("SELECT COUNT(*) FROM call_slot WHERE expires_at > ?", (now,)).fetchone()[0]
+        calls, failures = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(1 - ok), 0) FROM call_outcome WHERE at >= ?", (now - self.window_seconds,)
+        ).fetchone()
+        return {
+            "breaker": breaker[0] if breaker else "closed",
+            "breaker_changed_at": breaker[1] if breaker else None,
+            "in_flight": in_flight,
+            "max_concurrency": self.max_concurrency,
+            "tokens": round(self._refilled(conn, now)[0], 2),
+            "rate_per_minute": self.rate_per_second * 60,
+            "recent_calls": calls,
+            "recent_error_rate": round(failures / calls, 4) if calls else None
+        }
+
+    def reset(self):
+        """Forget all limiter and breaker state."""
+        with self._transaction() as conn:
+            for table in ("rate_bucket", "call_slot", "call_outcome", "breaker"):
+                conn.execute(f"DELETE FROM {table}")
+
+    def _take_token(self, deadline):
+        while True:
+            now = time.time()
+            with self._transaction() as conn:
+                tokens, _ = self._refilled(conn, now)
+                if tokens >= 1:
+                    self._save_tokens(conn, tokens - 1, now)
+                    return
+                self._save_tokens(conn, tokens, now)
+            wait = (1 - tokens) / self.rate_per_second
+            if time.monotonic() + wait > deadline:
+                raise GuardTimeout("Gemini rate limit reached")
+            time.sleep(wait)
+
+    def _acquire_slot(self, deadline):
+        slot_id = uuid.uuid4().hex
+        while True:
+            now = time.time()
+            with self._transaction() as conn:
+                # Leases outlive their holder only if a worker died mid-call
+                conn.execute("DELETE FROM call_slot WHERE expires_at <= ?", (now,))
+                in_flight = conn.execute("SELECT COUNT(*) FROM call_slot").fetchone()[0]
+                if in_flight < self.max_concurrency:
+                    conn.execute("INSERT INTO call_slot (id, expires_at) VALUES (?, ?)",
+                                 (slot_id, now + self.slot_lease_seconds))
+                    return slot_id
+            if time.monotonic() + POLL_SECONDS > deadline:
+                raise GuardTimeout("Too many Gemini calls in flight")
+            time.sleep(POLL_SECONDS)
+
+    def _refilled(self, conn, now):
+        row = conn.execute("SELECT tokens, updated_at FROM rate_bucket WHERE name = 'gemini'").fetchone()
+        if not row:
+            return float(self.burst), now
+        return min(float(self.burst), row[0] + (now - row[1]) * self.rate_per_second), now
+
+    def _save_tokens(self, conn, tokens, now):
+        conn.execute(
+            "INSERT INTO rate_bucket (name, tokens, updated_at) VALUES ('gemini', ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+            (tokens, now)
+        )
+
+    def _set_state(self, conn, state, now):
+        conn.execute(
+            "INSERT INTO breaker (name, state, changed_at) VALUES ('gemini', ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET state = excluded.state, changed_at = excluded.changed_at",
+            (state, now)
+        )
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so read-modify-write is atomic across workers
+        conn = self._db.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+# Create a singleton instance
+gemini_guard = GeminiGuard()
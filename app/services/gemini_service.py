@@ -1,13 +1,40 @@
 import os
 import time
 import json
+import random
+import hashlib
+import threading
 import google.generativeai as genai
 from pathlib import Path
 from dotenv import load_dotenv
+from services.result_cache import result_cache
+from services.single_flight import single_flight
+from services import metrics
+from services.gemini_backends import BACKENDS, OFFLINE_BACKENDS, RecordingModel, create_offline_model
+from services.gemini_guard import gemini_guard, GuardTimeout
+from services.local_storage import replace_atomically
+from services.prompt_compaction import PROMPT_TOKEN_BUDGET, compact_history, estimate_tokens
 
 # Load environment variables
 load_dotenv()
 
+# Models to use, in order of preference
+PREFERRED_MODELS = ["gemini-1.5-flash-latest", "gemini-1.5-flash", "gemini-pro", "gemini-1.0-pro"]
+
+# The resolved model name is shared by all workers through this file
+MODEL_CACHE_PATH = os.getenv(
+    "GEMINI_MODEL_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'gemini_model.json')
+)
+MODEL_CACHE_TTL_SECONDS = int(os.getenv("GEMINI_MODEL_CACHE_TTL_SECONDS", "86400"))
+
+# Total time one request may spend on Gemini, retries and waits included
+REQUEST_DEADLINE_SECONDS = float(os.getenv("GEMINI_DEADLINE_SECONDS", "45"))
+MAX_BACKOFF_SECONDS = 8
+
+FLIGHT_TIMEOUT_MESSAGE = "Error generating AI response: timed out waiting for an identical request."
+BREAKER_OPEN_MESSAGE = "Error generating AI response: the AI service is failing right now, please try again in a minute."
+
 class GeminiService:
     """
     Service class for interacting with Google's Gemini API.
@@ -16,81 +43,145 @@ class GeminiService:
     def __init__(self):
         """
         Initialize the Gemini service with API key and model configuration.
+        
+        Nothing is sent over the network here: the model is resolved on first use.
+        GEMINI_BACKEND selects the live API (default), an offline fake, replay of
+        recorded responses, or the live API with recording; see gemini_backends.
         """
         self.api_key = os.getenv("GOOGLE_GENERATIVE_AI_API_KEY")
-        if not self.api_key:
+        self.backend = os.getenv("GEMINI_BACKEND", "live").lower()
+        self.model = None
+        self.model_name = None
+        self._resolved = False
+        self._lock = threading.Lock()
+        if self.backend not in BACKENDS:
+            print(f"WARNING: Unknown GEMINI_BACKEND '{self.backend}', using the live API.")
+            self.backend = "live"
+        if not self.api_key and self.backend not in OFFLINE_BACKENDS:
             print("WARNING: GOOGLE_GENERATIVE_AI_API_KEY environment variable is not set. AI features will not work.")
-            self.is_configured = False
-            return
+            self._resolved = True
+    
+    @property
+    def is_configured(self):
+        """Whether a model is available, resolving it on first access."""
+        if not self._resolved:
+            self._resolve_model()
+        return self.model is not None
+    
+    def _resolve_model(self):
+        with self._lock:
+            if self._resolved:
+                return
             
-        # Configure the Gemini API
-        genai.configure(api_key=self.api_key)
-        
-        # Set the preferred models in order of preference
-        preferred_models = ["gemini-1.5-flash-latest", "gemini-1.5-flash", "gemini-pro", "gemini-1.0-pro"]
+            if self.backend in OFFLINE_BACKENDS:
+                self.model = create_offline_model(self.backend)
+                self.model_name = self.model.name
+                print(f"Using the offline '{self.backend}' Gemini backend")
+                self._resolved = True
+                return
+            
+            # Configure the Gemini API
+            genai.configure(api_key=self.api_key)
+            
+            model_name = os.getenv("GEMINI_MODEL") or self._read_cached_model_name()
+            if not model_name:
+                model_name = self._discover_model_name()
+            
+            if model_name:
+                try:
+                    self.model = genai.GenerativeModel(model_name)
+                    self.model_name = model_name
+                    if self.backend == "record":
+                        self.model = RecordingModel(self.model)
+                    print(f"Successfully configured Gemini service with model: {model_name}")
+                except Exception as e:
+                    print(f"Error with model {model_name}: {e}")
+            else:
+                print("Failed to configure any Gemini model.")
+            self._resolved = True
+    
+    def _discover_model_name(self):
+        """
+        Pick the best available model, caching the choice on disk for every worker.
         
-        # Try to list available models
+        Returns:
+            str: Model name, or None if the API key has no usable model
+        """
         try:
-            available_models = genai.list_models()
-            print("Available models:")
             available_model_names = []
-            for model_info in available_models:
+            for model_info in genai.list_models():
                 model_name = model_info.name
                 if isinstance(model_name, str) and '/' in model_name:
                     model_name = model_name.split('/')[-1]  # Extract just the model name
-                print(f" - {model_name}")
                 available_model_names.append(model_name)
-            
-            # Try the preferred models in order
-            self.model_name = None
-            for preferred in preferred_models:
-                for available in available_model_names:
-                    if preferred in available:
-                        self.model_name = available
-                        break
-                if self.model_name:
-                    break
-                    
-            # If none of the preferred models are available, use the first available
-            if not self.model_name and available_model_names:
-                self.model_name = available_model_names[0]
-                
-            if self.model_name:
-                print(f"Using model: {self.model_name}")
-                self.model = genai.GenerativeModel(self.model_name)
-                self.is_configured = True
-                print(f"Successfully configured Gemini service with model: {self.model_name}")
-            else:
-                print("No models available with the provided API key.")
-                self.is_configured = False
-                
+            print(f"Found {len(available_model_names)} available models")
         except Exception as e:
-            print(f"Error listing or configuring models: {e}")
-            
-            # Try the preferred models directly
-            for model_name in preferred_models:
-                try:
-                    print(f"Trying model directly: {model_name}")
-                    self.model = genai.GenerativeModel(model_name)
-                    self.model_name = model_name
-                    self.is_configured = True
-                    print(f"Successfully configured Gemini service with model: {model_name}")
-                    return
-                except Exception as model_error:
-                    print(f"Error with model {model_name}: {model_error}")
-                    
-            # If we got here, none of the models worked
-            print("Failed to configure any Gemini model.")
-            self.is_configured = False
+            # Fall back to the first preferred model without caching it, so the next start lists again
+            print(f"Error listing models: {e}")
+            return PREFERRED_MODELS[0]
+        
+        # Try the preferred models in order
+        model_name = None
+        for preferred in PREFERRED_MODELS:
+            for available in available_model_names:
+                if preferred in available:
+                    model_name = available
+                    break
+            if model_name:
+                break
+        
+        # If none of the preferred models are available, use the first available
+        if not model_name and available_model_names:
+            model_name = available_model_names[0]
+        
+        if model_name:
+            self._write_cached_model_name(model_name)
+        else:
+            print("No models available with the provided API key.")
+        return model_name
+    
+    def _read_cached_model_name(self):
+        try:
+            with open(MODEL_CACHE_PATH) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get("key_id") != self._key_id() or cached.get("expires_at", 0) < time.time():
+            return None
+        return cached.get("model_name")
     
-    def generate_content(self, prompt_text, generation_config=None, retries=2):
+    def _write_cached_model_name(self, model_name):
+        # Write to a temporary file and rename it, so other workers never read a partial file
+        entry = {
+            "model_name": model_name,
+            "key_id": self._key_id(),
+            "expires_at": time.time() + MODEL_CACHE_TTL_SECONDS
+        }
+        try:
+            with replace_atomically(MODEL_CACHE_PATH) as tmp_path:
+                with open(tmp_path, "w") as f:
+                    json.dump(entry, f)
+        except OSError as e:
+            print(f"Could not cache Gemini model name: {e}")
+    
+    def _key_id(self):
+        # Different API keys may see different models; never store the key itself
+        return hashlib.sha256(self.api_key.encode("utf-8")).hexdigest()[:16]
+    
+    def generate_content(self, prompt_text, generation_config=None, retries=2, deadline_seconds=None):
         """
         Generate content using the Gemini API with retry logic.
         
+        Every attempt passes the shared guard first: it fails fast while the
+        circuit breaker is open and waits for the cross-worker rate and
+        concurrency limits. Retries back off with jitter and stop once the
+        next attempt would start after the deadline.
+        
         Args:
             prompt_text (str): The prompt to send to the API
             generation_config (dict, optional): Configuration for generation
             retries (int, optional): Number of retries on failure
+            deadline_seconds (float, optional): Time allowed for all attempts, defaults to GEMINI_DEADLINE_SECONDS
             
         Returns:
             str: Generated text or error message
@@ -98,6 +189,143 @@ class GeminiService:
         if not self.is_configured:
             return "Error: Gemini API not properly configured."
         
+        prompt_text, generation_config = self._prepare_request(prompt_text, generation_config)
+        deadline = time.monotonic() + (deadline_seconds or REQUEST_DEADLINE_SECONDS)
+        
+        metrics.GEMINI_PROMPT_SIZE.observe(len(prompt_text))
+        
+        # Try to generate content with retries
+        attempts = 0
+        while True:
+            if not gemini_guard.allow_call():
+                print("Gemini circuit breaker is open, failing fast")
+                metrics.GEMINI_REJECTED.labels("breaker_open").inc()
+                return BREAKER_OPEN_MESSAGE
+            try:
+                with gemini_guard.call_slot(deadline):
+                    started = time.perf_counter()
+                    try:
+                        response = self.model.generate_content(
+                            prompt_text,
+                            generation_config=generation_config
+                        )
+                        text = response.text
+                    except Exception:
+                        self._record_attempt("generate", started, False)
+                        raise
+                    self._record_attempt("generate", started, True)
+                
+                # Log the response for debugging
+                print(f"Raw Gemini Response: {text[:200]}...")
+                metrics.GEMINI_RESPONSE_SIZE.observe(len(text))
+                
+                return text
+                
+            except GuardTimeout as e:
+                print(f"Gemini call not started before the deadline: {e}")
+                metrics.GEMINI_REJECTED.labels("deadline").inc()
+                return f"Error generating AI response: {str(e)}"
+            except Exception as e:
+                attempts += 1
+                wait_time = self._retry_wait(attempts, retries, deadline)
+                if wait_time is None:
+                    print(f"Failed to generate content after {attempts} attempts: {e}")
+                    return f"Error generating AI response: {str(e)}"
+                print(f"Gemini API error: {e}. Retrying in {wait_time:.1f} seconds...")
+                metrics.GEMINI_RETRIES.labels("generate").inc()
+                time.sleep(wait_time)
+    
+    def generate_content_stream(self, prompt_text, generation_config=None, retries=2, deadline_seconds=None):
+        """
+        Generate content using the Gemini API, yielding text as it is produced.
+        
+        Attempts are guarded and retried like generate_content, but only until
+        the first chunk; a failure after text has been yielded is raised to the
+        caller. The concurrency slot is held until the stream ends.
+        
+        Args:
+            prompt_text (str): The prompt to send to the API
+            generation_config (dict, optional): Configuration for generation
+            retries (int, optional): Number of retries on failure
+            deadline_seconds (float, optional): Time allowed for all attempts, defaults to GEMINI_DEADLINE_SECONDS
+            
+        Yields:
+            str: Chunks of generated text, or a single error message
+        """
+        if not self.is_configured:
+            yield "Error: Gemini API not properly configured."
+            return
+        
+        prompt_text, generation_config = self._prepare_request(prompt_text, generation_config)
+        deadline = time.monotonic() + (deadline_seconds or REQUEST_DEADLINE_SECONDS)
+        
+        metrics.GEMINI_PROMPT_SIZE.observe(len(prompt_text))
+        
+        attempts = 0
+        while True:
+            if not gemini_guard.allow_call():
+                print("Gemini circuit breaker is open, failing fast")
+                metrics.GEMINI_REJECTED.labels("breaker_open").inc()
+                yield BREAKER_OPEN_MESSAGE
+                return
+            started = False
+            size = 0
+            try:
+                with gemini_guard.call_slot(deadline):
+                    call_started = time.perf_counter()
+                    try:
+                        response = self.model.generate_content(
+                            prompt_text,
+                            generation_config=generation_config,
+                            stream=True
+                        )
+                        for chunk in response:
+                            started = True
+                            size += len(chunk.text)
+                            yield chunk.text
+                    except GeneratorExit:
+                        # The client went away; that says nothing about Gemini's health
+                        raise
+                    except Exception:
+                        self._record_attempt("stream", call_started, False)
+                        raise
+                    self._record_attempt("stream", call_started, True)
+                metrics.GEMINI_RESPONSE_SIZE.observe(size)
+                return
+                
+            except GuardTimeout as e:
+                print(f"Gemini call not started before the deadline: {e}")
+                metrics.GEMINI_REJECTED.labels("deadline").inc()
+                yield f"Error generating AI response: {str(e)}"
+                return
+            except Exception as e:
+                attempts += 1
+                if started:
+                    raise
+                wait_time = self._retry_wait(attempts, retries, deadline)
+                if wait_time is None:
+                    print(f"Failed to stream content after {attempts} attempts: {e}")
+                    yield f"Error generating AI response: {str(e)}"
+                    return
+                print(f"Gemini API error: {e}. Retrying in {wait_time:.1f} seconds...")
+                metrics.GEMINI_RETRIES.labels("stream").inc()
+                time.sleep(wait_time)
+    
+    def _record_attempt(self, mode, started, ok):
+        # Feed the outcome to the circuit breaker and the latency histogram
+        gemini_guard.record(ok)
+        metrics.GEMINI_LATENCY.labels(mode, "ok" if ok else "error").observe(time.perf_counter() - started)
+    
+    def _retry_wait(self, attempts, retries, deadline):
+        # Exponential backoff with full jitter, so workers that failed together do not retry together
+        if attempts > retries:
+            return None
+        wait_time = random.uniform(0, min(2 ** attempts, MAX_BACKOFF_SECONDS))
+        if time.monotonic() + wait_time >= deadline:
+            return None
+        return wait_time
+    
+    def _prepare_request(self, prompt_text, generation_config):
         # Default generation config
         if generation_config is None:
             generation_config = {
@@ -110,32 +338,9 @@ class GeminiService:
             json_instruction = "\n\nIMPORTANT: Your response must be valid JSON with no text or comments outside the JSON object. DO NOT add comments inside the JSON (no // or /* */ comments). The JSON must be parseable by standard JSON parsers."
             prompt_text += json_instruction
         
-        # Try to generate content with retries
-        retry_count = 0
-        while retry_count <= retries:
-            try:
-                response = self.model.generate_content(
-                    prompt_text,
-                    generation_config=generation_config
-                )
-                
-                # Log the response for debugging
-                print(f"Raw Gemini Response: {response.text[:200]}...")
-                
-                return response.text
-                
-            except Exception as e:
-                retry_count += 1
-                if retry_count <= retries:
-                    # Exponential backoff
-                    wait_time = 2 ** retry_count
-                    print(f"Gemini API error: {e}. Retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
-                else:
-                    print(f"Failed to generate content after {retries} retries: {e}")
-                    return f"Error generating AI response: {str(e)}"
+        return prompt_text, generation_config
     
-    def generate_feeding_plan(self, animal_tag_id, species, breed, age, weight_kg, feeding_history, available_feed_types):
+    def generate_feeding_plan(self, animal_tag_id, species, breed, age, weight_kg, feeding_history, available_feed_types, stream=False):
         """
         Generate a feeding plan for a specific animal.
         
@@ -147,9 +352,10 @@ class GeminiService:
             weight_kg (str/float): The animal's weight in kg
             feeding_history (list): Recent feeding logs
             available_feed_types (list): Available feed types
+            stream (bool, optional): Stream the response, see stream_json
             
         Returns:
-            dict: A structured feeding plan
+            dict: A structured feeding plan, or a generator of streaming events if stream is set
         """
         # Create the prompt
         prompt = f"""You are an AI Farm Assistant specializing in livestock nutrition.
@@ -174,11 +380,9 @@ Output the plan in a structured JSON format like:
 IMPORTANT: Your response must be valid JSON with no text or comments outside the JSON object.
 """
         
-        # Generate and process the response
-        response_text = self.generate_content(prompt)
-        return self._extract_json_from_response(response_text)
+        return self.stream_json(prompt, animal_tag_id) if stream else self._generate_json(prompt, animal_tag_id)
     
-    def detect_anomalies(self, animal_tag_id, species, breed, age, feeding_history, health_history):
+    def detect_anomalies(self, animal_tag_id, species, breed, age, feeding_history, health_history, stream=False):
         """
         Detect health anomalies for a specific animal.
         
@@ -189,9 +393,10 @@ IMPORTANT: Your response must be valid JSON with no text or comments outside the
             age (str): The animal's age
             feeding_history (list): Recent feeding logs
             health_history (list): Recent health records
+            stream (bool, optional): Stream the response, see stream_json
             
         Returns:
-            dict: Detected anomalies and assessment
+            dict: Detected anomalies and assessment, or a generator of streaming events if stream is set
         """
         # Create the prompt
         prompt = f"""You are an AI Farm Assistant specializing in animal health monitoring.
@@ -230,11 +435,9 @@ If no significant anomalies, return an empty anomalies_detected list and a posit
 IMPORTANT: Your response must be valid JSON with no text or comments outside the JSON object.
 """
 
-        # Generate and process the response
-        response_text = self.generate_content(prompt)
-        return self._extract_json_from_response(response_text)
+        return self.stream_json(prompt, animal_tag_id) if stream else self._generate_json(prompt, animal_tag_id)
     
-    def generate_health_summary(self, animal_tag_id, species, breed, age, feeding_history, health_history, summary_period_start, summary_period_end):
+    def generate_health_summary(self, animal_tag_id, species, breed, age, feeding_history, health_history, summary_period_start, summary_period_end, recent_observations=None, stream=False):
         """
         Generate a health summary for a specific animal.
         
@@ -243,24 +446,30 @@ IMPORTANT: Your response must be valid JSON with no text or comments outside the
             species (str): The animal's species
             breed (str): The animal's breed
             age (str): The animal's age
-            feeding_history (list): All feeding logs
-            health_history (list): All health records
+            feeding_history (list): Daily feeding totals
+            health_history (list): Daily health aggregates
             summary_period_start (str): Start date of summary period
             summary_period_end (str): End date of summary period
+            recent_observations (list, optional): Most recent individual health records, for behavior
+            stream (bool, optional): Stream the response, see stream_json
             
         Returns:
-            dict: A structured health summary
+            dict: A structured health summary, or a generator of streaming events if stream is set
         """
         # Create the prompt
-        prompt = f"""You are an AI Farm Assistant.
+        def render(feeding_history, health_history):
+            return f"""You are an AI Farm Assistant.
 For animal ID {animal_tag_id}, a {species} (breed: {breed or 'Unknown'}) aged {age}, provide a concise health and feeding summary based on the following data:
 
-All Feeding Logs:
+Daily Feeding Totals:
 {chr(10).join(feeding_history) if feeding_history else "No feeding logs available."}
 
-All Health Records:
+Daily Health Aggregates:
 {chr(10).join(health_history) if health_history else "No health records available."}
 
+Recent Behavior Observations:
+{chr(10).join(recent_observations) if recent_observations else "No recent observations available."}
+
 Summarize key trends in feeding, weight, temperature, and behavior. Highlight any periods of concern or improvement. Provide an overall health status indication.
 Output in JSON format:
 {{
@@ -278,9 +487,172 @@ Output in JSON format:
 IMPORTANT: Your response must be valid JSON with no text or comments outside the JSON object.
 """
 
-        # Generate and process the response
-        response_text = self.generate_content(prompt)
-        return self._extract_json_from_response(response_text)
+        prompt = self._compact_prompt(animal_tag_id, render, feeding_history, health_history)
+        return self.stream_json(prompt, animal_tag_id) if stream else self._generate_json(prompt, animal_tag_id)
+    
+    def _compact_prompt(self, animal_tag_id, render, *histories):
+        """
+        Render a prompt, compacting its history sections if it exceeds the token budget.
+        
+        Each history gets a share of the budget left after the fixed text,
+        in proportion to its own size.
+        
+        Args:
+            animal_tag_id (str): The animal the prompt is about, for logging
+            render (callable): Builds the prompt from the history lists
+            *histories (list): History line lists, in render's argument order
+            
+        Returns:
+            str: The prompt to send
+        """
+        prompt = render(*histories)
+        before = estimate_tokens(prompt)
+        
+        if before > PROMPT_TOKEN_BUDGET:
+            available = max(PROMPT_TOKEN_BUDGET - estimate_tokens(render(*([] for _ in histories))), 0)
+            sizes = [estimate_tokens("\n".join(history)) for history in histories]
+            total = sum(sizes) or 1
+            histories = [compact_history(history, available * size // total) for history, size in zip(histories, sizes)]
+            prompt = render(*histories)
+        
+        after = estimate_tokens(prompt)
+        print(f"Prompt for {animal_tag_id}: ~{after} tokens, budget {PROMPT_TOKEN_BUDGET}, compaction ratio {after / before:.2f}")
+        return prompt
+    
+    def _generate_json(self, prompt, animal_tag_id):
+        """
+        Generate and parse a JSON response, reusing a cached result for an identical prompt.
+        
+        Identical prompts requested at the same time share one Gemini call:
+        other threads of this worker wait on it in-process, and other workers
+        wait for its result to appear in the result cache.
+        
+        Args:
+            prompt (str): The rendered prompt
+            animal_tag_id (str): The animal the prompt is about, used for cache invalidation
+            
+        Returns:
+            dict: Parsed JSON object or error dictionary
+        """
+        if not self.is_configured:
+            return self._extract_json_from_response(self.generate_content(prompt))
+        
+        cache_key = result_cache.make_key(self.model_name, prompt)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            print(f"AI result cache hit for {animal_tag_id}")
+            return cached
+        
+        flight, leader = single_flight.join(cache_key)
+        if not leader:
+            print(f"Joining an identical in-flight AI request for {animal_tag_id}")
+            return flight.wait(result_cache.lease_seconds) or {"error": FLIGHT_TIMEOUT_MESSAGE}
+        
+        result = None
+        try:
+            owner, result = self._claim_call(cache_key, animal_tag_id)
+            if owner:
+                try:
+                    result = self._extract_json_from_response(self.generate_content(prompt))
+                    
+                    # Only successful parses are cached; errors should be retried next time
+                    if "error" not in result:
+                        result_cache.set(cache_key, animal_tag_id, result)
+                finally:
+                    result_cache.release(cache_key, owner)
+            return result
+        finally:
+            single_flight.finish(cache_key, flight, result or {"error": "Error generating AI response: the request failed."})
+    
+    def stream_json(self, prompt, animal_tag_id):
+        """
+        Stream a JSON response, then parse it once the model has finished.
+        
+        A cached result for an identical prompt is returned without calling the
+        model. While an identical prompt is already in flight, only its final
+        result is yielded.
+        
+        Args:
+            prompt (str): The rendered prompt
+            animal_tag_id (str): The animal the prompt is about, used for cache invalidation
+            
+        Yields:
+            tuple: ("chunk", text) for each piece of the response as it arrives,
+                then exactly one ("result", dict) with the parsed JSON or error dictionary
+        """
+        cache_key = result_cache.make_key(self.model_name, prompt) if self.is_configured else None
+        if not cache_key:
+            yield from self._stream_result(prompt, animal_tag_id)
+            return
+        
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            print(f"AI result cache hit for {animal_tag_id}")
+            yield "result", cached
+            return
+        
+        flight, leader = single_flight.join(cache_key)
+        if not leader:
+            print(f"Joining an identical in-flight AI request for {animal_tag_id}")
+            yield "result", flight.wait(result_cache.lease_seconds) or {"error": FLIGHT_TIMEOUT_MESSAGE}
+            return
+        
+        result = None
+        try:
+            owner, result = self._claim_call(cache_key, animal_tag_id)
+            if owner:
+                try:
+                    for event, data in self._stream_result(prompt, animal_tag_id):
+                        if event == "result":
+                            result = data
+                            if "error" not in result:
+                                result_cache.set(cache_key, animal_tag_id, result)
+                        yield event, data
+                finally:
+                    result_cache.release(cache_key, owner)
+            else:
+                yield "result", result
+        finally:
+            # Also reached when the client disconnects mid-stream
+            single_flight.finish(cache_key, flight, result or {"error": "Error generating AI response: the request was interrupted."})
+    
+    def _stream_result(self, prompt, animal_tag_id):
+        chunks = []
+        try:
+            for text in self.generate_content_stream(prompt):
+                chunks.append(text)
+                yield "chunk", text
+        except Exception as e:
+            print(f"Gemini stream for {animal_tag_id} failed: {e}")
+            yield "result", {"error": f"Error generating AI response: {str(e)}"}
+            return
+        
+        yield "result", self._extract_json_from_response("".join(chunks))
+    
+    def _claim_call(self, cache_key, animal_tag_id):
+        """
+        Claim the Gemini call for a prompt, or wait while another worker makes it.
+        
+        Args:
+            cache_key (str): Result cache key of the prompt
+            animal_tag_id (str): The animal the prompt is about, for logging
+            
+        Returns:
+            tuple: (owner, result) - the claim to release after calling Gemini,
+                or None and the other worker's result
+        """
+        deadline = time.monotonic() + result_cache.lease_seconds
+        while True:
+            owner = result_cache.claim(cache_key)
+            if owner:
+                return owner, None
+            print(f"Waiting for another worker's identical AI request for {animal_tag_id}")
+            result = result_cache.wait_for(cache_key, deadline - time.monotonic())
+            if result is not None:
+                return None, result
+            # No result: the other call failed, so try to make it ourselves
+            if time.monotonic() >= deadline:
+                return None, {"error": FLIGHT_TIMEOUT_MESSAGE}
     
     def _extract_json_from_response(self, response_text):
         """
@@ -328,7 +700,9 @@ IMPORTANT: Your response must be valid JSON with no text or comments outside the
             try:
                 # Try a more flexible JSON parser (demjson if available)
                 import json5
-                return json5.loads(json_content)
+                result = json5.loads(json_content)
+                metrics.GEMINI_PARSE_FALLBACKS.labels("json5").inc()
+                return result
             except (ImportError, Exception) as flex_error:
                 print(f"Flexible JSON parsing failed: {flex_error}")
                 # One last attempt with manual comment removal
@@ -339,9 +713,12 @@ IMPORTANT: Your response must be valid JSON with no text or comments outside the
                         if '//' not in line and '/*' not in line and '*/' not in line:
                             clean_lines.append(line)
                     clean_json = '\n'.join(clean_lines)
-                    return json.loads(clean_json)
+                    result = json.loads(clean_json)
+                    metrics.GEMINI_PARSE_FALLBACKS.labels("comment_lines_dropped").inc()
+                    return result
                 except Exception:
                     # Give up and return the error
+                    metrics.GEMINI_PARSE_FALLBACKS.labels("failed").inc()
                     return {
                         "error": "Failed to parse AI response",
                         "raw_response": response_text
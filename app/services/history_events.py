@@ -0,0 +1,128 @@
+from datetime import datetime
+from itertools import chain
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import Session
+from models.models import Animal, FeedingLog, HealthRecord, Alert
+from services.result_cache import result_cache
+from services import feed_catalog
+from services.feed_catalog import record_feed_types
+from services.rollups import apply_feeding_rollups, apply_health_rollups
+
+# Keeps derived data (daily rollups, feed-type catalog, data versions, cached AI
+# results) in step with writes to an animal's feeding and health history. ORM
+# inserts are picked up automatically; bulk inserts that bypass the unit of work
+# call record_history_inserted themselves. Any other write to an animal, its
+# history or its alerts bumps only Animal.version, which HTTP responses about
+# the animal are validated against.
+
+# Edits to these animal columns change what is derived from the animal
+TRACKED_ANIMAL_FIELDS = ('animal_tag_id', 'species', 'breed', 'birth_date')
+
+
+def register_history_events():
+    """Attach the session listeners. Safe to call more than once."""
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_rollback', _after_rollback)
+
+
+def record_history_inserted(session, model, rows):
+    """
+    Update the daily rollups and feed-type catalog for new history rows and note the animals they belong to.
+
+    Args:
+        session: The SQLAlchemy session doing the write, inside the inserting transaction
+        model: FeedingLog or HealthRecord
+        rows (list): The inserted rows, as ORM objects or column dicts
+    """
+    if not rows:
+        return
+    if model is FeedingLog:
+        apply_feeding_rollups(session, rows)
+        record_feed_types(session, rows)
+    else:
+        apply_health_rollups(session, rows)
+    record_history_written(session, {row['animal_id'] if isinstance(row, dict) else row.animal_id for row in rows})
+
+
+def record_history_written(session, animal_ids):
+    """
+    Note that the feeding or health history of some animals changed in the current transaction.
+
+    Bumps their data_version and version and queues their cached AI results for invalidation on commit.
+
+    Args:
+        session: The SQLAlchemy session doing the write
+        animal_ids (iterable): Ids of the animals whose history changed
+    """
+    animal_ids = set(animal_ids)
+    if not animal_ids:
+        return
+
+    session.execute(
+        update(Animal).where(Animal.id.in_(animal_ids)).values(
+            data_version=Animal.data_version + 1, version=Animal.version + 1, modified_at=datetime.utcnow()
+        ),
+        execution_options={'synchronize_session': False}
+    )
+    tags = session.execute(select(Animal.animal_tag_id).where(Animal.id.in_(animal_ids))).scalars()
+    session.info.setdefault('history_changed_tags', set()).update(tags)
+
+
+def record_animals_modified(session, animal_ids):
+    """
+    Note that some animals, or their history or alerts, changed in the current transaction
+    in a way that leaves derived data valid.
+
+    Bumps their version and modified_at only.
+
+    Args:
+        session: The SQLAlchemy session doing the write
+        animal_ids (iterable): Ids of the changed animals
+    """
+    animal_ids = {animal_id for animal_id in animal_ids if animal_id is not None}
+    if not animal_ids:
+        return
+
+    session.execute(
+        update(Animal).where(Animal.id.in_(animal_ids)).values(version=Animal.version + 1, modified_at=datetime.utcnow()),
+        execution_options={'synchronize_session': False}
+    )
+
+
+def _after_flush(session, flush_context):
+    inserted = set()
+    for model in (FeedingLog, HealthRecord):
+        rows = [obj for obj in session.new if isinstance(obj, model)]
+        record_history_inserted(session, model, rows)
+        inserted.update(row.animal_id for row in rows)
+
+    edited = {obj.id for obj in session.dirty if isinstance(obj, Animal) and _tracked_fields_changed(obj)}
+    record_history_written(session, edited - inserted)
+
+    # Everything else that changes what an animal's endpoints return
+    touched = {obj.id for obj in session.dirty if isinstance(obj, Animal) and session.is_modified(obj)}
+    touched.update(obj.animal_id for obj in chain(session.new, session.dirty, session.deleted)
+                   if isinstance(obj, (FeedingLog, HealthRecord, Alert)))
+    deleted = {obj.id for obj in session.deleted if isinstance(obj, Animal)}
+    record_animals_modified(session, touched - inserted - edited - deleted)
+
+
+def _tracked_fields_changed(animal):
+    state = inspect(animal)
+    return any(state.attrs[field].history.has_changes() for field in TRACKED_ANIMAL_FIELDS)
+
+
+def _after_commit(session):
+    tags = session.info.pop('history_changed_tags', None)
+    if tags:
+        result_cache.invalidate_animals(tags)
+    species = session.info.pop('feed_catalog_species', None)
+    if species:
+        feed_catalog.invalidate(species)
+
+
+def _after_rollback(session):
+    session.info.pop('history_changed_tags', None)
+    session.info.pop('feed_catalog_species', None)
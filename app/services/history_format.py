@@ -0,0 +1,57 @@
+from datetime import datetime
+
+# Prompt formatting of feeding logs and health records, shared by the AI routes
+# and herd-wide jobs. Rows may be ORM objects or result rows with the same fields.
+
+
+def format_age(birth_date):
+    """
+    Describe an animal's age for a prompt.
+
+    Args:
+        birth_date (date): The animal's birth date, may be None
+
+    Returns:
+        str: e.g. "3.5 years (1277 days)" or "Unknown"
+    """
+    if not birth_date:
+        return "Unknown"
+    age_days = (datetime.utcnow().date() - birth_date).days
+    age_years = age_days / 365
+    return f"{age_years:.1f} years ({age_days} days)"
+
+
+def format_feeding_log(log, with_notes=True):
+    """Format a feeding log as a prompt history line."""
+    line = f"- {log.timestamp.strftime('%Y-%m-%d')}: {log.feed_type}, {log.quantity_kg} kg"
+    if with_notes:
+        line += f", Notes: {log.notes or 'None'}"
+    return line
+
+
+def format_health_record(record):
+    """Format a health record as a prompt history line."""
+    return (f"- {record.timestamp.strftime('%Y-%m-%d')}: Weight {record.weight_kg or 'N/A'} kg, "
+            f"Temp {record.temperature_celsius or 'N/A'} C, Behavior: {record.behavior_observation}, "
+            f"Notes: {record.notes or 'None'}")
+
+
+def format_feeding_day(day, rollups):
+    """Format one day of feeding rollups (one per feed type) as a prompt history line."""
+    feeds = ", ".join(f"{rollup.feed_type} {rollup.total_kg:.1f} kg ({rollup.feedings}x)" for rollup in rollups)
+    return f"- {day.strftime('%Y-%m-%d')}: {feeds}"
+
+
+def format_health_day(rollup):
+    """Format a daily health rollup as a prompt history line."""
+    def measure(label, mean, low, high, unit):
+        if mean is None:
+            return f"{label} N/A"
+        if low == high:
+            return f"{label} {mean:.1f} {unit}"
+        return f"{label} {mean:.1f} {unit} (range {low:.1f}-{high:.1f})"
+
+    return (f"- {rollup.day.strftime('%Y-%m-%d')}: "
+            f"{measure('Weight', rollup.weight_mean, rollup.weight_min, rollup.weight_max, 'kg')}, "
+            f"{measure('Temp', rollup.temperature_mean, rollup.temperature_min, rollup.temperature_max, 'C')}, "
+            f"{rollup.observations} observation{'s' if rollup.observations != 1 else ''}")
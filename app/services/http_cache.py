@@ -0,0 +1,71 @@
+import hashlib
+from datetime import datetime, timezone
+from flask import Response, request
+
+# Conditional GET for responses about one animal. The validators come from the
+# animal row alone: Animal.version and modified_at change with every write to
+# the animal, its history or its alerts. A client whose copy is current gets a
+# 304 before any history is read or any payload is built.
+
+
+class AnimalValidators:
+    """
+    ETag and Last-Modified for a response derived from one animal's data.
+    """
+
+    def __init__(self, animal, resource, weak=False, day=None):
+        """
+        Build the validators for the current request.
+
+        Args:
+            animal (Animal): The animal the response is about
+            resource (str): Name of the endpoint, so each endpoint and query string gets its own tag
+            weak (bool, optional): Mark the ETag weak, for responses that are equivalent but
+                not guaranteed byte-identical, such as AI output
+            day (date, optional): Also vary on this day, for responses that change with the date
+
+        """
+        key = f"{animal.id}:{animal.version}:{resource}:{request.query_string.decode()}:{day or ''}"
+        self.etag = hashlib.sha1(key.encode()).hexdigest()[:20]
+        self.weak = weak
+
+        last_modified = animal.modified_at
+        if day is not None:
+            midnight = datetime(day.year, day.month, day.day)
+            last_modified = max(last_modified, midnight) if last_modified else midnight
+        # HTTP dates have whole-second precision
+        self.last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc) if last_modified else None
+
+    def not_modified(self):
+        """
+        Answer the request with 304 if the client's copy is current.
+
+        If-None-Match takes precedence over If-Modified-Since when both are sent.
+
+        Returns:
+            Response: An empty 304 response, or None if the full response is needed
+        """
+        if request.if_none_match:
+            current = request.if_none_match.contains_weak(self.etag)
+        elif request.if_modified_since and self.last_modified:
+            current = self.last_modified <= request.if_modified_since
+        else:
+            current = False
+        return self.apply(Response(status=304)) if current else None
+
+    def apply(self, response):
+        """
+        Add the validators to a response.
+
+        Args:
+            response (Response): A successful response about the animal
+
+        Returns:
+            Response: The same response
+        """
+        response.set_etag(self.etag, weak=self.weak)
+        if self.last_modified:
+            response.last_modified = self.last_modified
+        # Let clients keep the response but revalidate it on every use
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
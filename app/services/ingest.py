@@ -0,0 +1,222 @@
+import csv
+import json
+import codecs
+from datetime import datetime, timezone
+from sqlalchemy import insert
+from models.models import db, Animal, FeedingLog, HealthRecord
+from services.history_events import record_history_inserted
+
+# Rows inserted per transaction
+CHUNK_SIZE = 500
+
+# Cap on the number of per-row errors returned to the client
+MAX_REPORTED_ERRORS = 1000
+
+FORMATS = ('ndjson', 'csv')
+
+
+def detect_format(content_type, requested=None):
+    """
+    Work out the stream format from an explicit ?format= value or the Content-Type header.
+
+    Args:
+        content_type (str): The request's Content-Type header
+        requested (str, optional): Format requested explicitly by the client
+
+    Returns:
+        str: 'ndjson' or 'csv', or None if the format is not supported
+    """
+    if requested:
+        requested = requested.lower()
+        return requested if requested in FORMATS else None
+
+    mimetype = (content_type or '').split(';')[0].strip().lower()
+    if mimetype in ('text/csv', 'application/csv'):
+        return 'csv'
+    if mimetype in ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/json', ''):
+        return 'ndjson'
+    return None
+
+
+def ingest_feeding_logs(stream, fmt):
+    """
+    Insert feeding logs for any number of animals from an NDJSON or CSV stream.
+
+    Args:
+        stream: Binary file-like object with one record per line
+        fmt (str): 'ndjson' or 'csv'
+
+    Returns:
+        dict: Ingest report with inserted/failed counts and per-row errors, plus an
+            'error' message if the body itself could not be read to the end
+    """
+    return _ingest(stream, fmt, FeedingLog, _feeding_log_row)
+
+
+def ingest_health_records(stream, fmt):
+    """
+    Insert health records for any number of animals from an NDJSON or CSV stream.
+
+    Args:
+        stream: Binary file-like object with one record per line
+        fmt (str): 'ndjson' or 'csv'
+
+    Returns:
+        dict: Ingest report with inserted/failed counts and per-row errors, plus an
+            'error' message if the body itself could not be read to the end
+    """
+    return _ingest(stream, fmt, HealthRecord, _health_record_row)
+
+
+def _ingest(stream, fmt, model, build_row):
+    report = {'inserted': 0, 'failed': 0, 'errors': []}
+    tag_ids = {}
+    chunk = []
+
+    try:
+        for line_no, record in _iter_records(stream, fmt):
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                tag = _required_str(record, 'animal_tag_id')
+                row = build_row(record)
+            except KeyError as e:
+                _add_error(report, line_no, record, f'Missing required field: {str(e)}')
+                continue
+            except (ValueError, TypeError) as e:
+                _add_error(report, line_no, record, str(e))
+                continue
+
+            chunk.append((line_no, tag, row))
+            if len(chunk) >= CHUNK_SIZE:
+                _flush_chunk(chunk, model, tag_ids, report)
+                chunk = []
+    except UnicodeDecodeError:
+        # The rest of the body cannot be read; rows before it are still inserted
+        report['error'] = 'Request body is not valid UTF-8'
+    except csv.Error as e:
+        report['error'] = f'Malformed CSV: {str(e)}'
+
+    if chunk:
+        _flush_chunk(chunk, model, tag_ids, report)
+
+    return report
+
+
+def _flush_chunk(chunk, model, tag_ids, report):
+    # Resolve every tag in the chunk we have not seen yet with a single query
+    unknown = {tag for _, tag, _ in chunk if tag not in tag_ids}
+    if unknown:
+        found = db.session.query(Animal.animal_tag_id, Animal.id).filter(Animal.animal_tag_id.in_(unknown)).all()
+        tag_ids.update(dict(found))
+        for tag in unknown:
+            tag_ids.setdefault(tag, None)
+
+    rows = []
+    lines = []
+    for line_no, tag, row in chunk:
+        animal_id = tag_ids[tag]
+        if animal_id is None:
+            _add_error(report, line_no, {'animal_tag_id': tag}, 'Animal not found')
+            continue
+        row['animal_id'] = animal_id
+        rows.append(row)
+        lines.append((line_no, tag))
+
+    if not rows:
+        return
+
+    try:
+        # A list of parameter sets makes SQLAlchemy run a single executemany
+        db.session.execute(insert(model), rows)
+        record_history_inserted(db.session, model, rows)
+        db.session.commit()
+        report['inserted'] += len(rows)
+    except Exception as e:
+        db.session.rollback()
+        for line_no, tag in lines:
+            _add_error(report, line_no, {'animal_tag_id': tag}, f'Database error: {str(e)}')
+
+
+def _iter_records(stream, fmt):
+    lines = codecs.iterdecode(stream, 'utf-8-sig')
+
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record
+        return
+
+    for line_no, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, ValueError(f'Invalid JSON: {str(e)}')
+            continue
+        if not isinstance(record, dict):
+            yield line_no, ValueError('Each line must be a JSON object')
+            continue
+        yield line_no, record
+
+
+def _feeding_log_row(record):
+    return {
+        'timestamp': parse_timestamp(record.get('timestamp')),
+        'feed_type': _required_str(record, 'feed_type'),
+        'quantity_kg': float(_required(record, 'quantity_kg')),
+        'notes': record.get('notes') or None
+    }
+
+
+def _health_record_row(record):
+    return {
+        'timestamp': parse_timestamp(record.get('timestamp')),
+        'weight_kg': _optional_float(record.get('weight_kg')),
+        'temperature_celsius': _optional_float(record.get('temperature_celsius')),
+        'behavior_observation': _required_str(record, 'behavior_observation'),
+        'notes': record.get('notes') or None
+    }
+
+
+def _required(record, field):
+    value = record.get(field)
+    if value is None or value == '':
+        raise KeyError(field)
+    return value
+
+
+def _required_str(record, field):
+    return str(_required(record, field)).strip()
+
+
+def _optional_float(value):
+    if value is None or value == '':
+        return None
+    return float(value)
+
+
+def parse_timestamp(value):
+    """Parse an ISO 8601 timestamp into naive UTC, defaulting to now."""
+    if value is None or value == '':
+        return datetime.utcnow()
+    if not isinstance(value, str):
+        raise ValueError(f'Invalid timestamp: {value!r}')
+
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f'Invalid timestamp: {value!r}')
+
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _add_error(report, line_no, record, message):
+    report['failed'] += 1
+    if len(report['errors']) < MAX_REPORTED_ERRORS:
+        tag = record.get('animal_tag_id') if isinstance(record, dict) else None
+        report['errors'].append({'line': line_no, 'animal_tag_id': tag, 'error': message})
@@ -0,0 +1,182 @@
+import os
+import json
+import uuid
+import threading
+import traceback
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import and_, func, or_
+from models.models import db, AIJob
+
+# A running job whose heartbeat is older than this belonged to a worker that died
+JOB_LEASE_SECONDS = int(os.getenv("AI_JOB_LEASE_SECONDS", "600"))
+# How often the worker executing a job renews its heartbeat
+JOB_HEARTBEAT_SECONDS = int(os.getenv("AI_JOB_HEARTBEAT_SECONDS", "60"))
+
+
+class JobRunner:
+    """
+    Runs slow AI work on a local thread pool so requests return immediately.
+
+    Jobs are rows in the ai_job table: any worker can report their status, and
+    jobs that were queued or interrupted are picked up again after a restart.
+    A running job's worker renews its heartbeat while the handler runs, so only
+    jobs whose worker stopped renewing are ever executed again.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.executor = None
+        self.handlers = {}
+
+    def init_app(self, app, max_workers=None):
+        """
+        Bind the runner to the Flask app and start its thread pool.
+
+        Args:
+            app: The Flask application, used to give worker threads an app context
+            max_workers (int, optional): Pool size, defaults to AI_JOB_WORKERS or 2
+        """
+        self.app = app
+        max_workers = max_workers or int(os.getenv("AI_JOB_WORKERS", "2"))
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ai-job")
+
+    def register(self, kind, handler):
+        """
+        Register the function that executes a kind of job.
+
+        Args:
+            kind (str): Job kind, as passed to submit
+            handler (callable): Called with the AIJob inside an app context;
+                returns a JSON-serializable dict, with an "error" key on failure
+        """
+        self.handlers[kind] = handler
+
+    def submit(self, kind, animal_tag_id=None, params=None):
+        """
+        Persist a new job and hand it to the local pool.
+
+        Args:
+            kind (str): A registered job kind
+            animal_tag_id (str, optional): Animal the job is about
+            params (dict, optional): Extra arguments for the handler
+
+        Returns:
+            AIJob: The queued job
+
+        Raises:
+            ValueError: If the kind is not registered
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        job = AIJob(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            animal_tag_id=animal_tag_id,
+            params=json.dumps(params) if params else None,
+            status="queued"
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        self.executor.submit(self._run, job.id)
+        return job
+
+    def update_progress(self, job_id, progress):
+        """
+        Record progress for a running job so pollers can follow it, renewing its heartbeat.
+
+        Args:
+            job_id (str): The job being executed
+            progress (dict): JSON-serializable progress details
+        """
+        AIJob.query.filter_by(id=job_id, status="running").update({
+            "progress": json.dumps(progress),
+            "heartbeat_at": datetime.utcnow()
+        }, synchronize_session=False)
+        db.session.commit()
+
+    def resume_pending(self):
+        """
+        Dispatch every queued job and every running job whose worker died.
+
+        Called at startup by each worker; the conditional claim in _run makes
+        sure a job only executes once even if several workers dispatch it.
+
+        Returns:
+            int: Number of jobs dispatched
+        """
+        job_ids = [job_id for (job_id,) in db.session.query(AIJob.id).filter(
+            _claimable(datetime.utcnow())
+        ).order_by(AIJob.created_at)]
+        for job_id in job_ids:
+            self.executor.submit(self._run, job_id)
+        return len(job_ids)
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            try:
+                # Claim the job with a conditional update, so only one worker executes it
+                now = datetime.utcnow()
+                claimed = AIJob.query.filter(AIJob.id == job_id, _claimable(now)).update({
+                    "status": "running",
+                    "started_at": now,
+                    "heartbeat_at": now,
+                    "attempts": AIJob.attempts + 1
+                }, synchronize_session=False)
+                db.session.commit()
+                if not claimed:
+                    return
+
+                stop = threading.Event()
+                heartbeat = threading.Thread(target=self._heartbeat, args=(job_id, stop), daemon=True,
+                                             name=f"ai-job-heartbeat-{job_id[:8]}")
+                heartbeat.start()
+                job = db.session.get(AIJob, job_id)
+                try:
+                    result = self.handlers[job.kind](job)
+                    job.status = "failed" if "error" in result else "succeeded"
+                    job.result = json.dumps(result)
+                except Exception as e:
+                    print(f"AI job {job_id} failed: {e}")
+                    traceback.print_exc()
+                    db.session.rollback()
+                    job = db.session.get(AIJob, job_id)
+                    job.status = "failed"
+                    job.error = str(e)
+                finally:
+                    stop.set()
+                    heartbeat.join()
+
+                job.finished_at = datetime.utcnow()
+                db.session.commit()
+            finally:
+                db.session.remove()
+
+    def _heartbeat(self, job_id, stop):
+        # Runs beside the handler, so a job stays leased however rarely it reports progress
+        while not stop.wait(JOB_HEARTBEAT_SECONDS):
+            with self.app.app_context():
+                try:
+                    AIJob.query.filter_by(id=job_id, status="running").update(
+                        {"heartbeat_at": datetime.utcnow()}, synchronize_session=False
+                    )
+                    db.session.commit()
+                except Exception as e:
+                    print(f"Could not renew heartbeat of AI job {job_id}: {e}")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+
+def _claimable(now):
+    # Queued jobs, and running jobs whose worker has stopped renewing the heartbeat
+    stale_before = now - timedelta(seconds=JOB_LEASE_SECONDS)
+    return or_(
+        AIJob.status == "queued",
+        and_(AIJob.status == "running", func.coalesce(AIJob.heartbeat_at, AIJob.started_at) < stale_before)
+    )
+
+# Create a singleton instance
+job_runner = JobRunner()
@@ -0,0 +1,78 @@
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# Helpers for the files services keep next to the database: small SQLite stores
+# shared by every worker on the host, and files replaced in one step.
+
+
+class LocalDatabase:
+    """
+    A SQLite file shared between worker processes, with one connection per thread.
+    """
+
+    def __init__(self, path, schema, autocommit=False):
+        """
+        Describe the database; nothing is opened until a thread first connects.
+
+        Args:
+            path (str): SQLite file, created with its directory if missing
+            schema (str): Idempotent CREATE statements run on every new connection
+            autocommit (bool, optional): Leave transactions to the caller's BEGIN/COMMIT
+        """
+        self.path = path
+        self.schema = schema
+        self.autocommit = autocommit
+        self._local = threading.local()
+
+    def connection(self):
+        """
+        Get this thread's connection, opening it in WAL mode on first use.
+
+        sqlite3 connections cannot be shared between threads.
+
+        Returns:
+            sqlite3.Connection: The calling thread's connection
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            if self.autocommit:
+                conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            else:
+                conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self.schema)
+            self._local.conn = conn
+        return conn
+
+
+@contextmanager
+def replace_atomically(path):
+    """
+    Write a file under a temporary name and move it into place once complete.
+
+    A concurrent reader sees either the old file or the whole new one, never
+    half a file; if writing fails the temporary file is removed.
+
+    Args:
+        path (str): Final location of the file; its directory is created if missing
+
+    Yields:
+        str: Temporary path in the same directory to write the contents to
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,116 @@
+import os
+import time
+from flask import g, has_request_context, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Prometheus metrics for the web app and the Gemini calls. Under gunicorn every
+# worker writes its samples to PROMETHEUS_MULTIPROC_DIR (set up by
+# gunicorn.conf.py) and /metrics merges them; without it, as under the Flask
+# development server, the process's own registry is served.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+SIZE_BUCKETS = (256, 1024, 4096, 8192, 16384, 32768, 65536, 131072)
+
+REQUEST_LATENCY = Histogram(
+    'farm_http_request_duration_seconds', 'Time to produce a response, by route',
+    ['method', 'route'], buckets=LATENCY_BUCKETS
+)
+REQUESTS = Counter(
+    'farm_http_requests_total', 'Responses by route and status code', ['method', 'route', 'status']
+)
+DB_QUERIES = Histogram(
+    'farm_db_queries_per_request', 'Database queries executed while handling a request',
+    ['route'], buckets=QUERY_COUNT_BUCKETS
+)
+DB_TIME = Histogram(
+    'farm_db_query_seconds_per_request', 'Time spent in database queries while handling a request',
+    ['route'], buckets=LATENCY_BUCKETS
+)
+GEMINI_LATENCY = Histogram(
+    'farm_gemini_call_duration_seconds', 'Duration of one Gemini API attempt',
+    ['mode', 'outcome'], buckets=LATENCY_BUCKETS
+)
+GEMINI_RETRIES = Counter('farm_gemini_retries_total', 'Gemini attempts retried after an error', ['mode'])
+GEMINI_REJECTED = Counter(
+    'farm_gemini_rejected_total', 'Gemini calls not attempted because of the guard', ['reason']
+)
+GEMINI_PARSE_FALLBACKS = Counter(
+    'farm_gemini_parse_fallbacks_total', 'Responses that were not plain JSON, by how they were finally handled',
+    ['result']
+)
+GEMINI_PROMPT_SIZE = Histogram(
+    'farm_gemini_prompt_chars', 'Characters in prompts sent to Gemini', buckets=SIZE_BUCKETS
+)
+GEMINI_RESPONSE_SIZE = Histogram(
+    'farm_gemini_response_chars', 'Characters in Gemini responses', buckets=SIZE_BUCKETS
+)
+
+
+def init_app(app):
+    """
+    Time every request and count the database queries it runs.
+
+    Args:
+        app: The Flask application
+    """
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def render():
+    """
+    Render the metrics of all workers in the Prometheus text format.
+
+    Returns:
+        tuple: (body bytes, content type)
+    """
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def _route():
+    # The URL rule rather than the path, so /animals/<animal_tag_id> is one series
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_queries = 0
+    g.metrics_query_seconds = 0.0
+
+
+def _finish_request(response):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return response
+
+    # Streamed bodies are produced after this point, so they count time to the first byte
+    route = _route()
+    REQUEST_LATENCY.labels(request.method, route).observe(time.perf_counter() - started)
+    REQUESTS.labels(request.method, route, str(response.status_code)).inc()
+    DB_QUERIES.labels(route).observe(g.metrics_queries)
+    DB_TIME.labels(route).observe(g.metrics_query_seconds)
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_metrics_started', None)
+    if started is not None and has_request_context() and 'metrics_started' in g:
+        g.metrics_queries += 1
+        g.metrics_query_seconds += time.perf_counter() - started
@@ -0,0 +1,123 @@
+import base64
+from sqlalchemy import and_, or_
+from services.ingest import parse_timestamp
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class PageArgs:
+    """
+    Validated keyset pagination arguments from a request's query string.
+    """
+
+    def __init__(self, args):
+        """
+        Parse ?limit=, ?after=, ?since= and ?until= query parameters.
+
+        Args:
+            args: The request's query arguments
+
+        Raises:
+            ValueError: If any argument is malformed
+        """
+        try:
+            self.limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+        except ValueError:
+            raise ValueError('limit must be an integer')
+        if self.limit < 1:
+            raise ValueError('limit must be positive')
+        self.limit = min(self.limit, MAX_PAGE_SIZE)
+
+        self.after = decode_cursor(args['after']) if args.get('after') else None
+        self.since = parse_timestamp(args['since']) if args.get('since') else None
+        self.until = parse_timestamp(args['until']) if args.get('until') else None
+
+
+def encode_cursor(timestamp, row_id):
+    """
+    Build an opaque cursor for the row at (timestamp, id).
+
+    Args:
+        timestamp (datetime): The row's timestamp, or None for id-only ordering
+        row_id (int): The row's primary key
+
+    Returns:
+        str: URL-safe cursor string
+    """
+    raw = f"{timestamp.isoformat() if timestamp else ''}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor (str): Cursor string from a previous page's next_cursor
+
+    Returns:
+        tuple: (timestamp or None, id)
+
+    Raises:
+        ValueError: If the cursor is not valid
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, row_id = raw.split('|')
+        return (parse_timestamp(timestamp) if timestamp else None), int(row_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def paginate(query, model, page, time_column=None):
+    """
+    Fetch one page of a query ordered by (time_column, id).
+
+    Rows strictly after the cursor are selected with a range condition on the
+    ordering columns, so every page costs the same however deep it is.
+
+    Args:
+        query: SQLAlchemy query over model, already filtered
+        model: The model being paged through
+        page (PageArgs): Parsed pagination arguments
+        time_column (optional): Timestamp column to order and range-filter on;
+            rows are ordered by id alone when omitted
+
+    Returns:
+        tuple: (list of model instances, next cursor or None)
+
+    Raises:
+        ValueError: If since or until is given without a time_column to filter on
+    """
+    if time_column is None and (page.since or page.until):
+        raise ValueError('since and until are not supported for this list')
+
+    if time_column is not None:
+        if page.since:
+            query = query.filter(time_column >= page.since)
+        if page.until:
+            query = query.filter(time_column < page.until)
+        if page.after:
+            after_time, after_id = page.after
+            if after_time is None:
+                raise ValueError('Invalid cursor')
+            query = query.filter(and_(
+                time_column >= after_time,
+                or_(time_column > after_time, model.id > after_id)
+            ))
+        query = query.order_by(time_column, model.id)
+    else:
+        if page.after:
+            query = query.filter(model.id > page.after[1])
+        query = query.order_by(model.id)
+
+    # Fetch one extra row to find out whether another page exists
+    rows = query.limit(page.limit + 1).all()
+    if len(rows) <= page.limit:
+        return rows, None
+
+    rows = rows[:page.limit]
+    last = rows[-1]
+    last_time = getattr(last, time_column.key) if time_column is not None else None
+    return rows, encode_cursor(last_time, last.id)
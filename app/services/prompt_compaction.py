@@ -0,0 +1,195 @@
+import os
+import re
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from statistics import median
+
+# Shrinks dated history lines ("- YYYY-MM-DD: ...") to fit a prompt token budget.
+# Recent days and days that stand out from the rest are always kept verbatim;
+# everything older is collapsed step by step: runs of identical days, then
+# weekly averages, then monthly averages, and finally the oldest entries are
+# dropped if the budget still cannot be met.
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "8000"))
+PROMPT_RECENT_DAYS = int(os.getenv("PROMPT_RECENT_DAYS", "14"))
+
+# A day is anomalous when a value is this many robust deviations from the usual value...
+ANOMALY_Z = 3.5
+# ...and also differs from it by at least this fraction
+ANOMALY_MIN_CHANGE = 0.1
+# Entries whose wording is shared by fewer than this fraction of days are kept verbatim
+RARE_TEMPLATE_SHARE = 0.05
+MIN_DAYS_FOR_STATS = 5
+
+_LINE = re.compile(r'^- (\d{4}-\d{2}-\d{2}): (.*)$')
+_NUMBER = re.compile(r'(?<![\d.])\d+(?:\.\d+)?')
+
+
+def estimate_tokens(text):
+    """
+    Estimate how many tokens a text costs, at roughly four characters per token.
+
+    Args:
+        text (str): Prompt text
+
+    Returns:
+        int: Estimated token count
+    """
+    return (len(text) + 3) // 4
+
+
+def compact_history(lines, budget_tokens, recent_days=PROMPT_RECENT_DAYS):
+    """
+    Compact history lines until they fit the token budget.
+
+    Args:
+        lines (list): History lines in chronological order
+        budget_tokens (int): Tokens the joined lines may use
+        recent_days (int, optional): Days before the latest entry kept in full detail
+
+    Returns:
+        list: The compacted lines, still in chronological order
+    """
+    if _tokens(lines) <= budget_tokens:
+        return list(lines)
+
+    entries = [_parse(line) for line in lines]
+    dated = [entry for entry in entries if entry['day']]
+    if not dated:
+        return _drop_oldest(list(lines), budget_tokens)
+
+    cutoff = max(entry['day'] for entry in dated) - timedelta(days=recent_days)
+    older = [entry for entry in dated if entry['day'] <= cutoff]
+    kept = [entry for entry in entries if not entry['day'] or entry['day'] > cutoff]
+    kept.extend(_anomalous(older))
+    normal = [entry for entry in older if not entry.get('anomalous')]
+
+    compacted = []
+    for collapse in (_daily_runs, _weekly, _monthly):
+        compacted = _merge(collapse(normal), kept)
+        if _tokens(compacted) <= budget_tokens:
+            return compacted
+    return _drop_oldest(compacted, budget_tokens)
+
+
+def _tokens(lines):
+    return estimate_tokens("\n".join(lines))
+
+
+def _parse(line):
+    match = _LINE.match(line)
+    if not match:
+        return {'day': None, 'line': line}
+    body = match.group(2)
+    return {
+        'day': date.fromisoformat(match.group(1)),
+        'line': line,
+        'body': body,
+        'template': _NUMBER.sub('#', body),
+        'values': [float(number) for number in _NUMBER.findall(body)]
+    }
+
+
+def _anomalous(entries):
+    """Flag days whose values or wording stand out from the rest of the older history."""
+    by_template = defaultdict(list)
+    for entry in entries:
+        by_template[entry['template']].append(entry)
+
+    flagged = {}
+    for template, group in by_template.items():
+        if len(entries) >= MIN_DAYS_FOR_STATS and len(group) < RARE_TEMPLATE_SHARE * len(entries):
+            flagged.update((id(entry), entry) for entry in group)
+            continue
+        if len(group) < MIN_DAYS_FOR_STATS:
+            continue
+        for position in range(len(group[0]['values'])):
+            values = [entry['values'][position] for entry in group]
+            center = median(values)
+            spread = 1.4826 * median(abs(value - center) for value in values)
+            for entry in group:
+                change = abs(entry['values'][position] - center)
+                if change > ANOMALY_Z * spread and change >= ANOMALY_MIN_CHANGE * abs(center):
+                    flagged[id(entry)] = entry
+
+    for entry in flagged.values():
+        entry['anomalous'] = True
+    return list(flagged.values())
+
+
+def _daily_runs(entries):
+    """Run-length encode consecutive days with identical entries."""
+    return _run_length(entries, lambda entry: entry['day'], 'day')
+
+
+def _weekly(entries):
+    return _run_length(_aggregate(entries, lambda day: day - timedelta(days=day.weekday())), lambda entry: entry['day'], 'week')
+
+
+def _monthly(entries):
+    return _run_length(_aggregate(entries, lambda day: day.replace(day=1)), lambda entry: entry['day'], 'month')
+
+
+def _aggregate(entries, period_start):
+    """Average the values of each period's most common entry shape."""
+    periods = defaultdict(list)
+    for entry in entries:
+        periods[period_start(entry['day'])].append(entry)
+
+    aggregated = []
+    for start, group in sorted(periods.items()):
+        template, _ = Counter(entry['template'] for entry in group).most_common(1)[0]
+        matching = [entry for entry in group if entry['template'] == template]
+        means = [sum(values) / len(values) for values in zip(*(entry['values'] for entry in matching))]
+        body = _fill(template, means)
+        days = len({entry['day'] for entry in group})
+        body = f"{body} (avg of {days} day{'s' if days != 1 else ''}"
+        others = len(group) - len(matching)
+        body += f", {others} differing entr{'ies' if others != 1 else 'y'} omitted)" if others else ")"
+        aggregated.append({'day': start, 'body': body})
+    return aggregated
+
+
+def _run_length(entries, key, unit):
+    runs = []
+    for entry in sorted(entries, key=key):
+        if runs and runs[-1]['body'] == entry['body']:
+            runs[-1]['last'] = entry['day']
+            runs[-1]['count'] += 1
+        else:
+            runs.append({'day': entry['day'], 'last': entry['day'], 'count': 1, 'body': entry['body']})
+
+    collapsed = []
+    for run in runs:
+        if run['count'] == 1:
+            label = run['day'].isoformat() if unit == 'day' else f"{unit.capitalize()} of {run['day'].isoformat()}"
+        else:
+            label = f"{run['day'].isoformat()} to {run['last'].isoformat()} ({run['count']} {unit}s)"
+        collapsed.append({'day': run['day'], 'line': f"- {label}: {run['body']}"})
+    return collapsed
+
+
+def _fill(template, values):
+    parts = template.split('#')
+    filled = parts[0]
+    for value, part in zip(values, parts[1:]):
+        filled += (f"{value:.0f}" if value == int(value) else f"{value:.1f}") + part
+    return filled
+
+
+def _merge(compacted, kept):
+    # Undated lines sort first, as they had no place in the timeline to begin with
+    merged = sorted(compacted + kept, key=lambda entry: (entry['day'] is not None, entry['day'] or date.min))
+    return [entry['line'] for entry in merged]
+
+
+def _drop_oldest(lines, budget_tokens):
+    dropped = 0
+    while len(lines) > 1 and _tokens(_with_omitted(lines, dropped)) > budget_tokens:
+        lines = lines[1:]
+        dropped += 1
+    return _with_omitted(lines, dropped)
+
+
+def _with_omitted(lines, dropped):
+    return [f"- ({dropped} older entries omitted)"] + lines if dropped else lines
@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+from services.local_storage import LocalDatabase
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'ai_cache.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ai_result_cache (
+    key TEXT PRIMARY KEY,
+    animal_tag_id TEXT,
+    result TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_ai_result_cache_animal ON ai_result_cache (animal_tag_id);
+CREATE INDEX IF NOT EXISTS ix_ai_result_cache_last_access ON ai_result_cache (last_access);
+CREATE TABLE IF NOT EXISTS ai_inflight (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ai_cache_stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# How often a worker waiting on another worker's call checks for its result
+FLIGHT_POLL_SECONDS = 0.1
+
+class ResultCache:
+    """
+    Cache of parsed Gemini results, stored in SQLite so every gunicorn worker shares it.
+    """
+
+    def __init__(self, path=None, ttl_seconds=None, max_entries=None, lease_seconds=None):
+        """
+        Initialize the cache from arguments or AI_CACHE_* environment variables.
+
+        Args:
+            path (str, optional): SQLite file holding the cache
+            ttl_seconds (int, optional): How long an entry stays valid
+            max_entries (int, optional): Entries kept before least recently used ones are evicted
+            lease_seconds (int, optional): How long a claimed in-flight call blocks other workers
+        """
+        self.path = path or os.getenv("AI_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(os.getenv("AI_CACHE_TTL_SECONDS", "86400"))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("AI_CACHE_MAX_ENTRIES", "1000"))
+        self.lease_seconds = lease_seconds if lease_seconds is not None else int(os.getenv("AI_FLIGHT_LEASE_SECONDS", "120"))
+        self.enabled = os.getenv("AI_CACHE_ENABLED", "true").lower() != "false"
+        self._db = LocalDatabase(self.path, SCHEMA)
+
+    @staticmethod
+    def make_key(model_name, prompt_text):
+        """
+        Build the cache key for a prompt sent to a given model.
+
+        Args:
+            model_name (str): The Gemini model name
+            prompt_text (str): The fully rendered prompt
+
+        Returns:
+            str: Hex digest identifying the request
+        """
+        return hashlib.sha256(f"{model_name}\n{prompt_text}".encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Look up a cached result, counting the hit or miss.
+
+        Args:
+            key (str): Key from make_key
+
+        Returns:
+            dict: The cached result, or None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        conn = self._db.connection()
+        with conn:
+            row = conn.execute(
+                "SELECT result FROM ai_result_cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row:
+                conn.execute("UPDATE ai_result_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._count(conn, "hits" if row else "misses")
+
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, animal_tag_id, result):
+        """
+        Store a result, evicting expired and least recently used entries as needed.
+
+        Args:
+            key (str): Key from make_key
+            animal_tag_id (str): Animal the result belongs to, used for invalidation
+            result (dict): Parsed result to cache
+        """
+        if not self.enabled:
+            return
+
+        now = time.time()
+        conn = self._db.connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO ai_result_cache (key, animal_tag_id, result, created_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, animal_tag_id, json.dumps(result), now, now + self.ttl_seconds, now)
+            )
+            conn.execute("DELETE FROM ai_result_cache WHERE expires_at <= ?", (now,))
+            excess = conn.execute("SELECT COUNT(*) FROM ai_result_cache").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM ai_result_cache WHERE key IN "
+                    "(SELECT key FROM ai_result_cache ORDER BY last_access LIMIT ?)", (excess,)
+                )
+                self._count(conn, "evictions", excess)
+
+    def claim(self, key):
+        """
+        Claim the Gemini call for a key, so other workers wait for its result instead of repeating it.
+
+        A claim that is not released (the worker died) lapses after lease_seconds.
+
+        Args:
+            key (str): Key from make_key
+
+        Returns:
+            str: Owner token to pass to release, or None if another worker holds the claim
+        """
+        owner = uuid.uuid4().hex
+        if not self.enabled:
+            return owner
+
+        now = time.time()
+        conn = self._db.connection()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO ai_inflight (key, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE ai_inflight.expires_at <= ?",
+                (key, owner, now + self.lease_seconds, now)
+            )
+        return owner if cursor.rowcount else None
+
+    def release(self, key, owner):
+        """
+        Release a claim made with claim, once the result is cached or the call failed.
+
+        Args:
+            key (str): Key from make_key
+            owner (str): Token returned by claim
+        """
+        if not self.enabled:
+            return
+
+        conn = self._db.connection()
+        with conn:
+            conn.execute("DELETE FROM ai_inflight WHERE key = ? AND owner = ?", (key, owner))
+
+    def wait_for(self, key, timeout):
+        """
+        Wait for another worker's claimed call to cache its result.
+
+        Args:
+            key (str): Key from make_key
+            timeout (float): Seconds to wait at most
+
+        Returns:
+            dict: The result, or None if the claim ended without one (the call
+                failed) or the timeout passed
+        """
+        deadline = time.monotonic() + timeout
+        conn = self._db.connection()
+        while True:
+            now = time.time()
+            row = conn.execute(
+                "SELECT result FROM ai_result_cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row:
+                with conn:
+                    self._count(conn, "coalesced")
+                return json.loads(row[0])
+            claimed = conn.execute(
+                "SELECT 1 FROM ai_inflight WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if not claimed or time.monotonic() + FLIGHT_POLL_SECONDS > deadline:
+                return None
+            time.sleep(FLIGHT_POLL_SECONDS)
+
+    def invalidate_animals(self, animal_tag_ids):
+        """
+        Drop every cached result for the given animals.
+
+        Args:
+            animal_tag_ids (iterable): Tags of animals whose data changed
+        """
+        tags = list(animal_tag_ids)
+        if not self.enabled or not tags:
+            return
+
+        conn = self._db.connection()
+        with conn:
+            cursor = conn.execute(
+                f"DELETE FROM ai_result_cache WHERE animal_tag_id IN ({', '.join('?' * len(tags))})", tags
+            )
+            self._count(conn, "invalidations", cursor.rowcount)
+
+    def stats(self):
+        """
+        Report cache counters aggregated over all workers.
+
+        Returns:
+            dict: hits, misses, evictions, invalidations, coalesced, entries and hit_rate
+        """
+        conn = self._db.connection()
+        counters = dict(conn.execute("SELECT name, value FROM ai_cache_stats").fetchall())
+        stats = {name: counters.get(name, 0) for name in ("hits", "misses", "evictions", "invalidations", "coalesced")}
+        stats["entries"] = conn.execute("SELECT COUNT(*) FROM ai_result_cache").fetchone()[0]
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else None
+        stats["enabled"] = self.enabled
+        return stats
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+        conn = self._db.connection()
+        with conn:
+            conn.execute("DELETE FROM ai_result_cache")
+            conn.execute("DELETE FROM ai_inflight")
+            conn.execute("DELETE FROM ai_cache_stats")
+
+    def _count(self, conn, name, amount=1):
+        conn.execute(
+            "INSERT INTO ai_cache_stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+
+# Create a singleton instance
+result_cache = ResultCache()
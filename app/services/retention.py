@@ -0,0 +1,321 @@
+import os
+import copy
+import gzip
+import json
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, delete, func, select, update
+from models.database import least_greatest
+from models.models import db, Animal, FeedingLog, HealthRecord, HistoryArchive
+from services.export import EXPORT_FIELDS
+from services.history_events import record_history_written
+from services.local_storage import replace_atomically
+from services.pagination import encode_cursor, paginate
+
+# Retention for feeding and health history. Rows older than RETENTION_DAYS are
+# moved out of the hot tables into gzip-compressed NDJSON files, one or more per
+# kind and month, listed in the history_archive table. Rows are archived in
+# animal order, so each file holds a narrow range of animals, recorded in the
+# manifest; Animal.archived_through marks how far each animal's history reaches
+# into the archive. Their daily rollups stay in the database, so charts, prompts
+# and the anomaly screen keep the downsampled history; the list and export APIs
+# read archived rows back only when a query reaches that far.
+
+DEFAULT_ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'archive')
+
+ARCHIVE_DIR = os.getenv('RETENTION_ARCHIVE_DIR', DEFAULT_ARCHIVE_DIR)
+RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', '365'))
+# Rows archived and deleted per transaction
+BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', '1000'))
+
+ARCHIVE_KINDS = {
+    'feeding_logs': FeedingLog,
+    'health_records': HealthRecord,
+}
+
+
+def retention_cutoff(days=None, now=None):
+    """
+    Oldest timestamp kept in the hot tables.
+
+    Args:
+        days (int, optional): Days of history to keep, defaults to RETENTION_DAYS
+        now (datetime, optional): Current time, defaults to utcnow
+
+    Returns:
+        datetime: Rows older than this are due for archiving
+    """
+    return (now or datetime.utcnow()) - timedelta(days=RETENTION_DAYS if days is None else days)
+
+
+def archive_history(kind, before, batch_size=None):
+    """
+    Move one kind of history row older than a cutoff into the archive.
+
+    Each batch is written to one file per month first; the manifest rows and the
+    deletion from the hot table then commit together, so a failed run leaves at
+    most unlisted files behind and never loses or duplicates a row.
+
+    Args:
+        kind (str): 'feeding_logs' or 'health_records'
+        before (datetime): Archive rows with a timestamp before this
+        batch_size (int, optional): Rows per transaction, defaults to RETENTION_BATCH_SIZE
+
+    Returns:
+        dict: Numbers of rows archived and files written
+    """
+    model = ARCHIVE_KINDS[kind]
+    fields = EXPORT_FIELDS[model]
+    columns = [getattr(model, name) for name in fields]
+    batch_size = batch_size or BATCH_SIZE
+    summary = {'kind': kind, 'rows': 0, 'files': 0}
+    # Archived rows are deleted, so each batch resumes at the last batch's animal
+    # and walks the (animal_id, timestamp) index from there
+    last_animal_id = 0
+
+    while True:
+        rows = db.session.execute(
+            select(*columns).where(model.animal_id >= last_animal_id, model.timestamp < before).order_by(
+                model.animal_id, model.timestamp, model.id
+            ).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_animal_id = rows[-1].animal_id
+
+        months = {}
+        for row in rows:
+            months.setdefault(row.timestamp.strftime('%Y-%m'), []).append(row)
+
+        written = []
+        try:
+            for month, month_rows in months.items():
+                path = _write_archive_file(kind, month, fields, month_rows)
+                written.append(path)
+                db.session.add(HistoryArchive(
+                    kind=kind, month=month, path=path, rows=len(month_rows),
+                    min_timestamp=min(row.timestamp for row in month_rows),
+                    max_timestamp=max(row.timestamp for row in month_rows),
+                    min_animal_id=month_rows[0].animal_id,
+                    max_animal_id=month_rows[-1].animal_id
+                ))
+            db.session.execute(delete(model).where(model.id.in_([row.id for row in rows])),
+                               execution_options={'synchronize_session': False})
+            _extend_archived_through(rows)
+            record_history_written(db.session, {row.animal_id for row in rows})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            for path in written:
+                _remove(path)
+            raise
+
+        summary['rows'] += len(rows)
+        summary['files'] += len(written)
+        print(f"Archived {len(rows)} {kind} rows into {len(written)} files")
+
+    return summary
+
+
+def apply_retention(days=None, batch_size=None):
+    """
+    Archive every kind of history row older than the retention period.
+
+    Args:
+        days (int, optional): Days of history to keep, defaults to RETENTION_DAYS
+        batch_size (int, optional): Rows per transaction, defaults to RETENTION_BATCH_SIZE
+
+    Returns:
+        dict: The cutoff and a summary per kind
+    """
+    before = retention_cutoff(days)
+    return {
+        'before': before.isoformat(),
+        'kinds': [archive_history(kind, before, batch_size) for kind in ARCHIVE_KINDS]
+    }
+
+
+def backfill_archive_ranges(connection):
+    """
+    Record the animal range of each archive file and how far each animal's
+    history reaches into the archive, reading every listed file once.
+
+    Args:
+        connection: SQLAlchemy connection inside the upgrading transaction
+    """
+    manifest = HistoryArchive.__table__
+    latest = {}
+    for archive in connection.execute(select(manifest.c.id, manifest.c.path)).all():
+        try:
+            animal_ids = set()
+            for row in _read_archive_file(archive.path):
+                animal_ids.add(row['animal_id'])
+                latest[row['animal_id']] = max(latest.get(row['animal_id'], row['timestamp']), row['timestamp'])
+        except OSError as e:
+            print(f"Could not read archive file {archive.path}: {e}")
+            continue
+        if animal_ids:
+            connection.execute(update(manifest).where(manifest.c.id == archive.id).values(
+                min_animal_id=min(animal_ids), max_animal_id=max(animal_ids)
+            ))
+    if latest:
+        animals = Animal.__table__
+        connection.execute(
+            update(animals).where(animals.c.id == bindparam('animal_id')).values(archived_through=bindparam('through')),
+            [{'animal_id': animal_id, 'through': through} for animal_id, through in latest.items()]
+        )
+
+
+def paginate_history(kind, animal, page):
+    """
+    Fetch one page of an animal's feeding logs or health records, archived rows included.
+
+    Pages are ordered by (timestamp, id) as in paginate. The archive is only
+    consulted when the animal has archived rows and the page starts before the
+    last of them; then only the files holding the animal are opened.
+
+    Args:
+        kind (str): 'feeding_logs' or 'health_records'
+        animal (Animal): The animal
+        page (PageArgs): Parsed pagination arguments
+
+    Returns:
+        tuple: (list of row dicts, next cursor or None)
+
+    Raises:
+        ValueError: If the cursor is not valid
+    """
+    model = ARCHIVE_KINDS[kind]
+    query = model.query.filter_by(animal_id=animal.id)
+
+    start = page.since
+    if page.after:
+        if page.after[0] is None:
+            raise ValueError('Invalid cursor')
+        start = max(start, page.after[0]) if start else page.after[0]
+    archived_through = animal.archived_through
+    if archived_through is None or (start and start > archived_through):
+        files = []
+    else:
+        files = _archive_files(kind, animal_id=animal.id, since=start, until=page.until)
+    if not files:
+        rows, next_cursor = paginate(query, model, page, time_column=model.timestamp)
+        return [row.to_dict() for row in rows], next_cursor
+
+    # One row past the page from each source is enough to tell whether another page exists
+    wider = copy.copy(page)
+    wider.limit = page.limit + 1
+    hot, _ = paginate(query, model, wider, time_column=model.timestamp)
+    entries = [(row.timestamp, row.id, row.to_dict()) for row in hot]
+    entries += _archived_page(files, animal.id, page)
+    entries = sorted(entries, key=lambda entry: entry[:2])[:page.limit + 1]
+
+    if len(entries) <= page.limit:
+        return [entry[2] for entry in entries], None
+    entries = entries[:page.limit]
+    return [entry[2] for entry in entries], encode_cursor(entries[-1][0], entries[-1][1])
+
+
+def archived_export_rows(kind, fields, species=None, since=None, until=None):
+    """
+    Generate archived rows for an export, in the export's column order.
+
+    Args:
+        kind (str): 'feeding_logs' or 'health_records'
+        fields (list): Field names from build_export_query
+        species (str, optional): Only rows for animals of this species
+        since (datetime, optional): Inclusive lower bound on timestamp
+        until (datetime, optional): Exclusive upper bound on timestamp
+
+    Yields:
+        tuple: One row's values
+    """
+    files = _archive_files(kind, since=since, until=until)
+    if not files:
+        return
+
+    animals = {animal_id: (tag, animal_species) for animal_id, tag, animal_species in
+               db.session.execute(select(Animal.id, Animal.animal_tag_id, Animal.species))}
+    for archive in files:
+        for row in _read_archive_file(archive.path):
+            if (since and row['timestamp'] < since) or (until and row['timestamp'] >= until):
+                continue
+            row['animal_tag_id'], row['species'] = animals.get(row['animal_id'], (None, None))
+            if species and row['species'] != species:
+                continue
+            yield tuple(row[name] for name in fields)
+
+
+def _archive_files(kind, animal_id=None, since=None, until=None):
+    stmt = select(HistoryArchive).where(HistoryArchive.kind == kind)
+    if animal_id is not None:
+        stmt = stmt.where(HistoryArchive.min_animal_id <= animal_id, HistoryArchive.max_animal_id >= animal_id)
+    if since:
+        stmt = stmt.where(HistoryArchive.max_timestamp >= since)
+    if until:
+        stmt = stmt.where(HistoryArchive.min_timestamp < until)
+    return db.session.execute(stmt.order_by(HistoryArchive.min_timestamp)).scalars().all()
+
+
+def _extend_archived_through(rows):
+    # The latest archived timestamp per animal; rows archived later may be older
+    latest = {}
+    for row in rows:
+        latest[row.animal_id] = max(latest.get(row.animal_id, row.timestamp), row.timestamp)
+    _, greatest = least_greatest(db.session)
+    db.session.execute(
+        update(Animal.__table__).where(Animal.__table__.c.id == bindparam('animal_id')).values(
+            archived_through=greatest(func.coalesce(Animal.__table__.c.archived_through, bindparam('through')),
+                                      bindparam('through'))
+        ),
+        [{'animal_id': animal_id, 'through': through} for animal_id, through in latest.items()]
+    )
+
+
+def _archived_page(files, animal_id, page):
+    # Files come in order of their earliest row, so once a full page is in hand
+    # no later file can contribute a row that sorts before its end
+    entries = []
+    for archive in files:
+        if len(entries) > page.limit:
+            entries.sort(key=lambda entry: entry[:2])
+            del entries[page.limit + 1:]
+            if archive.min_timestamp > entries[-1][0]:
+                break
+        for row in _read_archive_file(archive.path):
+            timestamp = row['timestamp']
+            if row['animal_id'] != animal_id:
+                continue
+            if (page.since and timestamp < page.since) or (page.until and timestamp >= page.until):
+                continue
+            if page.after and (timestamp, row['id']) <= page.after:
+                continue
+            row['timestamp'] = timestamp.isoformat()
+            entries.append((timestamp, row['id'], row))
+    return entries
+
+
+def _read_archive_file(path):
+    with gzip.open(os.path.join(ARCHIVE_DIR, path), 'rt', encoding='utf-8') as f:
+        for line in f:
+            row = json.loads(line)
+            row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+            yield row
+
+
+def _write_archive_file(kind, month, fields, rows):
+    path = os.path.join(kind, month, f"{uuid.uuid4().hex}.ndjson.gz")
+    with replace_atomically(os.path.join(ARCHIVE_DIR, path)) as tmp_path:
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            for row in rows:
+                values = dict(zip(fields, row))
+                values['timestamp'] = values['timestamp'].isoformat()
+                f.write(json.dumps(values) + '\n')
+    return path
+
+
+def _remove(path):
+    try:
+        os.remove(os.path.join(ARCHIVE_DIR, path))
+    except OSError:
+        pass
@@ -0,0 +1,145 @@
+from collections import defaultdict
+from sqlalchemy import Date, cast, func, select
+from models.database import dialect_insert, least_greatest, row_value
+from models.models import FeedingLog, HealthRecord, DailyFeedingRollup, DailyHealthRollup
+
+# Daily rollups are updated with one upsert per (animal, day) touched by a write,
+# so concurrent workers adding to the same day never lose each other's counts.
+
+
+def apply_feeding_rollups(session, logs):
+    """
+    Add newly inserted feeding logs to the daily feeding rollups.
+
+    Args:
+        session: Session of the transaction that inserted the logs
+        logs (iterable): FeedingLog objects or dicts with the same fields
+    """
+    totals = defaultdict(lambda: [0.0, 0])
+    for log in logs:
+        key = (row_value(log, 'animal_id'), row_value(log, 'timestamp').date(), row_value(log, 'feed_type'))
+        totals[key][0] += row_value(log, 'quantity_kg')
+        totals[key][1] += 1
+    if not totals:
+        return
+
+    rows = [{'animal_id': animal_id, 'day': day, 'feed_type': feed_type, 'total_kg': total_kg, 'feedings': feedings}
+            for (animal_id, day, feed_type), (total_kg, feedings) in totals.items()]
+
+    table = DailyFeedingRollup.__table__
+    stmt = dialect_insert(session, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['animal_id', 'day', 'feed_type'],
+        set_={
+            'total_kg': table.c.total_kg + stmt.excluded.total_kg,
+            'feedings': table.c.feedings + stmt.excluded.feedings
+        }
+    )
+    session.execute(stmt, rows)
+
+
+def apply_health_rollups(session, records):
+    """
+    Add newly inserted health records to the daily health rollups.
+
+    Args:
+        session: Session of the transaction that inserted the records
+        records (iterable): HealthRecord objects or dicts with the same fields
+    """
+    days = {}
+    for record in records:
+        key = (row_value(record, 'animal_id'), row_value(record, 'timestamp').date())
+        day = days.setdefault(key, {
+            'animal_id': key[0], 'day': key[1], 'observations': 0,
+            'weight_count': 0, 'weight_sum': 0.0, 'weight_min': None, 'weight_max': None,
+            'temperature_count': 0, 'temperature_sum': 0.0, 'temperature_min': None, 'temperature_max': None
+        })
+        day['observations'] += 1
+        _add_measurement(day, 'weight', row_value(record, 'weight_kg'))
+        _add_measurement(day, 'temperature', row_value(record, 'temperature_celsius'))
+    if not days:
+        return
+
+    table = DailyHealthRollup.__table__
+    stmt = dialect_insert(session, table)
+    least, greatest = least_greatest(session)
+    set_ = {'observations': table.c.observations + stmt.excluded.observations}
+    for measure in ('weight', 'temperature'):
+        count, total = f'{measure}_count', f'{measure}_sum'
+        low, high = f'{measure}_min', f'{measure}_max'
+        set_[count] = table.c[count] + stmt.excluded[count]
+        set_[total] = table.c[total] + stmt.excluded[total]
+        set_[low] = least(func.coalesce(table.c[low], stmt.excluded[low]), func.coalesce(stmt.excluded[low], table.c[low]))
+        set_[high] = greatest(func.coalesce(table.c[high], stmt.excluded[high]), func.coalesce(stmt.excluded[high], table.c[high]))
+
+    session.execute(stmt.on_conflict_do_update(index_elements=['animal_id', 'day'], set_=set_), list(days.values()))
+
+
+def backfill_rollups(connection):
+    """
+    Rebuild both rollup tables from the raw history.
+
+    Args:
+        connection: Connection inside the migration transaction
+    """
+    day = _day_expression(connection)
+    connection.execute(DailyFeedingRollup.__table__.delete())
+    connection.execute(DailyHealthRollup.__table__.delete())
+
+    connection.execute(DailyFeedingRollup.__table__.insert().from_select(
+        ['animal_id', 'day', 'feed_type', 'total_kg', 'feedings'],
+        select(
+            FeedingLog.animal_id, day(FeedingLog.timestamp), FeedingLog.feed_type,
+            func.sum(FeedingLog.quantity_kg), func.count()
+        ).group_by(FeedingLog.animal_id, day(FeedingLog.timestamp), FeedingLog.feed_type)
+    ))
+
+    connection.execute(DailyHealthRollup.__table__.insert().from_select(
+        ['animal_id', 'day', 'observations',
+         'weight_count', 'weight_sum', 'weight_min', 'weight_max',
+         'temperature_count', 'temperature_sum', 'temperature_min', 'temperature_max'],
+        select(
+            HealthRecord.animal_id, day(HealthRecord.timestamp), func.count(),
+            func.count(HealthRecord.weight_kg), func.coalesce(func.sum(HealthRecord.weight_kg), 0),
+            func.min(HealthRecord.weight_kg), func.max(HealthRecord.weight_kg),
+            func.count(HealthRecord.temperature_celsius), func.coalesce(func.sum(HealthRecord.temperature_celsius), 0),
+            func.min(HealthRecord.temperature_celsius), func.max(HealthRecord.temperature_celsius)
+        ).group_by(HealthRecord.animal_id, day(HealthRecord.timestamp))
+    ))
+
+
+def get_daily_history(animal_id):
+    """
+    Load an animal's full history as daily rollups.
+
+    Args:
+        animal_id (int): The animal's database id
+
+    Returns:
+        tuple: (feeding rollups, health rollups), each ordered by day
+    """
+    feeding = DailyFeedingRollup.query.filter_by(animal_id=animal_id).order_by(
+        DailyFeedingRollup.day, DailyFeedingRollup.feed_type
+    ).all()
+    health = DailyHealthRollup.query.filter_by(animal_id=animal_id).order_by(DailyHealthRollup.day).all()
+    return feeding, health
+
+
+def _add_measurement(day, measure, value):
+    if value is None:
+        return
+    day[f'{measure}_count'] += 1
+    day[f'{measure}_sum'] += value
+    low, high = day[f'{measure}_min'], day[f'{measure}_max']
+    day[f'{measure}_min'] = value if low is None else min(low, value)
+    day[f'{measure}_max'] = value if high is None else max(high, value)
+
+
+def _dialect(bind):
+    return bind.dialect.name
+
+
+def _day_expression(connection):
+    if _dialect(connection) == 'postgresql':
+        return lambda column: cast(column, Date)
+    return func.date
@@ -0,0 +1,255 @@
+import re
+import json
+import base64
+from datetime import datetime
+from sqlalchemy import bindparam, text
+from models.models import db
+from services.ingest import parse_timestamp
+
+# Full-text search over animal notes, feeding log notes and health record
+# behavior observations and notes, backed by one SQLite FTS5 table. Triggers on
+# the source tables keep it in step with every insert, update and delete, bulk
+# writes included, so nothing in the application has to maintain it. Rows
+# moved to the history archive leave the index with them.
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+SNIPPET_TOKENS = 12
+
+# Each indexed row's FTS rowid is its id * 4 + the code of its kind, so the
+# triggers find a row's index entry by rowid
+SEARCH_KINDS = {
+    'animal': 1,
+    'feeding_log': 2,
+    'health_record': 3,
+}
+
+# Per kind: source table, columns whose updates re-index a row, and SQL for the
+# indexed text, animal id and timestamp; {row} is 'new.' inside triggers
+INDEXED_SOURCES = {
+    'animal': ('animal', 'notes', '{row}notes', '{row}id', 'NULL'),
+    'feeding_log': ('feeding_log', 'notes, animal_id, timestamp', '{row}notes', '{row}animal_id', '{row}timestamp'),
+    'health_record': ('health_record', 'behavior_observation, notes, animal_id, timestamp',
+                      "{row}behavior_observation || coalesce(' ' || {row}notes, '')",
+                      '{row}animal_id', '{row}timestamp'),
+}
+
+_available = {}
+
+
+def _index_rows(kind, row):
+    table, _, body, animal_id, timestamp = INDEXED_SOURCES[kind]
+    body, animal_id, timestamp = (sql.format(row=row) for sql in (body, animal_id, timestamp))
+    source = '' if row else f' FROM {table}'
+    return (f"INSERT INTO search_index (rowid, body, kind, animal_id, timestamp) "
+            f"SELECT {row}id * 4 + {SEARCH_KINDS[kind]}, {body}, '{kind}', {animal_id}, {timestamp}"
+            f"{source} WHERE {body} IS NOT NULL")
+
+
+def _schema():
+    statements = ["""
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+            body, kind UNINDEXED, animal_id UNINDEXED, timestamp UNINDEXED,
+            tokenize = 'porter unicode61'
+        )
+    """]
+    for kind, (table, columns, _, _, _) in INDEXED_SOURCES.items():
+        unindex = f"DELETE FROM search_index WHERE rowid = old.id * 4 + {SEARCH_KINDS[kind]}"
+        index = _index_rows(kind, 'new.')
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS search_{table}_insert AFTER INSERT ON {table} BEGIN {index}; END",
+            f"CREATE TRIGGER IF NOT EXISTS search_{table}_update AFTER UPDATE OF {columns} ON {table} "
+            f"BEGIN {unindex}; {index}; END",
+            f"CREATE TRIGGER IF NOT EXISTS search_{table}_delete AFTER DELETE ON {table} BEGIN {unindex}; END",
+        ]
+    return statements
+
+
+def _has_fts5(connection):
+    return connection.dialect.name == 'sqlite' and \
+        bool(connection.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar())
+
+
+def create_search_index(connection):
+    """
+    Create the search index and its triggers if they do not exist yet.
+
+    Does nothing on databases other than SQLite with FTS5.
+
+    Args:
+        connection: SQLAlchemy connection inside the upgrading transaction
+    """
+    if not _has_fts5(connection):
+        print("Full-text search needs SQLite with FTS5; the search API is disabled")
+        return
+    for statement in _schema():
+        connection.execute(text(statement))
+
+
+def rebuild_search_index(connection):
+    """
+    Index every existing row again from scratch.
+
+    Args:
+        connection: SQLAlchemy connection
+    """
+    if not _has_fts5(connection):
+        return
+    connection.execute(text("DELETE FROM search_index"))
+    for kind in INDEXED_SOURCES:
+        connection.execute(text(_index_rows(kind, '')))
+
+
+def search_available():
+    """
+    Check whether the app's database has the search index.
+
+    Returns:
+        bool: True for SQLite built with FTS5
+    """
+    key = str(db.engine.url)
+    if key not in _available:
+        with db.engine.connect() as connection:
+            _available[key] = _has_fts5(connection)
+    return _available[key]
+
+
+class SearchArgs:
+    """
+    Validated search arguments from a request's query string.
+    """
+
+    def __init__(self, args):
+        """
+        Parse ?q=, ?kind=, ?species=, ?since=, ?until=, ?limit= and ?after= query parameters.
+
+        Args:
+            args: The request's query arguments
+
+        Raises:
+            ValueError: If any argument is missing or malformed
+        """
+        self.match = match_expression(args.get('q', ''))
+
+        self.kind = args.get('kind') or None
+        if self.kind and self.kind not in SEARCH_KINDS:
+            raise ValueError(f"kind must be one of: {', '.join(SEARCH_KINDS)}")
+        self.species = args.get('species') or None
+        self.since = parse_timestamp(args['since']) if args.get('since') else None
+        self.until = parse_timestamp(args['until']) if args.get('until') else None
+
+        try:
+            self.limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+        except ValueError:
+            raise ValueError('limit must be an integer')
+        if self.limit < 1:
+            raise ValueError('limit must be positive')
+        self.limit = min(self.limit, MAX_PAGE_SIZE)
+
+        self.after = _decode_cursor(args['after']) if args.get('after') else None
+
+
+def match_expression(query):
+    """
+    Turn a search as typed into an FTS5 query.
+
+    Words are quoted, so punctuation and FTS5 syntax in the input are never
+    interpreted. Every word must match, unless words are separated by OR.
+
+    Args:
+        query (str): The search, e.g. 'limping OR cough'
+
+    Returns:
+        str: FTS5 MATCH expression
+
+    Raises:
+        ValueError: If the search has no words
+    """
+    terms = []
+    for word in re.findall(r'\w+', query):
+        if word != 'OR':
+            terms.append(f'"{word}"')
+        elif terms and terms[-1] != 'OR':
+            terms.append('OR')
+    if terms and terms[-1] == 'OR':
+        terms.pop()
+    if not terms:
+        raise ValueError('q must contain at least one word')
+    return ' '.join(terms)
+
+
+def search_history(search):
+    """
+    Find notes and observations matching a search, best matches first.
+
+    Matches are ranked by BM25; words are stemmed, so 'limp' also finds 'limping'.
+    Date filters apply to feeding logs and health records, so animal notes are
+    left out of searches with since or until.
+
+    Args:
+        search (SearchArgs): Parsed search arguments
+
+    Returns:
+        tuple: (list of result dicts, next cursor or None)
+    """
+    conditions = ["search_index MATCH :match"]
+    params = {'match': search.match, 'limit': search.limit + 1}
+    if search.kind:
+        conditions.append("search_index.kind = :kind")
+        params['kind'] = search.kind
+    if search.species:
+        conditions.append("animal.species = :species")
+        params['species'] = search.species
+    if search.since:
+        conditions.append("search_index.timestamp >= :since")
+        params['since'] = search.since
+    if search.until:
+        conditions.append("search_index.timestamp < :until")
+        params['until'] = search.until
+    if search.after:
+        # Rows strictly after the cursor in (score, rowid) order
+        conditions.append("(bm25(search_index) > :after_score OR "
+                          "(bm25(search_index) = :after_score AND search_index.rowid > :after_rowid))")
+        params['after_score'], params['after_rowid'] = search.after
+
+    stmt = text(f"""
+        SELECT search_index.rowid, search_index.kind, search_index.animal_id, search_index.timestamp,
+               snippet(search_index, 0, '[', ']', '...', {SNIPPET_TOKENS}) AS snippet,
+               bm25(search_index) AS score, animal.animal_tag_id, animal.species
+        FROM search_index JOIN animal ON animal.id = search_index.animal_id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY score, search_index.rowid
+        LIMIT :limit
+    """)
+    # Dates are compared in the format the DateTime columns are stored in
+    stmt = stmt.bindparams(*[bindparam(name, type_=db.DateTime) for name in ('since', 'until') if name in params])
+
+    rows = db.session.execute(stmt, params).all()
+    next_cursor = None
+    if len(rows) > search.limit:
+        rows = rows[:search.limit]
+        next_cursor = _encode_cursor(rows[-1].score, rows[-1].rowid)
+
+    return [{
+        'kind': row.kind,
+        'id': row.rowid // 4,
+        'animal_id': row.animal_id,
+        'animal_tag_id': row.animal_tag_id,
+        'species': row.species,
+        'timestamp': datetime.fromisoformat(row.timestamp).isoformat() if row.timestamp else None,
+        'snippet': row.snippet,
+        'score': row.score
+    } for row in rows], next_cursor
+
+
+def _encode_cursor(score, rowid):
+    return base64.urlsafe_b64encode(json.dumps([score, rowid]).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    try:
+        score, rowid = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return float(score), int(rowid)
+    except Exception:
+        raise ValueError('Invalid cursor')
@@ -0,0 +1,86 @@
+import threading
+
+# In-process request coalescing: the first thread to ask for a key makes the
+# call, and threads asking for the same key meanwhile wait for its result.
+# Coalescing across workers goes through claims in the result cache.
+
+
+class Flight:
+    """
+    One in-flight call and the result its followers are waiting for.
+    """
+
+    def __init__(self):
+        self._done = threading.Event()
+        self.result = None
+        self.followers = 0
+
+    def wait(self, timeout=None):
+        """
+        Wait for the leader's result.
+
+        Args:
+            timeout (float, optional): Seconds to wait at most
+
+        Returns:
+            The result, or None if the timeout passed first
+        """
+        self._done.wait(timeout)
+        return self.result
+
+    def resolve(self, result):
+        """
+        Publish the result and wake the followers.
+
+        Args:
+            result: The leader's result
+        """
+        self.result = result
+        self._done.set()
+
+
+class SingleFlight:
+    """
+    Table of in-flight calls keyed by request, shared by the threads of one worker.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def join(self, key):
+        """
+        Join the in-flight call for a key, starting one if there is none.
+
+        Args:
+            key (str): Request key
+
+        Returns:
+            tuple: (Flight, bool) - the flight, and True if the caller is its
+                leader and must call finish when done
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                return flight, False
+            flight = self._flights[key] = Flight()
+            return flight, True
+
+    def finish(self, key, flight, result):
+        """
+        Hand the leader's result to the followers and end the flight.
+
+        Args:
+            key (str): Request key
+            flight (Flight): The flight returned by join
+            result: The result for every follower
+        """
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.resolve(result)
+
+
+# Create a singleton instance
+single_flight = SingleFlight()
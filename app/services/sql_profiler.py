@@ -0,0 +1,170 @@
+import os
+import re
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Opt-in per-request SQL profiling. With SQL_PROFILING=true every request logs
+# its query count and database time, queries slower than SQL_SLOW_QUERY_MS are
+# logged with their route, and a statement shape repeated SQL_N_PLUS_ONE_THRESHOLD
+# times in one request is flagged as a likely N+1. Tests can capture the same
+# profiles with SQLProfiler.record() to assert a query budget per endpoint.
+
+SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "100"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "5"))
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:\?|%\(\w+\)s|:\w+)\s*,?)+\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement):
+    """
+    Reduce a SQL statement to its shape, so executions that differ only in values compare equal.
+
+    Args:
+        statement (str): SQL as sent to the driver
+
+    Returns:
+        str: The statement with literals and IN lists replaced by placeholders
+    """
+    shape = _STRING.sub("?", statement)
+    shape = _NUMBER.sub("?", shape)
+    shape = _IN_LIST.sub("IN (...)", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+
+class RequestProfile:
+    """
+    Queries executed while handling one request.
+    """
+
+    def __init__(self, method, route):
+        self.method = method
+        self.route = route
+        self.queries = []
+
+    @property
+    def count(self):
+        """Number of queries executed."""
+        return len(self.queries)
+
+    @property
+    def total_ms(self):
+        """Time spent in the database, in milliseconds."""
+        return sum(ms for _, ms in self.queries)
+
+    def repeated_shapes(self, threshold=N_PLUS_ONE_THRESHOLD):
+        """
+        Find statement shapes executed at least threshold times, the signature of an N+1.
+
+        Args:
+            threshold (int, optional): Executions of one shape that count as repeated
+
+        Returns:
+            list: (shape, count) pairs, most repeated first
+        """
+        counts = Counter(shape for shape, _ in self.queries)
+        return [(shape, count) for shape, count in counts.most_common() if count >= threshold]
+
+    def to_dict(self):
+        return {
+            'method': self.method,
+            'route': self.route,
+            'queries': self.count,
+            'total_ms': round(self.total_ms, 2),
+            'repeated': [{'shape': shape, 'count': count} for shape, count in self.repeated_shapes()]
+        }
+
+
+class SQLProfiler:
+    """
+    Collects a RequestProfile for each request while profiling is enabled or being recorded.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("SQL_PROFILING", "false").lower() == "true"
+        self._recorders = []
+        self._lock = threading.Lock()
+        # Each profiler keeps its own slot in flask.g, so a second instance (as in tests) does not double count
+        self._g_key = f"sql_profile_{id(self)}"
+
+    def init_app(self, app):
+        """
+        Hook the profiler into the app's requests and into SQLAlchemy's engine events.
+
+        Args:
+            app: The Flask application
+        """
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    @contextmanager
+    def record(self):
+        """
+        Capture the profile of every request finished inside the block, even with SQL_PROFILING off.
+
+        Yields:
+            list: RequestProfile objects, appended as requests finish
+        """
+        profiles = []
+        with self._lock:
+            self._recorders.append(profiles)
+        try:
+            yield profiles
+        finally:
+            with self._lock:
+                self._recorders.remove(profiles)
+
+    def _active(self):
+        return self.enabled or bool(self._recorders)
+
+    def _start_request(self):
+        if self._active():
+            route = request.url_rule.rule if request.url_rule else request.path
+            setattr(g, self._g_key, RequestProfile(request.method, route))
+
+    def _finish_request(self, response):
+        profile = g.pop(self._g_key, None)
+        if profile is None:
+            return response
+
+        with self._lock:
+            for profiles in self._recorders:
+                profiles.append(profile)
+
+        if self.enabled:
+            print(f"SQL profile {profile.method} {profile.route}: {profile.count} queries in {profile.total_ms:.1f} ms")
+            for shape, count in profile.repeated_shapes():
+                print(f"Possible N+1 on {profile.method} {profile.route}: {count} executions of {shape[:200]}")
+            response.headers['X-SQL-Queries'] = str(profile.count)
+            response.headers['X-SQL-Time-Ms'] = f"{profile.total_ms:.1f}"
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None and has_request_context() and self._g_key in g:
+            context._profile_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_profile_started', None)
+        if started is None or not has_request_context():
+            return
+        profile = g.get(self._g_key)
+        if profile is None:
+            return
+
+        ms = (time.perf_counter() - started) * 1000
+        profile.queries.append((statement_shape(statement), ms))
+        if self.enabled and ms >= SLOW_QUERY_MS:
+            print(f"Slow query on {profile.method} {profile.route} ({ms:.0f} ms): {_SPACE.sub(' ', statement)[:300]}")
+
+
+# Create a singleton instance
+sql_profiler = SQLProfiler()
@@ -303,4 +303,28 @@ document.addEventListener('DOMContentLoaded', function() {
             }, 600);
         });
     });
+    
+    // Stream AI responses into the page as they are generated
+    document.querySelectorAll('.ai-stream').forEach(function(container) {
+        const status = container.querySelector('.ai-stream-status');
+        const output = container.querySelector('.ai-stream-output');
+        const source = new EventSource(container.dataset.streamUrl);
+        
+        source.addEventListener('chunk', function(e) {
+            status.textContent = 'The AI is writing its response...';
+            output.style.display = 'block';
+            output.textContent += JSON.parse(e.data).text;
+        });
+        
+        source.addEventListener('result', function(e) {
+            source.close();
+            container.innerHTML = JSON.parse(e.data).html;
+        });
+        
+        source.onerror = function() {
+            // Reconnecting would start a new AI request, so stop here
+            source.close();
+            status.textContent = 'The connection was lost before the AI finished. Please reload the page to try again.';
+        };
+    });
 });
\ No newline at end of file
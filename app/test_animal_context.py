@@ -0,0 +1,117 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import event
+from conftest import make_app
+from models.models import db, Animal, FeedingLog, HealthRecord
+from services import animal_context
+from services.animal_context import AnimalContext, AnimalContextCache, load_recent_windows
+
+def history_app():
+    """Create a throwaway app with one animal, a recent history and an old weighing."""
+    app = make_app(Animal(animal_tag_id='COW-001', species='Cow', breed='Jersey', birth_date=date(2022, 3, 15)))
+    now = datetime.utcnow()
+    with app.app_context():
+        db.session.add(HealthRecord(animal_id=1, timestamp=now - timedelta(days=40), weight_kg=580.0,
+                                    behavior_observation='Normal'))
+        for days_ago in range(10):
+            db.session.add(FeedingLog(animal_id=1, timestamp=now - timedelta(days=days_ago), feed_type='Hay', quantity_kg=20.0))
+        db.session.commit()
+    return app
+
+def executed_statements(run):
+    """Run application code and return every statement it sent."""
+    statements = []
+    def record(connection, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        run()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return statements
+
+def test_context_is_built_with_two_queries_and_reused():
+    """Recent histories and derived fields take two queries; the next request reuses them."""
+    app = history_app()
+    contexts = AnimalContextCache()
+    with app.app_context():
+        animal = db.session.get(Animal, 1)
+        context = contexts.get(animal)
+
+        statements = executed_statements(lambda: (context.weight_kg, context.feeding_history))
+        assert len(statements) == 2
+        assert context.weight_kg == 580.0
+        assert len(context.feeding_plan_history) in (7, 8)
+        assert len(context.feeding_history) == 10
+        assert context.health_history == []
+
+        assert contexts.get(animal) is context
+        assert executed_statements(lambda: contexts.get(animal).feeding_history) == []
+
+def test_writes_produce_a_new_context():
+    """New history or an edited animal bumps data_version, so the memoized context is not reused."""
+    app = history_app()
+    contexts = AnimalContextCache()
+    with app.app_context():
+        animal = db.session.get(Animal, 1)
+        first = contexts.get(animal)
+        version = animal.data_version
+
+        db.session.add(HealthRecord(animal_id=1, weight_kg=590.0, behavior_observation='Normal'))
+        db.session.commit()
+        assert animal.data_version == version + 1
+        second = contexts.get(animal)
+        assert second is not first
+        assert second.weight_kg == 590.0
+
+        animal.breed = 'Holstein'
+        db.session.commit()
+        third = contexts.get(animal)
+        assert third is not second
+        assert third.breed == 'Holstein'
+
+def test_recent_observations_reach_past_the_window(monkeypatch):
+    """The latest observations are quoted even when none fall in the recent window."""
+    monkeypatch.setattr(animal_context, 'RECENT_OBSERVATIONS', 2)
+    app = history_app()
+    now = datetime.utcnow()
+    with app.app_context():
+        for days_ago, behavior in ((30, 'Limping'), (20, 'Recovering')):
+            db.session.add(HealthRecord(animal_id=1, timestamp=now - timedelta(days=days_ago), behavior_observation=behavior))
+        db.session.commit()
+
+        context = AnimalContext(db.session.get(Animal, 1), now.date())
+        assert context.health_history == []
+        assert [line.split('Behavior: ')[1].split(',')[0] for line in context.recent_observations] == \
+            ['Limping', 'Recovering']
+
+def test_herd_windows_match_single_animal_contexts():
+    """Windows loaded for many animals at once equal the ones each context loads itself."""
+    app = history_app()
+    now = datetime.utcnow()
+    with app.app_context():
+        pig = Animal(animal_tag_id='PIG-001', species='Pig', birth_date=date(2023, 1, 5))
+        db.session.add(pig)
+        db.session.flush()
+        db.session.add_all([
+            HealthRecord(animal_id=pig.id, timestamp=now - timedelta(days=2), weight_kg=110.0, behavior_observation='Normal'),
+            HealthRecord(animal_id=pig.id, timestamp=now - timedelta(days=1), behavior_observation='Lethargic'),
+            FeedingLog(animal_id=pig.id, timestamp=now - timedelta(days=3), feed_type='Grain Mix', quantity_kg=2.0),
+        ])
+        db.session.commit()
+        animals = Animal.query.order_by(Animal.id).all()
+        today = now.date()
+
+        herd = [AnimalContext(animal, today) for animal in animals]
+        statements = executed_statements(lambda: load_recent_windows(herd))
+        assert len(statements) == 3
+        for batched, animal in zip(herd, animals):
+            single = AnimalContext(animal, today)
+            assert (batched.weight_kg, batched.feeding_plan_history, batched.feeding_history, batched.health_history) == \
+                (single.weight_kg, single.feeding_plan_history, single.feeding_history, single.health_history)
+        assert [context.weight_kg for context in herd] == [580.0, "Unknown"]
+
+if __name__ == "__main__":
+    test_context_is_built_with_two_queries_and_reused()
+    test_writes_produce_a_new_context()
+    test_herd_windows_match_single_animal_contexts()
+    print("Animal context tests passed.")
@@ -0,0 +1,85 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import event
+from conftest import make_app
+from models.models import db, Animal, FeedingLog, HealthRecord, Alert
+from services.anomaly_prefilter import screen_herd, write_prefilter_alerts, ALERT_SOURCE
+
+def herd_app():
+    """Create a throwaway app with a month of history for a small herd."""
+    herd = {
+        'COW-001': 'Cow',      # healthy
+        'COW-002': 'Cow',      # stops eating
+        'PIG-001': 'Pig',      # losing weight
+        'CHICKEN-001': 'Chicken',  # fever
+    }
+    app = make_app(*[Animal(animal_tag_id=tag, species=species, birth_date=date(2022, 1, 1))
+                     for tag, species in herd.items()])
+
+    today = datetime.utcnow().replace(hour=6, minute=0, second=0, microsecond=0)
+    with app.app_context():
+        animals = {animal.animal_tag_id: animal for animal in Animal.query}
+
+        for days_ago in range(30, -1, -1):
+            timestamp = today - timedelta(days=days_ago)
+            wobble = (days_ago % 3) * 0.2
+            for tag, animal in animals.items():
+                quantity = {'Cow': 20.0, 'Pig': 5.0, 'Chicken': 0.2}[animal.species] + wobble
+                if tag == 'COW-002' and days_ago < 3:
+                    quantity = 8.0
+                db.session.add(FeedingLog(animal_id=animal.id, timestamp=timestamp, feed_type='Feed', quantity_kg=quantity))
+
+            if days_ago % 2 == 0:
+                for tag, animal in animals.items():
+                    weight = {'Cow': 600.0, 'Pig': 120.0, 'Chicken': 2.5}[animal.species]
+                    if tag == 'PIG-001':
+                        weight -= (30 - days_ago) * 1.5
+                    temperature = {'Cow': 38.6, 'Pig': 38.8, 'Chicken': 41.0}[animal.species]
+                    if tag == 'CHICKEN-001' and days_ago == 0:
+                        temperature = 42.3
+                    db.session.add(HealthRecord(animal_id=animal.id, timestamp=timestamp, weight_kg=weight,
+                                                temperature_celsius=temperature, behavior_observation='Normal'))
+        db.session.commit()
+    return app
+
+def test_only_unhealthy_animals_are_flagged():
+    """A flat history raises nothing; each injected problem is found for the right animal."""
+    app = herd_app()
+    with app.app_context():
+        animals = Animal.query.order_by(Animal.id).all()
+        findings = screen_herd(animals)
+        kinds = {db.session.get(Animal, animal_id).animal_tag_id: {f['kind'] for f in found}
+                 for animal_id, found in findings.items()}
+        assert kinds == {'COW-002': {'intake'}, 'PIG-001': {'weight'}, 'CHICKEN-001': {'temperature'}}
+
+def test_only_the_selected_animals_are_read():
+    """Screening part of the herd reads the rollups of those animals only."""
+    app = herd_app()
+    with app.app_context():
+        selected = Animal.query.filter(Animal.animal_tag_id.in_(['COW-001', 'PIG-001'])).order_by(Animal.id).all()
+        statements = []
+        listener = lambda *args: statements.append((args[2], args[3]))
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            findings = screen_herd(selected)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+        assert [db.session.get(Animal, animal_id).animal_tag_id for animal_id in findings] == ['PIG-001']
+        assert [statement.split('FROM ')[1].split()[0] for statement, _ in statements] == \
+            ['daily_feeding_rollup', 'daily_health_rollup']
+        assert all(tuple(parameters[:2]) == tuple(animal.id for animal in selected) for _, parameters in statements)
+
+def test_alerts_are_not_repeated_within_a_day():
+    """Screening twice in a row only raises each alert once."""
+    app = herd_app()
+    with app.app_context():
+        animals = Animal.query.all()
+        assert write_prefilter_alerts(animals, screen_herd(animals)) == 3
+        assert write_prefilter_alerts(animals, screen_herd(animals)) == 0
+        assert Alert.query.filter_by(source=ALERT_SOURCE).count() == 3
+
+if __name__ == "__main__":
+    test_only_unhealthy_animals_are_flagged()
+    test_only_the_selected_animals_are_read()
+    test_alerts_are_not_repeated_within_a_day()
+    print("Anomaly pre-filter tests passed.")
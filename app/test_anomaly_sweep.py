@@ -0,0 +1,180 @@
+import os
+import time
+import uuid
+import threading
+import tempfile
+from datetime import date, datetime, timedelta
+from conftest import make_app
+from app import app as farm_app, run_anomaly_detection
+from models.models import db, Animal, FeedingLog, HealthRecord, Alert
+from services.anomaly_sweep import sweep_herd
+from services.gemini_guard import GeminiGuard
+from services.gemini_service import GeminiService
+from services.result_cache import result_cache
+
+class StubGemini:
+    """Stands in for gemini_service: reports lethargy as an anomaly and fails for tags containing FAIL."""
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def detect_anomalies(self, **prompt_args):
+        with self._lock:
+            self.calls.append(prompt_args)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            if 'FAIL' in prompt_args['animal_tag_id']:
+                raise RuntimeError('model unavailable')
+            lethargic = any('Lethargic' in line for line in prompt_args['health_history'])
+            return {'anomalies_detected': [{
+                'description': 'Lethargy reported.', 'potential_cause': 'Infection', 'severity': 'High'
+            }] if lethargic else []}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+def stub_gemini(monkeypatch, delay=0):
+    stub = StubGemini(delay)
+    monkeypatch.setattr('services.anomaly_sweep.gemini_service', stub)
+    return stub
+
+def fake_gemini(monkeypatch):
+    """Answer every Gemini call from the offline fake, recording the prompt arguments."""
+    monkeypatch.delenv('GOOGLE_GENERATIVE_AI_API_KEY', raising=False)
+    monkeypatch.setenv('GEMINI_BACKEND', 'fake')
+    monkeypatch.setenv('GEMINI_FAKE_LATENCY_MS', '0')
+    guard = GeminiGuard(path=os.path.join(tempfile.mkdtemp(prefix='gemini-guard-'), 'guard.db'))
+    monkeypatch.setattr('services.gemini_service.gemini_guard', guard)
+    service = GeminiService()
+    calls = []
+    detect = service.detect_anomalies
+
+    def recording_detect(**prompt_args):
+        calls.append(prompt_args)
+        return detect(**prompt_args)
+    monkeypatch.setattr(service, 'detect_anomalies', recording_detect)
+    monkeypatch.setattr('app.gemini_service', service)
+    monkeypatch.setattr('services.anomaly_sweep.gemini_service', service)
+    return calls
+
+def add_herd(species):
+    """A healthy animal with a feeding just inside the window, and a lethargic one."""
+    suffix = uuid.uuid4().hex[:6]
+    healthy = Animal(animal_tag_id=f'{species.upper()}-{suffix}-1', species=species, birth_date=date(2022, 3, 15))
+    sick = Animal(animal_tag_id=f'{species.upper()}-{suffix}-2', species=species, birth_date=date(2021, 6, 1))
+    db.session.add_all([healthy, sick])
+    db.session.flush()
+    window_start = datetime.combine(datetime.utcnow().date(), datetime.min.time()) - timedelta(days=14)
+    db.session.add_all([
+        FeedingLog(animal_id=healthy.id, feed_type='Hay', quantity_kg=8.0, timestamp=window_start + timedelta(minutes=1)),
+        FeedingLog(animal_id=healthy.id, feed_type='Hay', quantity_kg=8.0, timestamp=window_start - timedelta(days=6)),
+        HealthRecord(animal_id=sick.id, behavior_observation='Lethargic', timestamp=datetime.utcnow()),
+    ])
+    db.session.commit()
+    return healthy.animal_tag_id, sick.animal_tag_id
+
+def herd_app(*tags):
+    """A throwaway app with the given animals; tags starting with PIG are pigs, the rest cows."""
+    return make_app(*[Animal(animal_tag_id=tag, species='Pig' if tag.startswith('PIG') else 'Cow',
+                             birth_date=date(2022, 3, 15)) for tag in tags])
+
+def test_sweep_reports_and_raises_alerts(monkeypatch):
+    """Every animal is checked with its recent history; anomalies become alerts and progress is reported."""
+    stub = stub_gemini(monkeypatch)
+    app = herd_app('COW-001', 'COW-002', 'PIG-001')
+    now = datetime.utcnow()
+    with app.app_context():
+        db.session.add_all([
+            FeedingLog(animal_id=1, feed_type='Hay', quantity_kg=8.0, timestamp=now - timedelta(days=1)),
+            FeedingLog(animal_id=1, feed_type='Hay', quantity_kg=8.0, timestamp=now - timedelta(days=20)),
+            HealthRecord(animal_id=2, behavior_observation='Lethargic', timestamp=now),
+        ])
+        db.session.commit()
+
+        updates = []
+        report = sweep_herd(concurrency=2, prefilter=False, progress=updates.append)
+        assert (report['animals'], report['completed'], report['failed'], report['alerts_created']) == (3, 3, 0, 1)
+        assert [update['done'] for update in updates] == [1, 2, 3]
+        assert updates[-1]['total'] == 3
+
+        prompts = {call['animal_tag_id']: call for call in stub.calls}
+        assert len(prompts['COW-001']['feeding_history']) == 1
+        assert prompts['PIG-001']['species'] == 'Pig'
+        alert = Alert.query.one()
+        assert (alert.animal_id, alert.severity, alert.source) == (2, 'High', 'AI Anomaly Detection')
+
+        assert sweep_herd(species='Pig', prefilter=False)['animals'] == 1
+
+def test_failures_are_counted_not_raised(monkeypatch):
+    """A failed Gemini call is recorded against its animal and the sweep carries on."""
+    stub_gemini(monkeypatch)
+    app = herd_app('COW-001', 'COW-FAIL')
+    with app.app_context():
+        report = sweep_herd(prefilter=False)
+        assert (report['completed'], report['failed']) == (1, 1)
+        failed = [entry for entry in report['results'] if entry['status'] == 'failed']
+        assert failed == [{'animal_tag_id': 'COW-FAIL', 'latency_seconds': failed[0]['latency_seconds'],
+                           'status': 'failed', 'error': 'model unavailable'}]
+
+def test_concurrency_is_bounded(monkeypatch):
+    """No more Gemini calls are in flight than the requested concurrency, which is clamped to its limits."""
+    stub = stub_gemini(monkeypatch, delay=0.05)
+    app = herd_app(*[f'COW-{n:03d}' for n in range(8)])
+    with app.app_context():
+        report = sweep_herd(concurrency=3, prefilter=False)
+        assert 1 < stub.peak <= 3
+        assert report['latency_seconds']['p50'] >= 0.05
+
+        assert sweep_herd(concurrency=0, prefilter=False)['concurrency'] == 1
+        assert sweep_herd(concurrency=1000, prefilter=False)['concurrency'] == 32
+
+def test_sweep_sends_the_same_prompts_as_the_per_animal_check(monkeypatch):
+    """Sweep prompts match the single-animal check, so its cached results are reused."""
+    calls = fake_gemini(monkeypatch)
+    app = make_app()
+    with app.app_context():
+        healthy, sick = add_herd('Cow')
+        report = sweep_herd(concurrency=2, prefilter=False)
+        assert (report['animals'], report['completed'], report['failed'], report['alerts_created']) == (2, 2, 0, 1)
+        alert = Alert.query.join(Animal).filter(Animal.animal_tag_id == sick).one()
+        assert alert.source == 'AI Anomaly Detection'
+
+        swept = {call['animal_tag_id']: call for call in calls}
+        assert len(swept[healthy]['feeding_history']) == 1
+
+        hits = result_cache.stats()['hits']
+        run_anomaly_detection(Animal.query.filter_by(animal_tag_id=healthy).one())
+        assert calls[-1] == dict(swept[healthy], stream=False)
+        assert result_cache.stats()['hits'] == hits + 1
+
+def test_sweep_api_runs_a_job(monkeypatch):
+    """POST /api/ai/sweep_anomalies queues a job whose result is the sweep report."""
+    fake_gemini(monkeypatch)
+    species = f'Yak{uuid.uuid4().hex[:6]}'
+    with farm_app.app_context():
+        _, sick = add_herd(species)
+
+    client = farm_app.test_client()
+    assert client.post('/api/ai/sweep_anomalies', json={'concurrency': 'many'}).status_code == 400
+
+    response = client.post('/api/ai/sweep_anomalies', json={'species': species, 'prefilter': False})
+    assert response.status_code == 202
+    location = response.headers['Location']
+    deadline = time.monotonic() + 10
+    while client.get(location).get_json()['status'] in ('queued', 'running'):
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    job = client.get(location).get_json()
+    assert job['status'] == 'succeeded'
+    assert (job['result']['animals'], job['result']['completed'], job['result']['alerts_created']) == (2, 2, 1)
+    assert job['progress']['done'] == 2
+    assert [entry['anomalies'] for entry in job['result']['results'] if entry['animal_tag_id'] == sick] == [1]
+
+if __name__ == "__main__":
+    print("Anomaly sweep tests need monkeypatch; run with pytest.")
@@ -0,0 +1,73 @@
+import os
+import sys
+import subprocess
+from sqlalchemy import func
+from conftest import make_app
+from models.models import db, Animal, FeedingLog, HealthRecord, DailyFeedingRollup, FeedTypeCatalog
+from generate_farm import generate_farm
+from benchmark import percentile, run_scenario, server_memory_mb, server_processes, _serve_in_process
+
+def dataset(app, **options):
+    with app.app_context():
+        summary = generate_farm(**options)
+        logs = db.session.query(FeedingLog.animal_id, FeedingLog.feed_type, FeedingLog.quantity_kg).order_by(FeedingLog.id).all()
+        return summary, logs
+
+def test_generator_is_sized_and_reproducible():
+    """The generator writes the requested volume, fills derived tables and repeats itself for a seed."""
+    options = dict(animals=20, days=10, feedings_per_day=2, health_interval_days=2, anomaly_rate=0.25, seed=7,
+                   batch_size=64)
+    app = make_app()
+    summary, logs = dataset(app, **options)
+    assert summary['animals'] == 20
+    assert summary['feeding_logs'] == 20 * 10 * 2
+    assert summary['health_records'] == 20 * 5
+    assert summary['anomalous']
+    with app.app_context():
+        assert Animal.query.count() == 20
+        assert HealthRecord.query.count() == 100
+        assert db.session.query(func.sum(DailyFeedingRollup.feedings)).scalar() == 400
+        assert FeedTypeCatalog.query.count() > 0
+
+    again, same_logs = dataset(make_app(), **options)
+    assert again['anomalous'] == summary['anomalous']
+    assert same_logs == logs
+
+def test_percentile_uses_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 0.50) == 50
+    assert percentile(values, 0.95) == 95
+    assert percentile(values, 0.99) == 99
+    assert percentile([3.0], 0.99) == 3.0
+    assert percentile([], 0.5) is None
+
+def test_scenario_against_in_process_server():
+    """A scenario run reports latencies, throughput and status counts."""
+    import random
+    server, base_url = _serve_in_process()
+    try:
+        result = run_scenario(base_url, '/api/alerts', [], requests=10, concurrency=2, rng=random.Random(1))
+    finally:
+        server.shutdown()
+    assert result['statuses'] == {'200': 10}
+    assert result['errors'] == 0
+    assert 0 < result['p50_ms'] <= result['p95_ms'] <= result['p99_ms'] <= result['max_ms']
+    assert result['throughput_rps'] > 0
+
+def test_server_memory_covers_its_workers():
+    """Memory is summed over the server process and its children, and not reported without a server."""
+    assert server_memory_mb(None, 'VmHWM') is None
+    worker = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(10)'])
+    try:
+        assert worker.pid in server_processes(os.getpid())
+        assert server_memory_mb(os.getpid(), 'VmRSS') > server_memory_mb(worker.pid, 'VmRSS') > 0
+    finally:
+        worker.kill()
+        worker.wait()
+
+if __name__ == "__main__":
+    test_generator_is_sized_and_reproducible()
+    test_percentile_uses_nearest_rank()
+    test_scenario_against_in_process_server()
+    test_server_memory_covers_its_workers()
+    print("Benchmark tests passed.")
@@ -0,0 +1,96 @@
+import io
+from datetime import date
+from sqlalchemy import event
+from conftest import make_app
+from models.models import db, Animal, FeedingLog, FeedTypeCatalog
+from services import feed_catalog
+from services.feed_catalog import backfill_feed_types, get_feed_types
+from services.ingest import ingest_feeding_logs
+
+def cow_and_pig_app():
+    """Create a throwaway app with a cow and a pig."""
+    feed_catalog.invalidate()
+    return make_app(
+        Animal(animal_tag_id='COW-001', species='Cow', birth_date=date(2022, 3, 15)),
+        Animal(animal_tag_id='PIG-001', species='Pig', birth_date=date(2023, 1, 5)),
+    )
+
+def test_catalog_is_per_species_and_maintained_on_insert():
+    """ORM and bulk inserts both extend the catalog, and each species only sees its own feeds."""
+    app = cow_and_pig_app()
+    body = b'{"animal_tag_id": "PIG-001", "feed_type": "Kitchen Scraps", "quantity_kg": 2}\n' \
+           b'{"animal_tag_id": "COW-001", "feed_type": "Hay", "quantity_kg": 8}\n'
+    with app.app_context():
+        db.session.add(FeedingLog(animal_id=1, feed_type='Silage', quantity_kg=10))
+        db.session.add(FeedingLog(animal_id=1, feed_type='Hay', quantity_kg=8))
+        db.session.commit()
+        ingest_feeding_logs(io.BytesIO(body), 'ndjson')
+
+        assert get_feed_types('Cow') == ['Hay', 'Silage']
+        assert get_feed_types('Pig') == ['Kitchen Scraps']
+        assert FeedTypeCatalog.query.count() == 3
+
+def executed_statements(run):
+    """Run application code and return every statement it sent."""
+    statements = []
+    def record(connection, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        run()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return statements
+
+def test_lookups_are_cached_while_the_catalog_is_unchanged():
+    """Repeated lookups only count the species' rows; a feed type added by any worker is seen at once."""
+    app = cow_and_pig_app()
+    with app.app_context():
+        db.session.add(FeedingLog(animal_id=1, feed_type='Hay', quantity_kg=8))
+        db.session.commit()
+        assert len(executed_statements(lambda: get_feed_types('Cow'))) == 2
+        assert len(executed_statements(lambda: get_feed_types('Cow'))) == 1
+
+        # Written by another worker, whose commit never reaches this process's cache
+        with db.engine.begin() as connection:
+            connection.execute(FeedTypeCatalog.__table__.insert(), [{'species': 'Cow', 'feed_type': 'Silage'}])
+        assert get_feed_types('Cow') == ['Hay', 'Silage']
+
+def test_cache_is_invalidated_on_commit_only():
+    """Species are dropped from the cache when the inserting transaction commits, not when it flushes."""
+    app = cow_and_pig_app()
+    with app.app_context():
+        get_feed_types('Pig')
+        db.session.add(FeedingLog(animal_id=2, feed_type='Corn Feed', quantity_kg=3))
+        db.session.flush()
+        assert 'Pig' in feed_catalog._cache
+        db.session.rollback()
+        assert 'Pig' in feed_catalog._cache and get_feed_types('Pig') == []
+
+        db.session.add(FeedingLog(animal_id=2, feed_type='Corn Feed', quantity_kg=3))
+        db.session.commit()
+        assert 'Pig' not in feed_catalog._cache
+        assert get_feed_types('Pig') == ['Corn Feed']
+
+def test_backfill_from_existing_logs():
+    """The migration backfill catalogs feed types of logs written before the catalog existed."""
+    app = cow_and_pig_app()
+    with app.app_context():
+        db.session.execute(FeedingLog.__table__.insert(), [
+            {'animal_id': 1, 'feed_type': 'Hay', 'quantity_kg': 8.0},
+            {'animal_id': 2, 'feed_type': 'Corn Feed', 'quantity_kg': 3.0},
+        ])
+        db.session.commit()
+        assert FeedTypeCatalog.query.count() == 0
+
+        with db.engine.begin() as connection:
+            backfill_feed_types(connection)
+            backfill_feed_types(connection)
+        assert {(row.species, row.feed_type) for row in FeedTypeCatalog.query} == {('Cow', 'Hay'), ('Pig', 'Corn Feed')}
+
+if __name__ == "__main__":
+    test_catalog_is_per_species_and_maintained_on_insert()
+    test_lookups_are_cached_while_the_catalog_is_unchanged()
+    test_cache_is_invalidated_on_commit_only()
+    test_backfill_from_existing_logs()
+    print("Feed catalog tests passed.")
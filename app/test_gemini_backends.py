@@ -0,0 +1,82 @@
+import os
+import json
+import tempfile
+from services.gemini_backends import FakeModel, ReplayModel, RecordingModel, FakeGeminiError, prompt_hash
+from services.gemini_guard import GeminiGuard
+from services.gemini_service import GeminiService
+
+HISTORY = ["- 2024-05-15: Hay, 8.5 kg, Notes: None", "- 2024-05-16: Grain Mix, 4.2 kg, Notes: None"]
+
+def offline_service(monkeypatch, backend='fake', **env):
+    """A service built from the environment, as a worker would, with no API key."""
+    monkeypatch.delenv('GOOGLE_GENERATIVE_AI_API_KEY', raising=False)
+    monkeypatch.setenv('GEMINI_BACKEND', backend)
+    monkeypatch.setenv('GEMINI_FAKE_LATENCY_MS', '0')
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    guard = GeminiGuard(path=os.path.join(tempfile.mkdtemp(prefix='gemini-guard-'), 'guard.db'))
+    monkeypatch.setattr('services.gemini_service.gemini_guard', guard)
+    return GeminiService()
+
+def test_fake_backend_answers_every_feature_without_a_key(monkeypatch):
+    """With GEMINI_BACKEND=fake each AI feature gets a well-formed answer offline."""
+    service = offline_service(monkeypatch)
+    assert service.is_configured
+    assert service.model_name == 'fake-gemini'
+
+    plan = service.generate_feeding_plan('COW-001', 'Cow', 'Jersey', '2 years', 500, HISTORY, ['Hay', 'Silage'])
+    assert plan['animal_tag_id'] == 'COW-001'
+    assert len(plan['daily_schedule']) == 7
+
+    anomalies = service.detect_anomalies('COW-001', 'Cow', 'Jersey', '2 years', HISTORY,
+                                         ["- 2024-05-16: Behavior: Lethargic"])
+    assert anomalies['anomalies_detected']
+
+    summary = service.generate_health_summary('COW-001', 'Cow', 'Jersey', '2 years', HISTORY, [], 'N/A', '2024-05-16')
+    assert summary['overall_status'] == 'Good'
+
+def test_fake_failures_reach_the_parsing_and_retry_paths(monkeypatch):
+    """Malformed output is either recovered by the lenient parser or reported; errors exhaust retries."""
+    service = offline_service(monkeypatch, GEMINI_FAKE_MALFORMED_RATE='1', GEMINI_FAKE_SEED='3')
+    results = [service._extract_json_from_response(service.generate_content("Reply in JSON", retries=0))
+               for _ in range(10)]
+    assert any('error' not in result for result in results)
+    assert any(result.get('error') == 'Failed to parse AI response' for result in results)
+
+    service = offline_service(monkeypatch, GEMINI_FAKE_ERROR_RATE='1')
+    assert service.generate_content("Reply in JSON", retries=0).startswith("Error generating AI response: 503")
+
+def test_fake_is_reproducible_for_a_seed():
+    """The same seed gives the same sequence of failures and malformed responses."""
+    def outcomes(seed):
+        model = FakeModel(latency_ms=0, error_rate=0.3, malformed_rate=0.3, seed=seed)
+        seen = []
+        for _ in range(20):
+            try:
+                seen.append(model.generate_content('{"animal_tag_id": "COW-001", "overall_status"').text)
+            except FakeGeminiError:
+                seen.append('error')
+        return seen
+    assert outcomes(5) == outcomes(5)
+    assert 'error' in outcomes(5)
+
+def test_recorded_responses_replay_by_prompt_hash():
+    """Recording a call, plain or streamed, lets a replay serve it offline; unknown prompts get an error."""
+    path = tempfile.mkdtemp(prefix='gemini-recordings-')
+    recorder = RecordingModel(FakeModel(latency_ms=0, seed=1), path=path)
+    prompt = 'Summarize. "animal_tag_id": "COW-001" "overall_status"'
+    text = recorder.generate_content(prompt).text
+    chunks = [chunk.text for chunk in recorder.generate_content(prompt + ' streamed', stream=True)]
+
+    with open(os.path.join(path, f"{prompt_hash(prompt)}.json")) as f:
+        assert json.load(f)['text'] == text
+
+    replay = ReplayModel(path=path)
+    assert replay.generate_content(prompt).text == text
+    assert [chunk.text for chunk in replay.generate_content(prompt + ' streamed', stream=True)] == chunks
+    assert replay.generate_content('never seen').text.startswith("Error generating AI response: no recorded response")
+
+if __name__ == "__main__":
+    test_fake_is_reproducible_for_a_seed()
+    test_recorded_responses_replay_by_prompt_hash()
+    print("Gemini backend tests passed; run with pytest for the service tests.")
@@ -0,0 +1,106 @@
+import os
+import time
+import tempfile
+import threading
+from services.gemini_guard import GeminiGuard, GuardTimeout
+from services.gemini_service import gemini_service
+
+def make_guard(**options):
+    path = os.path.join(tempfile.mkdtemp(prefix='gemini-guard-'), 'guard.db')
+    return GeminiGuard(path=path, **options)
+
+def test_token_bucket_is_shared_between_workers():
+    """Two guards on one file (two workers) draw from the same bucket and give up at the deadline."""
+    first = make_guard(rate_per_minute=6, burst=2)
+    second = GeminiGuard(path=first.path, rate_per_minute=6, burst=2)
+    deadline = time.monotonic() + 0.5
+
+    with first.call_slot(deadline):
+        pass
+    with second.call_slot(deadline):
+        pass
+    started = time.monotonic()
+    try:
+        with first.call_slot(deadline):
+            assert False, "the bucket should be empty"
+    except GuardTimeout:
+        pass
+    assert time.monotonic() - started < 0.5
+
+def test_concurrency_slots_are_released():
+    """Only max_concurrency calls are in flight; a finished call frees its slot."""
+    guard = make_guard(max_concurrency=1, burst=10)
+    held = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with guard.call_slot(time.monotonic() + 5):
+            held.set()
+            release.wait(5)
+
+    worker = threading.Thread(target=hold)
+    worker.start()
+    held.wait(5)
+    assert guard.status()['in_flight'] == 1
+    try:
+        with guard.call_slot(time.monotonic() + 0.2):
+            assert False, "the only slot is taken"
+    except GuardTimeout:
+        pass
+    release.set()
+    worker.join()
+    with guard.call_slot(time.monotonic() + 1):
+        assert guard.status()['in_flight'] == 1
+    assert guard.status()['in_flight'] == 0
+
+def test_breaker_opens_then_lets_one_trial_through():
+    """A spike of failures opens the breaker; after the cooldown one trial decides whether it closes."""
+    guard = make_guard(min_calls=4, error_rate=0.5, cooldown_seconds=0.5)
+    guard.record(True)
+    for _ in range(3):
+        assert guard.allow_call()
+        guard.record(False)
+    assert guard.status()['breaker'] == 'open'
+    assert not guard.allow_call()
+
+    time.sleep(0.6)
+    assert guard.allow_call()
+    assert not guard.allow_call()
+    guard.record(True)
+    assert guard.status()['breaker'] == 'closed'
+    assert guard.allow_call()
+
+class FailingModel:
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        self.calls += 1
+        raise RuntimeError("503 Service Unavailable")
+
+def test_retries_stop_at_the_deadline(monkeypatch):
+    """A failing model is retried only while the deadline allows, and the breaker then fails fast."""
+    guard = make_guard(min_calls=3, error_rate=0.5, cooldown_seconds=60)
+    monkeypatch.setattr('services.gemini_service.gemini_guard', guard)
+    model = FailingModel()
+    monkeypatch.setattr(gemini_service, 'model', model)
+    monkeypatch.setattr(gemini_service, 'model_name', 'fake-model')
+    monkeypatch.setattr(gemini_service, '_resolved', True)
+
+    started = time.monotonic()
+    result = gemini_service.generate_content("Say hello", retries=5, deadline_seconds=0.3)
+    assert time.monotonic() - started < 1
+    assert result.startswith("Error generating AI response: 503")
+
+    while guard.status()['breaker'] == 'closed':
+        gemini_service.generate_content("Say hello", retries=0)
+    calls = model.calls
+    result = gemini_service.generate_content("Say hello")
+    assert result.startswith("Error generating AI response:")
+    assert model.calls == calls
+
+if __name__ == "__main__":
+    test_token_bucket_is_shared_between_workers()
+    test_concurrency_slots_are_released()
+    test_breaker_opens_then_lets_one_trial_through()
+    print("Gemini guard tests passed; run with pytest for the service test.")
@@ -0,0 +1,98 @@
+import uuid
+from datetime import date, datetime
+from app import app
+from models.models import db, Animal, Alert
+from services.sql_profiler import sql_profiler
+
+def add_animal():
+    tag = f"COW-{uuid.uuid4().hex[:6]}"
+    with app.app_context():
+        animal = Animal(animal_tag_id=tag, species='Cow', birth_date=date(2022, 3, 15))
+        db.session.add(animal)
+        db.session.flush()
+        alert = Alert(animal_id=animal.id, message='Check feed intake', severity='Medium', source='AI')
+        db.session.add(alert)
+        db.session.commit()
+        return tag, alert.id
+
+def test_matching_etag_gets_304_without_reading_history():
+    """A current client is answered from the animal row alone; a new feeding log changes the tag."""
+    tag, _ = add_animal()
+    client = app.test_client()
+    url = f'/api/animals/{tag}/feeding_logs?limit=10'
+    first = client.get(url)
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'no-cache'
+    assert first.last_modified is not None
+    etag = first.headers['ETag']
+
+    with sql_profiler.record() as profiles:
+        cached = client.get(url, headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.headers['ETag'] == etag
+    assert cached.get_data() == b''
+    assert profiles[0].count == 1
+    assert not any('feeding_log' in shape for shape, _ in profiles[0].queries)
+
+    # Another page of the same animal has its own tag
+    assert client.get(url + '&since=2024-01-01T00:00:00', headers={'If-None-Match': etag}).status_code == 200
+
+    client.post(f'/api/animals/{tag}/feeding_logs', json={'feed_type': 'Hay', 'quantity_kg': 12.5})
+    fresh = client.get(url, headers={'If-None-Match': etag})
+    assert fresh.status_code == 200
+    assert fresh.headers['ETag'] != etag
+    assert len(fresh.get_json()['items']) == 1
+
+def test_any_write_to_the_animal_changes_its_version():
+    """Notes edits and alert acknowledgements change the ETag but leave the AI data version alone."""
+    tag, alert_id = add_animal()
+    client = app.test_client()
+    etags = [client.get(f'/api/animals/{tag}').headers['ETag']]
+    with app.app_context():
+        data_version = Animal.query.filter_by(animal_tag_id=tag).one().data_version
+
+    client.put(f'/api/animals/{tag}', json={'notes': 'Prefers the east paddock'})
+    etags.append(client.get(f'/api/animals/{tag}').headers['ETag'])
+    client.post(f'/api/alerts/{alert_id}/acknowledge')
+    etags.append(client.get(f'/api/animals/{tag}').headers['ETag'])
+
+    assert len(set(etags)) == 3
+    with app.app_context():
+        assert Animal.query.filter_by(animal_tag_id=tag).one().data_version == data_version
+
+def test_if_modified_since():
+    """Without If-None-Match, a date at or after Last-Modified gets a 304."""
+    tag, _ = add_animal()
+    client = app.test_client()
+    last_modified = client.get(f'/api/animals/{tag}').headers['Last-Modified']
+    assert client.get(f'/api/animals/{tag}', headers={'If-Modified-Since': last_modified}).status_code == 304
+    assert client.get(f'/api/animals/{tag}',
+                      headers={'If-Modified-Since': 'Mon, 01 Jan 2001 00:00:00 GMT'}).status_code == 200
+
+def test_health_summary_is_not_regenerated_for_a_current_client(monkeypatch):
+    """A matching weak ETag skips the AI call; failed summaries carry no validators."""
+    tag, _ = add_animal()
+    calls = []
+
+    def summary(animal):
+        calls.append(animal.animal_tag_id)
+        return {'animal_tag_id': animal.animal_tag_id, 'overall_status': 'Good'}
+    monkeypatch.setattr('app.run_health_summary', summary)
+
+    client = app.test_client()
+    first = client.get(f'/api/ai/health_summary/{tag}')
+    assert first.headers['ETag'].startswith('W/')
+    assert client.get(f'/api/ai/health_summary/{tag}',
+                      headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    assert calls == [tag]
+
+    monkeypatch.setattr('app.run_health_summary', lambda animal: {'error': 'AI unavailable'})
+    failed = client.get(f'/api/ai/health_summary/{tag}', headers={'If-None-Match': '"stale"'})
+    assert failed.status_code == 500
+    assert 'ETag' not in failed.headers
+
+if __name__ == "__main__":
+    test_matching_etag_gets_304_without_reading_history()
+    test_any_write_to_the_animal_changes_its_version()
+    test_if_modified_since()
+    print("HTTP caching tests passed; run with pytest for the health summary test.")
@@ -0,0 +1,148 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+from sqlalchemy import event, inspect
+from conftest import make_app
+from models.models import db, Animal, Alert, SchemaVersion, severity_rank
+from models.migrations import upgrade_database, MIGRATIONS
+from services.animal_context import AnimalContext
+from services.anomaly_prefilter import screen_herd
+from services.dashboard import get_dashboard_data
+from services.pagination import PageArgs, encode_cursor
+from services.retention import ARCHIVE_KINDS, paginate_history
+
+def executed_queries(run):
+    """Run application code and return the SELECT statements it sent, with their parameters."""
+    statements = []
+    def record(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        run()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return statements
+
+def explain(statement, parameters):
+    """Return the SQLite query plan details for a statement as the driver received it."""
+    with db.engine.connect() as connection:
+        rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+    return [row[-1] for row in rows]
+
+def assert_plan_uses_indexes(name, plan):
+    assert not any(step.startswith('SCAN') and 'INDEX' not in step for step in plan), f"{name}: {plan}"
+    assert not any('TEMP B-TREE' in step for step in plan), f"{name} sorts in memory: {plan}"
+
+def run_hot_paths(animal):
+    """The per-animal, dashboard and sweep code behind the busiest endpoints, as the app calls it."""
+    context = AnimalContext(animal, datetime.utcnow().date())
+    context.feeding_history, context.health_history, context.recent_observations
+    context.daily_feeding_history, context.daily_health_history
+
+    cursor = encode_cursor(datetime(2024, 5, 1, 6, 0), 1)
+    for kind in ARCHIVE_KINDS:
+        for args in ({}, {'since': '2024-05-01T00:00:00'}, {'after': cursor},
+                     {'since': '2024-05-01T00:00:00', 'until': '2024-06-01T00:00:00', 'after': cursor}):
+            paginate_history(kind, animal, PageArgs(dict(args, limit='20')))
+    get_dashboard_data()
+    screen_herd([animal])
+
+def assert_no_table_scans():
+    animal = Animal.query.order_by(Animal.id).first()
+    statements = executed_queries(lambda: run_hot_paths(animal))
+    assert statements
+    for statement, parameters in statements:
+        assert_plan_uses_indexes(statement, explain(statement, parameters))
+
+def test_hot_queries_use_indexes():
+    """Hot queries on a freshly created database never fall back to a table scan."""
+    # Far enough into the archive that the list pages consult its manifest too
+    app = make_app(Animal(animal_tag_id='COW-001', species='Cow', birth_date=date(2022, 3, 15),
+                          archived_through=datetime(2030, 1, 1)))
+    with app.app_context():
+        assert_no_table_scans()
+
+def test_dashboard_reads_alerts_in_index_order():
+    """The dashboard lists the most severe alerts first in two queries, without sorting in memory."""
+    app = make_app(Animal(animal_tag_id='COW-001', species='Cow', birth_date=date(2022, 3, 15)))
+    now = datetime.utcnow()
+    with app.app_context():
+        for minutes, severity in enumerate(['Low', 'HIGH', 'medium', 'Unknown', 'High', 'Low']):
+            db.session.add(Alert(animal_id=1, timestamp=now - timedelta(minutes=minutes), message='Check',
+                                 severity=severity, source='AI'))
+        db.session.add(Alert(animal_id=1, message='Done', severity='High', source='AI', acknowledged=True))
+        db.session.commit()
+
+        data = {}
+        statements = executed_queries(lambda: data.update(get_dashboard_data(limit=10)))
+        assert [alert.severity for alert, _ in data['alerts']] == ['HIGH', 'High', 'medium', 'Low', 'Low', 'Unknown']
+        assert data['total_active'] == 6
+        assert len(statements) == 2
+        for statement, parameters in statements:
+            assert_plan_uses_indexes('dashboard', explain(statement, parameters))
+
+def test_upgrade_existing_database():
+    """The shipped pre-migration database is upgraded in place and gains the indexes."""
+    source = os.path.join(os.path.dirname(__file__), 'instance', 'farm_assistant.db')
+    workdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(workdir, 'farm_assistant.db')
+        shutil.copy(source, path)
+        app = make_app(database_uri='sqlite:///' + path)
+        with app.app_context():
+            index_names = {index['name'] for index in inspect(db.engine).get_indexes('feeding_log')}
+            assert 'ix_feeding_log_animal_timestamp' in index_names
+            versions = [row.version for row in SchemaVersion.query.all()]
+            assert versions == [version for version, _, _ in MIGRATIONS]
+            assert upgrade_database() == []
+            assert all(alert.severity_rank == severity_rank(alert.severity) for alert in Alert.query)
+            assert_no_table_scans()
+            db.engine.dispose()
+    finally:
+        shutil.rmtree(workdir)
+
+def test_concurrent_upgrades_run_migrations_once(monkeypatch):
+    """Workers starting together on an old database wait for one upgrade instead of racing it."""
+    started = threading.Event()
+    def slow_indexes(connection):
+        started.set()
+        time.sleep(0.3)
+        MIGRATIONS[0][2](connection)
+    monkeypatch.setattr('models.migrations.MIGRATIONS', [(1, MIGRATIONS[0][1], slow_indexes)] + MIGRATIONS[1:])
+
+    source = os.path.join(os.path.dirname(__file__), 'instance', 'farm_assistant.db')
+    workdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(workdir, 'farm_assistant.db')
+        shutil.copy(source, path)
+        errors = []
+        def start_worker():
+            try:
+                make_app(database_uri='sqlite:///' + path)
+            except Exception as e:
+                errors.append(e)
+        workers = [threading.Thread(target=start_worker) for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        assert started.is_set()
+        assert errors == []
+        app = make_app(database_uri='sqlite:///' + path)
+        with app.app_context():
+            versions = [row.version for row in SchemaVersion.query.all()]
+            assert versions == [version for version, _, _ in MIGRATIONS]
+            db.engine.dispose()
+    finally:
+        shutil.rmtree(workdir)
+
+if __name__ == "__main__":
+    test_hot_queries_use_indexes()
+    test_dashboard_reads_alerts_in_index_order()
+    test_upgrade_existing_database()
+    print("Index tests passed.")
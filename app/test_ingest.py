@@ -0,0 +1,70 @@
+import io
+from datetime import date
+from conftest import make_app
+from app import app as farm_app
+from models.models import Animal, FeedingLog, HealthRecord
+from services.ingest import ingest_feeding_logs, ingest_health_records
+
+def cow_and_pig():
+    return [
+        Animal(animal_tag_id='COW-001', species='Cow', birth_date=date(2022, 3, 15)),
+        Animal(animal_tag_id='PIG-001', species='Pig', birth_date=date(2023, 1, 5)),
+    ]
+
+def test_ndjson_feeding_logs():
+    """Mixed-animal NDJSON is inserted and bad rows are reported without aborting the batch."""
+    app = make_app(*cow_and_pig())
+    body = b'\n'.join([
+        b'{"animal_tag_id": "COW-001", "feed_type": "Hay", "quantity_kg": 8.5, "timestamp": "2024-05-01T06:00:00Z"}',
+        b'{"animal_tag_id": "PIG-001", "feed_type": "Corn Feed", "quantity_kg": "4.2"}',
+        b'{"animal_tag_id": "NOPE-001", "feed_type": "Hay", "quantity_kg": 1}',
+        b'{"animal_tag_id": "COW-001", "quantity_kg": 1}',
+        b'not json',
+    ])
+    with app.app_context():
+        report = ingest_feeding_logs(io.BytesIO(body), 'ndjson')
+        assert report['inserted'] == 2
+        assert report['failed'] == 3
+        assert sorted(e['line'] for e in report['errors']) == [3, 4, 5]
+        assert FeedingLog.query.count() == 2
+
+def test_csv_health_records():
+    """CSV health records accept blank optional measurements."""
+    app = make_app(*cow_and_pig())
+    body = (
+        b'animal_tag_id,timestamp,weight_kg,temperature_celsius,behavior_observation,notes\n'
+        b'COW-001,2024-05-01T06:00:00,612.5,38.6,Normal,\n'
+        b'PIG-001,,,39.1,Active,Checked by vet\n'
+        b'PIG-001,,abc,39.1,Active,\n'
+    )
+    with app.app_context():
+        report = ingest_health_records(io.BytesIO(body), 'csv')
+        assert report['inserted'] == 2
+        assert report['errors'][0]['line'] == 4
+        record = HealthRecord.query.filter_by(notes='Checked by vet').one()
+        assert record.weight_kg is None and record.temperature_celsius == 39.1
+
+def test_unreadable_body_is_a_client_error():
+    """Bytes that are not UTF-8 and malformed CSV get 400, keeping the rows read before them."""
+    app = make_app(*cow_and_pig())
+    body = b'{"animal_tag_id": "COW-001", "feed_type": "Hay", "quantity_kg": 8.5}\n\xff\xfe garbage\n'
+    with app.app_context():
+        report = ingest_feeding_logs(io.BytesIO(body), 'ndjson')
+        assert report['inserted'] == 1
+        assert report['error'] == 'Request body is not valid UTF-8'
+
+    client = farm_app.test_client()
+    response = client.post('/api/feeding_logs/bulk', data=b'\xff\xfe', content_type='application/x-ndjson')
+    assert response.status_code == 400
+    assert 'UTF-8' in response.get_json()['error']
+
+    oversized = b'animal_tag_id,feed_type,quantity_kg\nCOW-001,"' + b'x' * 200000 + b'",1\n'
+    response = client.post('/api/feeding_logs/bulk', data=oversized, content_type='text/csv')
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith('Malformed CSV')
+
+if __name__ == "__main__":
+    test_ndjson_feeding_logs()
+    test_csv_health_records()
+    test_unreadable_body_is_a_client_error()
+    print("Bulk ingest tests passed.")
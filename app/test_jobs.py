@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import tempfile
+import threading
+import pytest
+from datetime import date, datetime, timedelta
+from conftest import make_app
+from app import app as farm_app
+from models.models import db, Animal, AIJob
+from services import jobs
+from services.jobs import JobRunner, job_runner
+
+def job_app():
+    """A throwaway app on a database file, since job threads each use their own connection."""
+    return make_app(database_uri='sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='ai-jobs-'), 'jobs.db'))
+
+def make_runner(app, **handlers):
+    """A job runner of its own, bound to a throwaway app, with the given handlers."""
+    runner = JobRunner()
+    runner.init_app(app, max_workers=2)
+    for kind, handler in handlers.items():
+        runner.register(kind, handler)
+    return runner
+
+def finish(runner):
+    """Wait for every dispatched job to end."""
+    runner.executor.shutdown(wait=True)
+
+def test_job_reports_progress_then_its_result():
+    """A submitted job is queued, records progress while running and ends with its result."""
+    app = job_app()
+    seen = []
+
+    def handler(job):
+        runner.update_progress(job.id, {'done': 1, 'total': 2})
+        seen.append(json.loads(db.session.get(AIJob, job.id).progress))
+        return {'plan': 'More hay', 'params': json.loads(job.params)}
+    runner = make_runner(app, feeding_plan=handler)
+
+    with app.app_context():
+        job = runner.submit('feeding_plan', animal_tag_id='COW-001', params={'days': 7})
+        assert job.status == 'queued'
+        job_id = job.id
+    finish(runner)
+
+    with app.app_context():
+        job = db.session.get(AIJob, job_id)
+        assert seen == [{'done': 1, 'total': 2}]
+        assert job.status == 'succeeded'
+        assert job.to_dict()['result'] == {'plan': 'More hay', 'params': {'days': 7}}
+        assert job.attempts == 1
+        assert job.started_at <= job.heartbeat_at <= job.finished_at
+
+def test_failures_are_recorded():
+    """A handler that raises or returns an error marks its job failed."""
+    app = job_app()
+
+    def crash(job):
+        raise RuntimeError('model unavailable')
+    runner = make_runner(app, crash=crash, refuse=lambda job: {'error': 'Animal not found'})
+
+    with app.app_context():
+        crashed = runner.submit('crash').id
+        refused = runner.submit('refuse').id
+        with pytest.raises(ValueError):
+            runner.submit('weather')
+    finish(runner)
+
+    with app.app_context():
+        crashed, refused = db.session.get(AIJob, crashed), db.session.get(AIJob, refused)
+        assert crashed.status == 'failed' and crashed.error == 'model unavailable'
+        assert refused.status == 'failed' and refused.to_dict()['result'] == {'error': 'Animal not found'}
+        assert crashed.finished_at and refused.finished_at
+
+def test_restart_resumes_queued_and_abandoned_jobs_only():
+    """After a restart, queued jobs and jobs with a stale heartbeat run again; live ones are left alone."""
+    app = job_app()
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=jobs.JOB_LEASE_SECONDS + 60)
+    # Long-running but still heartbeating: started well before the lease, renewed just now
+    rows = {
+        'queued': dict(status='queued'),
+        'abandoned': dict(status='running', started_at=stale, heartbeat_at=stale, attempts=1),
+        'alive': dict(status='running', started_at=stale, heartbeat_at=now, attempts=1),
+        'done': dict(status='succeeded', started_at=stale, heartbeat_at=stale, finished_at=stale, attempts=1),
+    }
+    with app.app_context():
+        for job_id, fields in rows.items():
+            db.session.add(AIJob(id=job_id, kind='echo', **fields))
+        db.session.commit()
+
+    ran = []
+    runner = make_runner(app, echo=lambda job: ran.append(job.id) or {'ok': True})
+    with app.app_context():
+        assert runner.resume_pending() == 2
+        # Another worker dispatching the same jobs does not run them twice
+        runner.resume_pending()
+    finish(runner)
+
+    assert sorted(ran) == ['abandoned', 'queued']
+    with app.app_context():
+        statuses = {job.id: (job.status, job.attempts) for job in AIJob.query}
+        assert statuses == {'queued': ('succeeded', 1), 'abandoned': ('succeeded', 2),
+                            'alive': ('running', 1), 'done': ('succeeded', 1)}
+
+def test_heartbeat_is_renewed_while_the_handler_runs(monkeypatch):
+    """A handler that never reports progress still keeps its job leased."""
+    monkeypatch.setattr(jobs, 'JOB_HEARTBEAT_SECONDS', 0.05)
+    app = job_app()
+    release = threading.Event()
+    runner = make_runner(app, slow=lambda job: release.wait(5) and {'ok': True})
+
+    with app.app_context():
+        job_id = runner.submit('slow').id
+    time.sleep(0.3)
+    with app.app_context():
+        job = db.session.get(AIJob, job_id)
+        assert job.status == 'running'
+        assert job.heartbeat_at > job.started_at
+    release.set()
+    finish(runner)
+
+def test_jobs_api(monkeypatch):
+    """Jobs are submitted with a kind and an animal, then polled until they finish."""
+    tag = f"COW-JOB-{time.time_ns()}"
+    with farm_app.app_context():
+        db.session.add(Animal(animal_tag_id=tag, species='Cow', birth_date=date(2022, 3, 15)))
+        db.session.commit()
+    monkeypatch.setitem(job_runner.handlers, 'feeding_plan', lambda job: {'animal': job.animal_tag_id})
+
+    client = farm_app.test_client()
+    assert client.post('/api/ai/jobs', json={'kind': 'weather', 'animal_tag_id': tag}).status_code == 400
+    assert client.post('/api/ai/jobs', json={'kind': 'feeding_plan', 'animal_tag_id': 'NOPE'}).status_code == 404
+    assert client.get('/api/ai/jobs/missing').status_code == 404
+
+    response = client.post('/api/ai/jobs', json={'kind': 'feeding_plan', 'animal_tag_id': tag})
+    assert response.status_code == 202
+    location = response.headers['Location']
+    deadline = time.monotonic() + 10
+    while client.get(location).get_json()['status'] in ('queued', 'running'):
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    job = client.get(location).get_json()
+    assert job['status'] == 'succeeded'
+    assert job['result'] == {'animal': tag}
+
+if __name__ == "__main__":
+    test_job_reports_progress_then_its_result()
+    test_failures_are_recorded()
+    test_restart_resumes_queued_and_abandoned_jobs_only()
+    print("AI job tests passed; run with pytest for the heartbeat and API tests.")
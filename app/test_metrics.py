@@ -0,0 +1,54 @@
+import uuid
+from datetime import date
+from app import app
+from models.models import db, Animal
+from services.gemini_service import gemini_service
+
+def sample(body, name, **labels):
+    """Return the value of one sample from a Prometheus text body, or 0 if absent."""
+    for line in body.splitlines():
+        if not line.startswith(name + '{') and not line.startswith(name + ' '):
+            continue
+        if all(f'{key}="{value}"' in line for key, value in labels.items()):
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+def test_requests_are_counted_per_route():
+    """Requests are recorded under their URL rule with status, latency and query counts."""
+    tag = f"COW-{uuid.uuid4().hex[:8]}"
+    with app.app_context():
+        db.session.add(Animal(animal_tag_id=tag, species='Cow', birth_date=date(2022, 3, 15)))
+        db.session.commit()
+    client = app.test_client()
+    route = '/api/animals/<animal_tag_id>'
+
+    before = client.get('/metrics').get_data(as_text=True)
+    assert client.get(f'/api/animals/{tag}').status_code == 200
+    assert client.get('/api/animals/NO-SUCH-TAG').status_code == 404
+    after = client.get('/metrics').get_data(as_text=True)
+
+    for status in ('200', '404'):
+        assert sample(after, 'farm_http_requests_total', route=route, status=status) == \
+            sample(before, 'farm_http_requests_total', route=route, status=status) + 1
+    assert sample(after, 'farm_http_request_duration_seconds_count', route=route) == \
+        sample(before, 'farm_http_request_duration_seconds_count', route=route) + 2
+    assert sample(after, 'farm_db_queries_per_request_sum', route=route) >= \
+        sample(before, 'farm_db_queries_per_request_sum', route=route) + 2
+
+def test_parse_fallbacks_are_counted():
+    """A response that needs the lenient parser, or cannot be parsed, is counted by outcome."""
+    client = app.test_client()
+    before = client.get('/metrics').get_data(as_text=True)
+    assert gemini_service._extract_json_from_response("{'status': 'ok',}") == {'status': 'ok'}
+    assert 'error' in gemini_service._extract_json_from_response("not json at all")
+    after = client.get('/metrics').get_data(as_text=True)
+
+    assert sample(after, 'farm_gemini_parse_fallbacks_total', result='json5') == \
+        sample(before, 'farm_gemini_parse_fallbacks_total', result='json5') + 1
+    assert sample(after, 'farm_gemini_parse_fallbacks_total', result='failed') == \
+        sample(before, 'farm_gemini_parse_fallbacks_total', result='failed') + 1
+
+if __name__ == "__main__":
+    test_requests_are_counted_per_route()
+    test_parse_fallbacks_are_counted()
+    print("Metrics tests passed.")
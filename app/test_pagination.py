@@ -0,0 +1,74 @@
+from datetime import date, datetime, timedelta
+import pytest
+from conftest import make_app
+from app import app as farm_app
+from models.models import db, Animal, FeedingLog
+from services.pagination import PageArgs, paginate, decode_cursor
+
+def history_app():
+    """Create a throwaway app with one animal and a history containing timestamp ties."""
+    app = make_app(Animal(animal_tag_id='COW-001', species='Cow', birth_date=date(2022, 3, 15)))
+    with app.app_context():
+        animal = Animal.query.one()
+        start = datetime(2024, 5, 1, 6, 0)
+        for day in range(5):
+            # Two feedings per day share a timestamp, so ids must break ties
+            for feed_type in ('Hay', 'Grain Mix'):
+                db.session.add(FeedingLog(animal_id=animal.id, timestamp=start + timedelta(days=day),
+                                          feed_type=feed_type, quantity_kg=5.0))
+        db.session.commit()
+    return app
+
+def fetch_all(args):
+    query = FeedingLog.query.filter_by(animal_id=1)
+    seen = []
+    cursor = None
+    while True:
+        page_args = dict(args, limit='3')
+        if cursor:
+            page_args['after'] = cursor
+        logs, cursor = paginate(query, FeedingLog, PageArgs(page_args), time_column=FeedingLog.timestamp)
+        assert len(logs) <= 3
+        seen.extend(logs)
+        if not cursor:
+            return seen
+
+def test_pages_cover_history_once_in_order():
+    """Following next_cursor visits every row exactly once in (timestamp, id) order."""
+    app = history_app()
+    with app.app_context():
+        seen = fetch_all({})
+        assert [log.id for log in seen] == list(range(1, 11))
+        assert seen == sorted(seen, key=lambda log: (log.timestamp, log.id))
+
+def test_time_range_filters():
+    """since is inclusive and until is exclusive."""
+    app = history_app()
+    with app.app_context():
+        seen = fetch_all({'since': '2024-05-02T06:00:00', 'until': '2024-05-04T06:00:00'})
+        assert {log.timestamp.day for log in seen} == {2, 3}
+
+def test_invalid_arguments():
+    """Malformed limits and cursors, and time ranges on lists without a time column, are rejected."""
+    with pytest.raises(ValueError):
+        PageArgs({'limit': 'ten'})
+    with pytest.raises(ValueError):
+        PageArgs({'limit': '0'})
+    with pytest.raises(ValueError):
+        decode_cursor('not-a-cursor')
+    with history_app().app_context(), pytest.raises(ValueError):
+        paginate(Animal.query, Animal, PageArgs({'since': '2024-05-01T00:00:00'}))
+
+def test_lists_without_a_time_column_reject_time_ranges():
+    """Animals are paged by id, so since and until are refused rather than ignored."""
+    client = farm_app.test_client()
+    assert client.get('/api/animals?until=2024-05-01T00:00:00').status_code == 400
+    page = client.get('/api/animals?limit=1').get_json()
+    assert list(page) == ['items', 'next_cursor'] and len(page['items']) <= 1
+
+if __name__ == "__main__":
+    test_pages_cover_history_once_in_order()
+    test_time_range_filters()
+    test_invalid_arguments()
+    test_lists_without_a_time_column_reject_time_ranges()
+    print("Pagination tests passed.")
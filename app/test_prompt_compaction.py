@@ -0,0 +1,49 @@
+from datetime import date, timedelta
+from services.prompt_compaction import compact_history, estimate_tokens
+
+def history(days, anomalies=()):
+    """Two years of steady daily feeding lines ending 2024-06-30, with a few odd days."""
+    end = date(2024, 6, 30)
+    lines = []
+    for days_ago in range(days - 1, -1, -1):
+        day = end - timedelta(days=days_ago)
+        quantity = 3.0 if day in anomalies else 20.0 + (days_ago % 2) * 0.5
+        lines.append(f"- {day.isoformat()}: Hay {quantity:.1f} kg (2x)")
+    return lines
+
+def test_small_history_is_untouched():
+    """Histories already under budget are returned as they are."""
+    lines = history(10)
+    assert compact_history(lines, 10000) == lines
+
+def test_long_history_fits_budget_and_keeps_detail():
+    """Old days are aggregated, but recent and anomalous days stay verbatim."""
+    odd_day = date(2023, 3, 14)
+    lines = history(730, anomalies={odd_day})
+    budget = estimate_tokens("\n".join(lines)) // 10
+
+    compacted = compact_history(lines, budget, recent_days=14)
+    assert estimate_tokens("\n".join(compacted)) <= budget
+    assert lines[-14:] == compacted[-14:]
+    assert f"- {odd_day.isoformat()}: Hay 3.0 kg (2x)" in compacted
+    assert any(line.startswith("- Week of") or " weeks)" in line or "Month" in line or " months)" in line
+               for line in compacted)
+
+    # Chronological order is preserved
+    starts = [line[2:12] for line in compacted if line[2:6].isdigit()]
+    assert starts == sorted(starts)
+
+def test_identical_days_are_run_length_encoded():
+    """A run of identical days collapses into a single line with its date range."""
+    lines = [f"- 2024-01-{day:02d}: Hay 20.0 kg (2x)" for day in range(1, 31)] + ["- 2024-03-01: Hay 21.0 kg (2x)"]
+    compacted = compact_history(lines, estimate_tokens("\n".join(lines)) // 2, recent_days=0)
+    assert compacted == [
+        "- 2024-01-01 to 2024-01-30 (30 days): Hay 20.0 kg (2x)",
+        "- 2024-03-01: Hay 21.0 kg (2x)",
+    ]
+
+if __name__ == "__main__":
+    test_small_history_is_untouched()
+    test_long_history_fits_budget_and_keeps_detail()
+    test_identical_days_are_run_length_encoded()
+    print("Prompt compaction tests passed.")
@@ -0,0 +1,94 @@
+import uuid
+from datetime import date, datetime, timedelta
+from flask import Flask, jsonify
+from app import app
+from models.models import db, Animal, FeedingLog, HealthRecord, Alert
+from services.sql_profiler import SQLProfiler, sql_profiler, statement_shape
+
+# Most queries each endpoint may run, whatever the herd size. A template or
+# serializer that queries per row blows through these as soon as there are a
+# few animals.
+QUERY_BUDGETS = {
+    '/': 2,
+    '/animals': 1,
+    '/animals/{tag}': 3,
+    '/api/animals': 1,
+    '/api/animals/{tag}': 1,
+    '/api/animals/{tag}/feeding_logs': 2,
+    '/api/animals/{tag}/health_records': 2,
+    '/api/dashboard': 2,
+    '/api/alerts': 1,
+}
+
+HERD_SIZE = 6
+
+def add_herd():
+    """Add a few animals with history and an alert each; return one of their tags."""
+    prefix = uuid.uuid4().hex[:6]
+    now = datetime.utcnow()
+    with app.app_context():
+        for n in range(HERD_SIZE):
+            animal = Animal(animal_tag_id=f"COW-{prefix}-{n}", species='Cow', birth_date=date(2022, 3, 15))
+            db.session.add(animal)
+            db.session.flush()
+            for days_ago in range(5):
+                timestamp = now - timedelta(days=days_ago)
+                db.session.add(FeedingLog(animal_id=animal.id, timestamp=timestamp, feed_type='Hay', quantity_kg=20.0))
+                db.session.add(HealthRecord(animal_id=animal.id, timestamp=timestamp, weight_kg=500.0,
+                                            behavior_observation='Normal'))
+            db.session.add(Alert(animal_id=animal.id, message='Check feed intake', severity='Medium', source='AI'))
+        db.session.commit()
+    return f"COW-{prefix}-0"
+
+def test_endpoints_stay_within_query_budget():
+    """Every endpoint runs a fixed number of queries and repeats no statement per row."""
+    tag = add_herd()
+    client = app.test_client()
+    for route, budget in QUERY_BUDGETS.items():
+        with sql_profiler.record() as profiles:
+            response = client.get(route.format(tag=tag))
+        assert response.status_code == 200, route
+        profile = profiles[0]
+        assert profile.count <= budget, f"{route} ran {profile.count} queries, budget {budget}"
+        assert profile.repeated_shapes() == [], f"{route} repeats statements: {profile.repeated_shapes()}"
+
+def test_repeated_statements_are_flagged():
+    """A route that loads each row's parent separately is reported as an N+1."""
+    probe = Flask(__name__)
+    probe.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(probe)
+    profiler = SQLProfiler()
+    profiler.init_app(probe)
+
+    @probe.route('/logs')
+    def logs():
+        return jsonify([db.session.get(Animal, log.animal_id).animal_tag_id for log in FeedingLog.query.all()])
+
+    with probe.app_context():
+        db.create_all()
+        for n in range(HERD_SIZE):
+            db.session.add(Animal(animal_tag_id=f'COW-{n}', species='Cow', birth_date=date(2022, 3, 15)))
+        db.session.flush()
+        for n in range(HERD_SIZE):
+            db.session.add(FeedingLog(animal_id=n + 1, feed_type='Hay', quantity_kg=20.0))
+        db.session.commit()
+
+    with profiler.record() as profiles:
+        probe.test_client().get('/logs')
+    (shape, count), = profiles[0].repeated_shapes()
+    assert count == HERD_SIZE
+    assert shape.startswith('SELECT animal.id')
+    assert profiles[0].route == '/logs'
+
+def test_statement_shape_ignores_values():
+    """Statements that differ only in literals or IN-list length have the same shape."""
+    assert statement_shape("SELECT * FROM animal WHERE id IN (?, ?, ?)") == \
+        statement_shape("SELECT * FROM animal\n WHERE id IN (?)")
+    assert statement_shape("SELECT 1 FROM alert WHERE severity = 'High' LIMIT 20") == \
+        "SELECT ? FROM alert WHERE severity = ? LIMIT ?"
+
+if __name__ == "__main__":
+    test_endpoints_stay_within_query_budget()
+    test_repeated_statements_are_flagged()
+    test_statement_shape_ignores_values()
+    print("Query budget tests passed.")
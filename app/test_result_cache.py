@@ -0,0 +1,76 @@
+import os
+import time
+import tempfile
+from datetime import date
+from flask import Flask
+from models.models import db, Animal, FeedingLog
+from services import history_events
+from services.history_events import register_history_events
+from services.result_cache import ResultCache
+
+def make_cache(**kwargs):
+    """Create a cache backed by a fresh temporary file."""
+    return ResultCache(path=os.path.join(tempfile.mkdtemp(), 'ai_cache.db'), **kwargs)
+
+def test_hits_misses_and_ttl():
+    """Results are served until they expire and lookups are counted."""
+    cache = make_cache(ttl_seconds=60)
+    key = cache.make_key('gemini-1.5-flash', 'prompt')
+    assert cache.get(key) is None
+    cache.set(key, 'COW-001', {'overall_status': 'Good'})
+    assert cache.get(key) == {'overall_status': 'Good'}
+    assert cache.make_key('gemini-pro', 'prompt') != key
+
+    expired = make_cache(ttl_seconds=0)
+    expired.set(key, 'COW-001', {'overall_status': 'Good'})
+    assert expired.get(key) is None
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+def test_lru_eviction():
+    """The least recently used entry is evicted first."""
+    cache = make_cache(max_entries=2)
+    cache.set('a', 'COW-001', {'n': 1})
+    time.sleep(0.01)
+    cache.set('b', 'COW-001', {'n': 2})
+    time.sleep(0.01)
+    cache.get('a')
+    cache.set('c', 'COW-001', {'n': 3})
+    assert cache.get('b') is None
+    assert cache.get('a') == {'n': 1}
+    assert cache.stats()['evictions'] == 1
+
+def test_new_feeding_log_invalidates_animal(monkeypatch):
+    """Committing a feeding log drops that animal's cached results only."""
+    cache = make_cache()
+    monkeypatch.setattr(history_events, 'result_cache', cache)
+    register_history_events()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        cow = Animal(animal_tag_id='COW-001', species='Cow', birth_date=date(2022, 3, 15))
+        pig = Animal(animal_tag_id='PIG-001', species='Pig', birth_date=date(2023, 1, 5))
+        db.session.add_all([cow, pig])
+        db.session.commit()
+
+        cache.set('cow-summary', 'COW-001', {'overall_status': 'Good'})
+        cache.set('pig-summary', 'PIG-001', {'overall_status': 'Good'})
+
+        db.session.add(FeedingLog(animal_id=cow.id, feed_type='Hay', quantity_kg=8.5))
+        db.session.flush()
+        db.session.rollback()
+        assert cache.get('cow-summary') is not None
+
+        db.session.add(FeedingLog(animal_id=cow.id, feed_type='Hay', quantity_kg=8.5))
+        db.session.commit()
+        assert cache.get('cow-summary') is None
+        assert cache.get('pig-summary') is not None
+
+if __name__ == "__main__":
+    test_hits_misses_and_ttl()
+    test_lru_eviction()
+    print("Result cache tests passed (run with pytest for the invalidation test).")
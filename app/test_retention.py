@@ -0,0 +1,145 @@
+import os
+import json
+import uuid
+from datetime import date, datetime, timedelta
+import pytest
+from app import app
+from models.models import db, Animal, FeedingLog, HealthRecord, HistoryArchive, DailyFeedingRollup
+from services import retention
+from services.retention import archive_history
+from services.sql_profiler import sql_profiler
+
+# History older than CUTOFF is archived; nothing else in the test database is that old
+CUTOFF = datetime(2002, 1, 1)
+OLD_START = datetime(2001, 11, 28, 6, 0)
+
+def add_animal(species='Cow'):
+    """An animal with a week of old feedings spanning a month boundary, two recent ones and one health record."""
+    tag = f"{species.upper()}-{uuid.uuid4().hex[:6]}"
+    with app.app_context():
+        animal = Animal(animal_tag_id=tag, species=species, birth_date=date(2000, 3, 15))
+        db.session.add(animal)
+        db.session.flush()
+        for day in range(7):
+            db.session.add(FeedingLog(animal_id=animal.id, timestamp=OLD_START + timedelta(days=day),
+                                      feed_type='Hay', quantity_kg=10.0 + day))
+        for days_ago in (2, 1):
+            db.session.add(FeedingLog(animal_id=animal.id, timestamp=datetime.utcnow() - timedelta(days=days_ago),
+                                      feed_type='Hay', quantity_kg=20.0))
+        db.session.add(HealthRecord(animal_id=animal.id, timestamp=OLD_START, weight_kg=500.0,
+                                    behavior_observation='Normal'))
+        db.session.commit()
+        return tag, animal.id
+
+def fetch_all(client, tag, query=''):
+    items = []
+    cursor = None
+    while True:
+        url = f'/api/animals/{tag}/feeding_logs?limit=3{query}' + (f'&after={cursor}' if cursor else '')
+        page = client.get(url).get_json()
+        assert len(page['items']) <= 3
+        items.extend(page['items'])
+        cursor = page['next_cursor']
+        if not cursor:
+            return items
+
+def test_old_rows_move_to_monthly_archives_and_keep_their_rollups():
+    """Archived rows leave the hot table, land in one file per month and keep their daily rollups."""
+    tag, animal_id = add_animal()
+    with app.app_context():
+        version = db.session.get(Animal, animal_id).data_version
+        summary = archive_history('feeding_logs', CUTOFF, batch_size=4)
+        assert summary['rows'] >= 7
+
+        assert FeedingLog.query.filter_by(animal_id=animal_id).count() == 2
+        assert db.session.get(Animal, animal_id).data_version > version
+        rollup_days = {rollup.day for rollup in DailyFeedingRollup.query.filter_by(animal_id=animal_id)}
+        assert date(2001, 11, 28) in rollup_days and date(2001, 12, 4) in rollup_days
+
+        months = {archive.month for archive in HistoryArchive.query.filter_by(kind='feeding_logs')}
+        assert {'2001-11', '2001-12'} <= months
+        for archive in HistoryArchive.query.filter_by(kind='feeding_logs'):
+            assert os.path.exists(os.path.join(retention.ARCHIVE_DIR, archive.path))
+
+def test_list_api_pages_through_archived_and_recent_rows():
+    """Pages continue seamlessly from archived rows into the hot table, and ranges select either side."""
+    tag, animal_id = add_animal()
+    client = app.test_client()
+    before = fetch_all(client, tag)
+    with app.app_context():
+        archive_history('feeding_logs', CUTOFF)
+
+    after = fetch_all(client, tag)
+    assert after == before
+    assert len(after) == 9
+
+    old = fetch_all(client, tag, '&until=2001-12-01T00:00:00')
+    assert [item['quantity_kg'] for item in old] == [10.0, 11.0, 12.0]
+    recent = fetch_all(client, tag, f'&since={CUTOFF.isoformat()}')
+    assert [item['quantity_kg'] for item in recent] == [20.0, 20.0]
+
+def test_archive_is_only_read_for_the_animal_and_range_it_covers(monkeypatch):
+    """Listing opens only files holding the animal, and pages after its archived rows never touch the archive."""
+    tag, animal_id = add_animal()
+    other_tag, other_id = add_animal()
+    with app.app_context():
+        archive_history('feeding_logs', CUTOFF, batch_size=4)
+        assert db.session.get(Animal, animal_id).archived_through == OLD_START + timedelta(days=6)
+        ranges = {archive.path: (archive.min_animal_id, archive.max_animal_id) for archive in HistoryArchive.query}
+
+    opened = []
+    read = retention._read_archive_file
+    monkeypatch.setattr(retention, '_read_archive_file', lambda path: opened.append(path) or read(path))
+    client = app.test_client()
+    assert len(fetch_all(client, tag)) == 9
+    assert opened
+    assert all(ranges[path][0] <= animal_id <= ranges[path][1] for path in opened)
+
+    opened.clear()
+    with sql_profiler.record() as profiles:
+        recent = client.get(f'/api/animals/{other_tag}/feeding_logs?since={CUTOFF.isoformat()}').get_json()
+    assert len(recent['items']) == 2
+    assert opened == []
+    assert profiles[0].count == 2
+
+def test_export_includes_archived_rows():
+    """Exports read archived rows back, with the same columns and filters as live rows."""
+    tag, animal_id = add_animal(species='Goat')
+    with app.app_context():
+        archive_history('health_records', CUTOFF)
+
+    client = app.test_client()
+    response = client.get('/api/export/health_records?species=Goat&until=2002-01-01T00:00:00')
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    row, = [row for row in rows if row['animal_tag_id'] == tag]
+    assert row['timestamp'] == OLD_START.isoformat()
+    assert row['species'] == 'Goat' and row['weight_kg'] == 500.0
+
+    response = client.get('/api/export/health_records?species=Cow&until=2002-01-01T00:00:00')
+    assert tag not in response.get_data(as_text=True)
+
+def test_failed_batch_keeps_rows_and_removes_its_files(monkeypatch):
+    """If a batch cannot commit, its rows stay in the hot table and no archive file is left listed or on disk."""
+    tag, animal_id = add_animal()
+
+    def fail(session, animal_ids):
+        raise RuntimeError('database went away')
+    monkeypatch.setattr(retention, 'record_history_written', fail)
+
+    with app.app_context():
+        files_before = HistoryArchive.query.count()
+        with pytest.raises(RuntimeError):
+            archive_history('feeding_logs', CUTOFF)
+        assert FeedingLog.query.filter_by(animal_id=animal_id).count() == 9
+        assert HistoryArchive.query.count() == files_before
+        listed = {archive.path for archive in HistoryArchive.query}
+
+    on_disk = {os.path.relpath(os.path.join(root, name), retention.ARCHIVE_DIR)
+               for root, _, names in os.walk(retention.ARCHIVE_DIR) for name in names}
+    assert on_disk == listed
+
+if __name__ == "__main__":
+    test_old_rows_move_to_monthly_archives_and_keep_their_rollups()
+    test_list_api_pages_through_archived_and_recent_rows()
+    test_export_includes_archived_rows()
+    print("Retention tests passed.")
@@ -0,0 +1,70 @@
+import io
+from datetime import date, datetime
+from conftest import make_app
+from models.models import db, Animal, FeedingLog, HealthRecord, DailyFeedingRollup, DailyHealthRollup
+from services.ingest import ingest_health_records
+from services.rollups import backfill_rollups, get_daily_history
+
+def cow_app():
+    """Create a throwaway app with one animal."""
+    return make_app(Animal(animal_tag_id='COW-001', species='Cow', birth_date=date(2022, 3, 15)))
+
+def snapshot():
+    feeding, health = get_daily_history(1)
+    return [r.to_dict() for r in feeding], [r.to_dict() for r in health]
+
+def test_orm_inserts_update_rollups():
+    """Feeding logs added across several commits accumulate into one row per day and feed type."""
+    app = cow_app()
+    with app.app_context():
+        for hour, feed_type, quantity in [(6, 'Hay', 8.0), (18, 'Hay', 7.5), (12, 'Grain', 2.0)]:
+            db.session.add(FeedingLog(animal_id=1, timestamp=datetime(2024, 5, 1, hour), feed_type=feed_type, quantity_kg=quantity))
+            db.session.commit()
+        db.session.add(FeedingLog(animal_id=1, timestamp=datetime(2024, 5, 2, 6), feed_type='Hay', quantity_kg=9.0))
+        db.session.commit()
+
+        rollups = {(r.day, r.feed_type): (r.total_kg, r.feedings) for r in DailyFeedingRollup.query}
+        assert rollups == {
+            (date(2024, 5, 1), 'Hay'): (15.5, 2),
+            (date(2024, 5, 1), 'Grain'): (2.0, 1),
+            (date(2024, 5, 2), 'Hay'): (9.0, 1),
+        }
+
+def test_bulk_ingest_updates_health_rollups():
+    """Bulk-ingested health records update min/max/mean and skip blank measurements."""
+    app = cow_app()
+    body = (b'animal_tag_id,timestamp,weight_kg,temperature_celsius,behavior_observation\n'
+            b'COW-001,2024-05-01T06:00:00Z,600,38.5,Normal\n'
+            b'COW-001,2024-05-01T18:00:00Z,,39.1,Restless\n')
+    more = (b'animal_tag_id,timestamp,weight_kg,temperature_celsius,behavior_observation\n'
+            b'COW-001,2024-05-01T20:00:00Z,596,,Normal\n')
+    with app.app_context():
+        assert ingest_health_records(io.BytesIO(body), 'csv')['inserted'] == 2
+        assert ingest_health_records(io.BytesIO(more), 'csv')['inserted'] == 1
+
+        rollup = DailyHealthRollup.query.one()
+        assert rollup.observations == 3
+        assert (rollup.weight_count, rollup.weight_min, rollup.weight_max, rollup.weight_mean) == (2, 596, 600, 598)
+        assert (rollup.temperature_count, rollup.temperature_min, rollup.temperature_max) == (2, 38.5, 39.1)
+
+def test_backfill_matches_incremental_rollups():
+    """Rebuilding the rollups from raw history gives the same rows as maintaining them on insert."""
+    app = cow_app()
+    with app.app_context():
+        for day in (1, 1, 2, 3):
+            db.session.add(FeedingLog(animal_id=1, timestamp=datetime(2024, 5, day, 6), feed_type='Hay', quantity_kg=5.0 + day))
+            db.session.add(HealthRecord(animal_id=1, timestamp=datetime(2024, 5, day, 6), weight_kg=600.0 - day,
+                                        temperature_celsius=38.5, behavior_observation='Normal'))
+        db.session.commit()
+        incremental = snapshot()
+
+        with db.engine.begin() as connection:
+            backfill_rollups(connection)
+        db.session.expire_all()
+        assert snapshot() == incremental
+
+if __name__ == "__main__":
+    test_orm_inserts_update_rollups()
+    test_bulk_ingest_updates_health_rollups()
+    test_backfill_matches_incremental_rollups()
+    print("Rollup tests passed.")
@@ -0,0 +1,165 @@
+import io
+import json
+import uuid
+from datetime import date, datetime
+import pytest
+from flask import Flask
+from conftest import make_app
+from app import app
+from models.models import db, Animal, FeedingLog, HealthRecord
+from models.migrations import upgrade_database
+from services.ingest import ingest_health_records
+from services.search import SearchArgs, match_expression, search_history
+
+def marker():
+    """A word no other test writes, so searches only see this test's rows."""
+    return 'zq' + uuid.uuid4().hex[:8]
+
+def add_animal(species='Cow', notes=None):
+    with app.app_context():
+        animal = Animal(animal_tag_id=f"{species.upper()}-{uuid.uuid4().hex[:6]}", species=species,
+                        birth_date=date(2022, 3, 15), notes=notes)
+        db.session.add(animal)
+        db.session.commit()
+        return animal.id, animal.animal_tag_id
+
+def add_record(animal_id, observation, notes=None, timestamp=None):
+    with app.app_context():
+        record = HealthRecord(animal_id=animal_id, behavior_observation=observation, notes=notes,
+                              timestamp=timestamp or datetime(2024, 5, 15, 9, 0))
+        db.session.add(record)
+        db.session.commit()
+        return record.id
+
+def search(**args):
+    response = app.test_client().get('/api/search', query_string=args)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+def test_search_ranks_and_filters_notes_and_observations():
+    """Observations, notes and animal notes are found by stem, best match first, and filtered by species and date."""
+    word, other = marker(), marker()
+    cow_id, cow_tag = add_animal(notes=f'Bought lame, {word} since spring')
+    pig_id, _ = add_animal(species='Pig')
+    both = add_record(cow_id, f'Limping on left hind leg, {word}', notes=f'Dry cough at night, {other}')
+    limping = add_record(pig_id, f'Limps after feeding, {word}', timestamp=datetime(2024, 6, 1, 9, 0))
+    with app.app_context():
+        db.session.add(FeedingLog(animal_id=pig_id, feed_type='Hay', quantity_kg=2.0, notes=f'Coughing, {other}'))
+        db.session.commit()
+
+    results = search(q=f'{word} OR {other}')['items']
+    assert {result['kind'] for result in results} == {'animal', 'health_record', 'feeding_log'}
+    assert {result['id'] for result in search(q=f'{word} limp')['items']} == {both, limping}
+    assert '[Limping]' in search(q=f'{word} limp', species='Cow')['items'][0]['snippet']
+
+    assert [result['animal_tag_id'] for result in search(q=word, kind='animal')['items']] == [cow_tag]
+    assert {result['species'] for result in search(q=word, species='Pig')['items']} == {'Pig'}
+    dated = search(q=word, since='2024-05-20T00:00:00', until='2024-07-01T00:00:00')['items']
+    assert [result['id'] for result in dated] == [limping]
+    assert dated[0]['timestamp'] == '2024-06-01T09:00:00'
+
+def test_rows_matching_more_words_rank_first():
+    """Of two equally long observations, the one matching both searched words comes first."""
+    first, second = marker(), marker()
+    animal_id, _ = add_animal()
+    one = add_record(animal_id, f'Coughing {first} today')
+    both = add_record(animal_id, f'Limping {first} {second}')
+    assert [result['id'] for result in search(q=f'{first} OR {second}')['items']] == [both, one]
+
+def test_pages_follow_rank_order_without_repeats():
+    """Following next_cursor visits every match once, in the same order as one large page."""
+    word = marker()
+    animal_id, _ = add_animal()
+    for n in range(7):
+        add_record(animal_id, ' '.join([word] * (n + 1)) + ' coughing')
+
+    everything = [result['id'] for result in search(q=word, limit=100)['items']]
+    assert len(everything) == 7
+    seen = []
+    cursor = None
+    while True:
+        page = search(q=word, limit=3, **({'after': cursor} if cursor else {}))
+        seen.extend(result['id'] for result in page['items'])
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    assert seen == everything
+
+def test_triggers_keep_the_index_current():
+    """Edits, deletes and bulk ingests reach the index without application code."""
+    word, edited = marker(), marker()
+    animal_id, tag = add_animal()
+    record_id = add_record(animal_id, f'Normal {word}')
+
+    with app.app_context():
+        db.session.get(HealthRecord, record_id).behavior_observation = f'Lethargic {edited}'
+        db.session.commit()
+    assert search(q=word)['items'] == []
+    assert [result['id'] for result in search(q=edited)['items']] == [record_id]
+
+    with app.app_context():
+        db.session.delete(db.session.get(HealthRecord, record_id))
+        db.session.commit()
+    assert search(q=edited)['items'] == []
+
+    with app.app_context():
+        line = json.dumps({'animal_tag_id': tag, 'behavior_observation': f'Coughing {word}'})
+        assert ingest_health_records(io.BytesIO(line.encode()), 'ndjson')['inserted'] == 1
+    assert len(search(q=word)['items']) == 1
+
+def test_existing_rows_are_indexed_on_upgrade():
+    """Upgrading a database created before the index fills it from the existing rows."""
+    probe = Flask(__name__)
+    probe.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(probe)
+    with probe.app_context():
+        db.create_all()
+        db.session.add(Animal(animal_tag_id='COW-001', species='Cow', birth_date=date(2022, 3, 15)))
+        db.session.flush()
+        db.session.add(HealthRecord(animal_id=1, behavior_observation='Limping'))
+        db.session.commit()
+
+        upgrade_database()
+        results, _ = search_history(SearchArgs({'q': 'limp'}))
+        assert [result['animal_tag_id'] for result in results] == ['COW-001']
+
+def test_reseeding_starts_an_empty_index():
+    """After drop_all() and an upgrade, as seed_db.py does, new rows index cleanly and old ones are gone."""
+    reseeded = make_app(Animal(animal_tag_id='COW-001', species='Cow', birth_date=date(2022, 3, 15),
+                               notes='Limping since spring'))
+    with reseeded.app_context():
+        db.drop_all()
+        upgrade_database()
+        assert search_history(SearchArgs({'q': 'limp'}))[0] == []
+
+        db.session.add(Animal(animal_tag_id='PIG-001', species='Pig', birth_date=date(2023, 1, 5),
+                              notes='Coughing at night'))
+        db.session.commit()
+        assert [result['animal_tag_id'] for result in search_history(SearchArgs({'q': 'cough'}))[0]] == ['PIG-001']
+
+def test_search_input_is_never_fts_syntax():
+    """Quotes, operators and parentheses in a search are treated as plain words."""
+    assert match_expression('limp" OR (cough*') == '"limp" OR "cough"'
+    assert match_expression('OR limping OR') == '"limping"'
+    with pytest.raises(ValueError):
+        match_expression('"*"')
+
+def test_errors(monkeypatch):
+    """Bad arguments get 400; databases without FTS5 get 501."""
+    client = app.test_client()
+    assert client.get('/api/search').status_code == 400
+    assert client.get('/api/search?q=cough&kind=alert').status_code == 400
+    assert client.get('/api/search?q=cough&after=garbage').status_code == 400
+
+    monkeypatch.setattr('app.search_available', lambda: False)
+    assert client.get('/api/search?q=cough').status_code == 501
+
+if __name__ == "__main__":
+    test_search_ranks_and_filters_notes_and_observations()
+    test_rows_matching_more_words_rank_first()
+    test_pages_follow_rank_order_without_repeats()
+    test_triggers_keep_the_index_current()
+    test_existing_rows_are_indexed_on_upgrade()
+    test_reseeding_starts_an_empty_index()
+    test_search_input_is_never_fts_syntax()
+    print("Search tests passed; run with pytest for the error tests.")
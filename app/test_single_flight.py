@@ -0,0 +1,81 @@
+import os
+import json
+import time
+import uuid
+import tempfile
+import threading
+from services.gemini_service import gemini_service
+from services.result_cache import ResultCache
+
+class SlowModel:
+    """Answers after a delay, counting how often it is called."""
+    def __init__(self, response, delay=0.3):
+        self.response = response
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return type('Response', (), {'text': self.response})()
+
+def use_slow_model(monkeypatch, response):
+    model = SlowModel(response)
+    monkeypatch.setattr(gemini_service, 'model', model)
+    monkeypatch.setattr(gemini_service, 'model_name', 'fake-model')
+    monkeypatch.setattr(gemini_service, '_resolved', True)
+    return model
+
+def test_concurrent_identical_requests_share_one_call(monkeypatch):
+    """Threads asking for the same prompt at once all get the one Gemini result."""
+    model = use_slow_model(monkeypatch, json.dumps({"anomalies_detected": []}))
+    prompt = f"Check animal {uuid.uuid4().hex} and answer in JSON"
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(gemini_service._generate_json(prompt, 'COW-001')))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert model.calls == 1
+    assert results == [{"anomalies_detected": []}] * 5
+
+def make_caches():
+    path = os.path.join(tempfile.mkdtemp(prefix='single-flight-'), 'cache.db')
+    return ResultCache(path=path), ResultCache(path=path)
+
+def test_other_worker_waits_for_the_cached_result():
+    """A second worker cannot claim an in-flight key and picks up the first worker's result."""
+    first, second = make_caches()
+    owner = first.claim('key')
+    assert owner
+    assert second.claim('key') is None
+
+    def answer():
+        time.sleep(0.2)
+        first.set('key', 'COW-001', {"ok": True})
+        first.release('key', owner)
+
+    threading.Thread(target=answer).start()
+    assert second.wait_for('key', 5) == {"ok": True}
+    assert second.stats()['coalesced'] == 1
+
+def test_failed_call_releases_waiting_workers():
+    """When the claiming worker fails, waiters stop waiting and may claim the call themselves."""
+    first, second = make_caches()
+    owner = first.claim('key')
+    threading.Timer(0.2, first.release, args=('key', owner)).start()
+
+    started = time.monotonic()
+    assert second.wait_for('key', 5) is None
+    assert time.monotonic() - started < 2
+    assert second.claim('key')
+
+if __name__ == "__main__":
+    test_other_worker_waits_for_the_cached_result()
+    test_failed_call_releases_waiting_workers()
+    print("Single-flight tests passed; run with pytest for the service test.")
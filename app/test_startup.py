@@ -0,0 +1,84 @@
+import os
+import sys
+import json
+import subprocess
+import google.generativeai as genai
+from services import gemini_service as gemini_module
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Any attempt to open a network connection fails loudly during the import
+IMPORT_WITHOUT_NETWORK = """
+import json, socket, sys, time
+
+def no_network(*args, **kwargs):
+    raise RuntimeError("network access during import")
+
+socket.socket.connect = no_network
+socket.create_connection = no_network
+socket.getaddrinfo = no_network
+
+started = time.perf_counter()
+import {module}
+print(json.dumps({{"import_seconds": time.perf_counter() - started}}))
+"""
+
+# Importing must stay well below the time a single API round-trip can take
+MAX_IMPORT_SECONDS = 5.0
+
+def import_without_network(module):
+    """Import a module in a fresh interpreter with networking disabled and return its import time."""
+    env = dict(os.environ, GOOGLE_GENERATIVE_AI_API_KEY='test-key')
+    result = subprocess.run(
+        [sys.executable, '-c', IMPORT_WITHOUT_NETWORK.format(module=module)],
+        cwd=APP_DIR, env=env, capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    seconds = json.loads(result.stdout.strip().splitlines()[-1])['import_seconds']
+    print(f"import {module}: {seconds:.3f}s")
+    return seconds
+
+def test_gemini_service_imports_without_network():
+    """Importing the Gemini service with an API key set does not touch the network."""
+    assert import_without_network('services.gemini_service') < MAX_IMPORT_SECONDS
+
+def test_app_imports_without_network():
+    """The whole app, including its database upgrade, starts without touching the network."""
+    assert import_without_network('app') < MAX_IMPORT_SECONDS
+
+class FakeModelInfo:
+    def __init__(self, name):
+        self.name = name
+
+def test_model_name_is_discovered_once_and_cached(monkeypatch, tmp_path):
+    """The first service lists models; later ones read the cached choice from disk."""
+    calls = []
+    def list_models():
+        calls.append(1)
+        return [FakeModelInfo('models/gemini-pro'), FakeModelInfo('models/gemini-1.5-flash')]
+
+    monkeypatch.setenv('GOOGLE_GENERATIVE_AI_API_KEY', 'test-key')
+    monkeypatch.setattr(gemini_module, 'MODEL_CACHE_PATH', str(tmp_path / 'gemini_model.json'))
+    monkeypatch.setattr(genai, 'list_models', list_models)
+
+    first = gemini_module.GeminiService()
+    assert not calls
+    assert first.is_configured
+    assert first.model_name == 'gemini-1.5-flash'
+
+    second = gemini_module.GeminiService()
+    assert second.is_configured
+    assert second.model_name == 'gemini-1.5-flash'
+    assert len(calls) == 1
+
+    # Entries that have expired are discovered again
+    monkeypatch.setattr(gemini_module, 'MODEL_CACHE_TTL_SECONDS', -1)
+    os.remove(gemini_module.MODEL_CACHE_PATH)
+    gemini_module.GeminiService().is_configured
+    gemini_module.GeminiService().is_configured
+    assert len(calls) == 3
+
+if __name__ == "__main__":
+    test_gemini_service_imports_without_network()
+    test_app_imports_without_network()
+    print("Startup tests passed.")
@@ -0,0 +1,88 @@
+import json
+import uuid
+from datetime import date
+from app import app
+from models.models import db, Animal
+from services.gemini_service import gemini_service
+
+SUMMARY = {
+    "animal_tag_id": "", "summary_period_start": "N/A", "summary_period_end": "2024-05-01",
+    "feeding_summary": "Eats well.", "weight_trend": "Stable.", "temperature_trend": "Normal.",
+    "behavior_summary": "Calm.", "overall_status": "Good", "recommendations": ["Keep going."]
+}
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+class FakeModel:
+    """Streams a canned JSON response in small pieces."""
+    def __init__(self, response):
+        self.response = response
+        self.calls = 0
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        self.calls += 1
+        pieces = [self.response[i:i + 40] for i in range(0, len(self.response), 40)]
+        return [FakeChunk(piece) for piece in pieces]
+
+def use_fake_model(monkeypatch, response):
+    model = FakeModel(response)
+    monkeypatch.setattr(gemini_service, 'model', model)
+    monkeypatch.setattr(gemini_service, 'model_name', 'fake-model')
+    monkeypatch.setattr(gemini_service, '_resolved', True)
+    return model
+
+def add_animal():
+    tag = f"COW-{uuid.uuid4().hex[:8]}"
+    with app.app_context():
+        db.session.add(Animal(animal_tag_id=tag, species='Cow', birth_date=date(2022, 3, 15)))
+        db.session.commit()
+    return tag
+
+def read_events(body):
+    events = []
+    for block in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if lines:
+            events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+def test_page_renders_without_waiting_for_the_model(monkeypatch):
+    """The page itself only contains the stream placeholder; the model is not called."""
+    model = use_fake_model(monkeypatch, json.dumps(SUMMARY))
+    tag = add_animal()
+    response = app.test_client().get(f'/animals/{tag}/health_summary')
+    assert response.status_code == 200
+    assert f'/animals/{tag}/health_summary/stream'.encode() in response.data
+    assert model.calls == 0
+
+def test_stream_relays_chunks_then_rendered_result(monkeypatch):
+    """Chunks are relayed as they arrive, followed by the rendered partial; a repeat comes from the cache."""
+    tag = add_animal()
+    model = use_fake_model(monkeypatch, json.dumps(dict(SUMMARY, animal_tag_id=tag)))
+    client = app.test_client()
+
+    response = client.get(f'/animals/{tag}/health_summary/stream')
+    assert response.mimetype == 'text/event-stream'
+    events = read_events(response.get_data(as_text=True))
+    chunks = [data['text'] for event, data in events if event == 'chunk']
+    assert len(chunks) > 1
+    assert json.loads(''.join(chunks))['animal_tag_id'] == tag
+    assert events[-1][0] == 'result'
+    assert 'Eats well.' in events[-1][1]['html']
+
+    events = read_events(client.get(f'/animals/{tag}/health_summary/stream').get_data(as_text=True))
+    assert [event for event, _ in events] == ['result']
+    assert model.calls == 1
+
+def test_unparseable_stream_shows_raw_response(monkeypatch):
+    """A response that is not JSON ends with the raw-response partial."""
+    use_fake_model(monkeypatch, 'Sorry, I cannot help with that.')
+    tag = add_animal()
+    events = read_events(app.test_client().get(f'/animals/{tag}/feeding_plan/stream').get_data(as_text=True))
+    assert events[-1][0] == 'result'
+    assert 'Sorry, I cannot help with that.' in events[-1][1]['html']
+
+if __name__ == "__main__":
+    print("Run with pytest: these tests need the monkeypatch fixture.")